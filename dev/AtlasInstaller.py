@@ -8,14 +8,27 @@ import hashlib
 import json
 import subprocess
 import tempfile
+import contextlib
 import shutil
 import threading
 import time
+import heapq
+import struct
+import zlib
 import argparse
+import socket
+import errno
+import multiprocessing
+import queue
+import http.client
 from pathlib import Path
+import re
 from urllib.request import urlopen, Request
-from urllib.error import URLError
+from urllib.error import URLError, HTTPError
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from collections import namedtuple, deque
+from array import array
 
 
 from google.oauth2 import service_account
@@ -41,6 +54,8 @@ class AtlasInstaller:
         self.home = str(Path.home())
         self.install_dir = os.path.join(self.home, "Atlas_Interactivo")
         self.temp_dir = tempfile.mkdtemp(prefix="atlas_install_")
+        # Descargas grandes en ruta fija para poder reanudarlas entre ejecuciones
+        self.download_dir = os.path.join(self.home, ".cache", "atlas_installer")
         
         # Configuración de Drive
         self.drive_files = {
@@ -58,6 +73,44 @@ class AtlasInstaller:
         self.processed_files = 0
         self.download_speed = 0
         self.start_time = None
+        
+        # Planificador de actualizaciones
+        self.full_archive_version = "1.0.0"  # versión del archivo completo de Drive
+        self.estimated_bandwidth = 5 * 1024 * 1024  # bytes/s si aún no se midió
+        self.update_plan = None
+        # Parches descargados por delante mientras se aplica el actual
+        self.patch_prefetch = 2
+        
+        # Archivos repetidos (.duplicates.json): enlaces duros en lugar de copias.
+        # Desactivado por defecto: una escritura en sitio sobre un enlace
+        # modificaría también todas sus copias.
+        self.dedup_hardlinks = False
+        
+        # Reintentos de descarga (espera exponencial en segundos)
+        self.download_retries = 5
+        self.retry_backoff = 2
+        self.download_attempts = 0
+        self.download_validator = None
+        
+        # Conexiones simultáneas para la descarga segmentada (1 = un solo flujo)
+        self.download_connections = 4
+        
+        # Instalación en streaming: extraer mientras se descarga
+        self.stream_install = False
+        self.stream_spool = True
+        self.stream_spool_limit = None  # bytes; None = según espacio libre
+        
+        # Hilos de extracción para .tar sin comprimir (1 = secuencial)
+        self.extract_workers = min(8, os.cpu_count() or 1)
+        self.extraction_method = "sequential"
+        self.tar_index = None
+        # Copia de datos en la extracción: copy_file_range -> sendfile -> buffered
+        self.copy_method = "copy_file_range" if hasattr(os, 'copy_file_range') else (
+            "sendfile" if hasattr(os, 'sendfile') else "buffered")
+        self.http_headers = {
+            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
+            'Accept': '*/*'
+        }
 
     # ========== NUEVAS FUNCIONES CLI ==========
     
@@ -116,8 +169,9 @@ class AtlasInstaller:
             {"version": "1.0.2", "size": "120MB", "description": "Nuevos datos climáticos"},
         ]
         
-        # Filtrar solo actualizaciones posteriores
-        newer_updates = [u for u in available_updates if u["version"] > current_version]
+        # Filtrar solo actualizaciones posteriores (orden numérico: 1.10.0 > 1.9.0)
+        current_key = self.parse_version(current_version)
+        newer_updates = [u for u in available_updates if self.parse_version(u["version"]) > current_key]
         
         if newer_updates:
             print(f"\n📦 {len(newer_updates)} actualización(es) disponible(s):")
@@ -131,9 +185,10 @@ class AtlasInstaller:
         # También mostrar parches disponibles
         patches = self.check_for_updates()
         if patches:
-            print(f"\n🔧 {len(patches)} parche(s) disponible(s):")
+            print(f"\n🔧 Plan de actualización ({len(patches)} paso(s)):")
             for patch in patches:
                 print(f"  • {patch['name']} ({patch['size']}) - v{patch['version']}")
+            print(self.describe_update_plan())
         else:
             print("\n✅ No hay parches pendientes.")
 
@@ -150,9 +205,22 @@ OPCIONES:
   --version, -v       Muestra información de versión
   --cli               Modo consola interactivo
   --check-updates     Verifica actualizaciones disponibles
+  --update            Descarga y aplica en orden todos los parches pendientes
+  --prefetch N        Parches descargados por delante durante --update (por defecto: 2)
   --install-dir DIR   Especifica directorio de instalación (ej: /opt/atlas)
   --skip-desktop      No crear accesos directos
   --no-gui            Forzar modo consola incluso si GUI está disponible
+  --connections N     Conexiones simultáneas de descarga (por defecto: 4)
+  --stream            Extraer mientras se descarga (menos disco y tiempo)
+  --extract-workers N Hilos de extracción del .tar (por defecto: núcleos, máx. 8)
+  --list-archive TAR  Lista el contenido de un .tar (usa/crea el índice .idx)
+  --extract-member TAR RUTA
+                      Extrae una sola ruta del .tar en el directorio de instalación
+  --verify            Verifica la instalación contra su índice (.atlas_index)
+  --repair            Repara la instalación descargando solo archivos dañados
+  --manifest FILE     Manifest de hashes para --repair/--verify (comprobación por hash)
+  --benchmark-extract [N]
+                      Mide archivos/s de extracción con N archivos pequeños (100000)
 
 EJEMPLOS:
   # Instalar con GUI (por defecto)
@@ -164,14 +232,21 @@ EJEMPLOS:
   # Verificar actualizaciones
   ./AtlasInstaller --check-updates
   
+  # Aplicar todas las actualizaciones pendientes
+  ./AtlasInstaller --update --install-dir /opt/Atlas
+  
   # Instalar en directorio específico sin GUI
   ./AtlasInstaller --install-dir /opt/Atlas --no-gui
   
+  # Descargar con 8 conexiones simultáneas
+  ./AtlasInstaller --install-dir /opt/Atlas --connections 8
+
   # Mostrar versión
   ./AtlasInstaller --version
 
 CARACTERÍSTICAS:
   • Descarga ~13GB de datos desde Google Drive
+  • Descarga reanudable si se corta la conexión
   • Extracción automática y verificación
   • Creación de accesos directos en escritorio/menú
   • Sistema de actualización automática
@@ -236,92 +311,482 @@ CARACTERÍSTICAS:
 
 
     # ========== MÉTODOS DE DESCARGA ==========
-    def download_with_progress(self, url, destination, progress_callback=None):
-        """Descarga archivo con callback de progreso"""
+    def _load_download_state(self, state_path, url):
+        """Lee el estado de una descarga parcial si corresponde a la misma URL"""
+        if not os.path.exists(state_path):
+            return None
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != url:
+            return None
+        return state
+
+    def _save_download_state(self, state_path, url, validator, downloaded, total_size):
+        """Guarda el estado de la descarga parcial (sidecar junto al .part)"""
+        state = {
+            "url": url,
+            "validator": validator,
+            "downloaded": downloaded,
+            "total_size": total_size,
+            "updated": datetime.now().isoformat()
+        }
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def download_with_progress(self, url, destination, progress_callback=None, max_retries=None):
+        """Descarga archivo con callback de progreso, reanudable con HTTP Range.
+
+        Los datos se escriben en ``destination.part`` y el estado (URL, validador
+        ETag/Last-Modified y bytes descargados) en ``destination.part.json``. Si la
+        conexión se corta, se reintenta con espera exponencial pidiendo solo los
+        bytes que faltan; una ejecución posterior también continúa desde ahí.
+        """
+        if max_retries is None:
+            max_retries = self.download_retries
+
+        part_path = destination + ".part"
+        state_path = part_path + ".json"
+        # Recuperar descarga anterior si existe
+        downloaded = 0
+        validator = None
+        total_size = 0
+        state = self._load_download_state(state_path, url)
+        if state and os.path.exists(part_path):
+            # Confiar solo en los bytes confirmados en el sidecar
+            downloaded = min(os.path.getsize(part_path), state.get("downloaded", 0))
+            validator = state.get("validator")
+            total_size = state.get("total_size", 0)
+            with open(part_path, 'ab') as f:
+                f.truncate(downloaded)
+            if downloaded:
+                print(f"🔁 Reanudando descarga desde {downloaded / (1024*1024):.1f} MB")
+
+        block_size = 64 * 1024
+        save_every = 8 * 1024 * 1024
+        attempt = 0
+        self.download_attempts = 0
+        self.start_time = time.time()
+        session_start = downloaded
+
+        while True:
+            self.download_attempts += 1
+            headers = dict(self.http_headers)
+            if downloaded > 0:
+                headers['Range'] = f"bytes={downloaded}-"
+                if validator:
+                    headers['If-Range'] = validator
+
+            try:
+                with urlopen(Request(url, headers=headers), timeout=60) as response:
+                    status = response.getcode()
+                    new_validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+                    if downloaded > 0 and status == 206:
+                        content_range = response.headers.get('Content-Range', '')
+                        start, total_size = self._parse_content_range(content_range)
+                        if start != downloaded:
+                            raise ValueError(f"Content-Range inesperado: {content_range}")
+                    else:
+                        # 200: el servidor ignoró el Range o el archivo cambió
+                        if downloaded > 0:
+                            print("⚠️  El servidor no permite reanudar, reiniciando descarga")
+                        downloaded = 0
+                        session_start = 0
+                        total_size = int(response.headers.get('Content-Length', 0))
+
+                    validator = new_validator
+                    self._save_download_state(state_path, url, validator, downloaded, total_size)
+
+                    if progress_callback:
+                        percent = (downloaded / total_size * 100) if total_size > 0 else 0
+                        progress_callback(percent, downloaded, total_size, 0)
+
+                    last_saved = downloaded
+                    with open(part_path, 'ab' if downloaded else 'wb') as f:
+                        while True:
+                            buffer = response.read(block_size)
+                            if not buffer:
+                                break
+
+                            f.write(buffer)
+                            downloaded += len(buffer)
+                            attempt = 0
+
+                            if downloaded - last_saved >= save_every:
+                                f.flush()
+                                self._save_download_state(state_path, url, validator, downloaded, total_size)
+                                last_saved = downloaded
+
+                            # Calcular velocidad
+                            elapsed = time.time() - self.start_time
+                            speed = (downloaded - session_start) / elapsed if elapsed > 0 else 0
+                            self.download_speed = speed
+
+                            if progress_callback:
+                                percent = (downloaded / total_size * 100) if total_size > 0 else 0
+                                progress_callback(percent, downloaded, total_size, speed)
+
+                        f.flush()
+                        self._save_download_state(state_path, url, validator, downloaded, total_size)
+
+                    if total_size and downloaded < total_size:
+                        raise ConnectionError(f"conexión cerrada en {downloaded}/{total_size} bytes")
+                break
+
+            except HTTPError as e:
+                if e.code == 416 and downloaded > 0:
+                    # Range fuera de rango: puede que ya estuviera completo
+                    _, remote_total = self._parse_content_range(e.headers.get('Content-Range', ''))
+                    if remote_total == downloaded:
+                        break
+                    print("⚠️  Descarga parcial no válida, reiniciando desde cero")
+                    downloaded = 0
+                    validator = None
+                    os.remove(part_path)
+                    continue
+                if e.code not in (408, 429, 500, 502, 503, 504):
+                    print(f"Error HTTP {e.code}: {e.reason}")
+                    return False
+                error = e
+            except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException) as e:
+                error = e
+            except Exception as e:
+                print(f"Error: {e}")
+                return False
+
+            attempt += 1
+            if attempt > max_retries:
+                print(f"Error de conexión: {error}")
+                print(f"💾 Descarga parcial guardada ({downloaded / (1024*1024):.1f} MB), se reanudará en el próximo intento")
+                return False
+
+            delay = min(self.retry_backoff * (2 ** (attempt - 1)), 60)
+            print(f"⚠️  Conexión interrumpida ({error}). Reintento {attempt}/{max_retries} en {delay:.0f}s...")
+            time.sleep(delay)
+
+        os.replace(part_path, destination)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        self.download_validator = validator
+        return True
+
+    @staticmethod
+    def _parse_content_range(content_range):
+        """Parsea 'bytes inicio-fin/total' (o 'bytes */total') -> (inicio, total)"""
+        try:
+            unit_range, _, total = content_range.partition('/')
+            range_part = unit_range.split()[-1]
+            start = int(range_part.split('-')[0]) if range_part != '*' else 0
+            return start, int(total) if total and total != '*' else 0
+        except (ValueError, IndexError):
+            return -1, 0
+    
+
+    # ========== DESCARGA SEGMENTADA (VARIAS CONEXIONES) ==========
+    def _probe_download(self, url):
+        """Consulta tamaño, validador y soporte de Range pidiendo el primer byte"""
+        headers = dict(self.http_headers)
+        headers['Range'] = 'bytes=0-0'
+        with urlopen(Request(url, headers=headers), timeout=60) as response:
+            status = response.getcode()
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            if status == 206:
+                _, total_size = self._parse_content_range(response.headers.get('Content-Range', ''))
+                return total_size, validator, True
+            return int(response.headers.get('Content-Length', 0)), validator, False
+
+    def download_segmented(self, url, destination, connections=None, progress_callback=None):
+        """Descarga en paralelo dividiendo el archivo en rangos de bytes.
+
+        Cada conexión pide un rango con ``Range`` y lo escribe con ``pwrite`` en un
+        archivo ``.part`` preasignado. Cuando una conexión termina, parte a la mitad
+        el segmento con más bytes pendientes (el más lento) y se queda con la
+        segunda mitad. Los segmentos pendientes se guardan en el sidecar
+        ``.part.json`` para reanudar igual que ``download_with_progress``.
+        Si el servidor no acepta rangos se usa la descarga de un solo flujo.
+        """
+        if connections is None:
+            connections = self.download_connections
+
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
-                'Accept': '*/*'
+            total_size, validator, accepts_ranges = self._probe_download(url)
+        except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException) as e:
+            print(f"⚠️  No se pudo consultar el archivo ({e}), usando descarga simple")
+            return self.download_with_progress(url, destination, progress_callback)
+
+        if connections <= 1 or not accepts_ranges or total_size <= 0:
+            if connections > 1:
+                print("ℹ️  El servidor no admite rangos, usando una sola conexión")
+            return self.download_with_progress(url, destination, progress_callback)
+
+        part_path = destination + ".part"
+        state_path = part_path + ".json"
+        min_split = 4 * 1024 * 1024
+        block_size = 256 * 1024
+
+        # Segmentos pendientes [posición, fin) o los del intento anterior
+        segments = None
+        state = self._load_download_state(state_path, url)
+        if (state and os.path.exists(part_path) and state.get("validator") == validator
+                and state.get("total_size") == total_size):
+            if "segments" in state:
+                segments = [list(seg) for seg in state["segments"]]
+            elif state.get("downloaded"):
+                # Parcial de una descarga de un solo flujo
+                segments = [[min(state["downloaded"], os.path.getsize(part_path)), total_size]]
+        if segments is not None:
+            pending = sum(end - pos for pos, end in segments)
+            print(f"🔁 Reanudando descarga segmentada: faltan {pending / (1024*1024):.1f} MB")
+        else:
+            count = max(1, min(connections, total_size // min_split))
+            step = total_size // count
+            segments = [[i * step, (i + 1) * step if i < count - 1 else total_size] for i in range(count)]
+
+        lock = threading.Lock()
+        abort = threading.Event()
+        errors = []
+        downloaded = [total_size - sum(end - pos for pos, end in segments)]
+        unassigned = list(segments)
+
+        def save_state():
+            with lock:
+                remaining = [list(seg) for seg in segments if seg[0] < seg[1]]
+            contiguous = min((pos for pos, _ in remaining), default=total_size)
+            state = {
+                "url": url,
+                "validator": validator,
+                "downloaded": contiguous,
+                "total_size": total_size,
+                "segments": remaining,
+                "updated": datetime.now().isoformat()
             }
-            
-            req = Request(url, headers=headers)
-            
-            with urlopen(req) as response:
-                total_size = int(response.headers.get('Content-Length', 0))
-                block_size = 8192
-                downloaded = 0
-                self.start_time = time.time()
-                
+            tmp_path = state_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
+
+        def next_segment():
+            """Toma un segmento libre o divide el más grande en curso"""
+            with lock:
+                while unassigned:
+                    seg = unassigned.pop(0)
+                    if seg[0] < seg[1]:
+                        return seg
+                victim = max(segments, key=lambda seg: seg[1] - seg[0], default=None)
+                if victim is None or victim[1] - victim[0] < 2 * min_split:
+                    return None
+                middle = victim[0] + (victim[1] - victim[0]) // 2
+                seg = [middle, victim[1]]
+                victim[1] = middle
+                segments.append(seg)
+                return seg
+
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        fd = os.open(part_path, flags, 0o644)
+        try:
+            if os.fstat(fd).st_size != total_size:
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, total_size)
+                    except OSError:
+                        os.ftruncate(fd, total_size)
+                else:
+                    os.ftruncate(fd, total_size)
+
+            def write_at(data, offset):
+                if hasattr(os, 'pwrite'):
+                    os.pwrite(fd, data, offset)
+                else:
+                    with lock:
+                        os.lseek(fd, offset, os.SEEK_SET)
+                        os.write(fd, data)
+
+            def worker():
+                seg = next_segment()
+                attempt = 0
+                while seg is not None and not abort.is_set():
+                    headers = dict(self.http_headers)
+                    headers['Range'] = f"bytes={seg[0]}-{seg[1] - 1}"
+                    if validator:
+                        headers['If-Range'] = validator
+                    try:
+                        with urlopen(Request(url, headers=headers), timeout=60) as response:
+                            if response.getcode() != 206:
+                                raise ValueError("el archivo cambió en el servidor durante la descarga")
+                            while seg[0] < seg[1] and not abort.is_set():
+                                buffer = response.read(min(block_size, seg[1] - seg[0]))
+                                if not buffer:
+                                    raise ConnectionError("conexión cerrada antes de terminar el segmento")
+                                # El fin puede haberse reducido si otro hilo robó la cola
+                                with lock:
+                                    allowed = max(0, min(len(buffer), seg[1] - seg[0]))
+                                write_at(memoryview(buffer)[:allowed], seg[0])
+                                with lock:
+                                    seg[0] += allowed
+                                    downloaded[0] += allowed
+                                attempt = 0
+                        seg = next_segment()
+                    except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException) as e:
+                        attempt += 1
+                        if attempt > self.download_retries:
+                            errors.append(e)
+                            abort.set()
+                            return
+                        time.sleep(min(self.retry_backoff * (2 ** (attempt - 1)), 60))
+                    except Exception as e:
+                        errors.append(e)
+                        abort.set()
+                        return
+
+            self.download_attempts = 1
+            self.start_time = time.time()
+            session_start = downloaded[0]
+            save_state()
+            threads = [threading.Thread(target=worker, daemon=True) for _ in range(connections)]
+            for thread in threads:
+                thread.start()
+
+            last_saved = time.time()
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+                elapsed = time.time() - self.start_time
+                speed = (downloaded[0] - session_start) / elapsed if elapsed > 0 else 0
+                self.download_speed = speed
                 if progress_callback:
-                    progress_callback(0, 0, total_size, 0)
-                
-                with open(destination, 'wb') as f:
-                    while True:
-                        buffer = response.read(block_size)
-                        if not buffer:
-                            break
-                        
-                        downloaded += len(buffer)
-                        f.write(buffer)
-                        
-                        # Calcular velocidad
-                        elapsed = time.time() - self.start_time
-                        speed = downloaded / elapsed if elapsed > 0 else 0
-                        
-                        if progress_callback:
-                            percent = (downloaded / total_size * 100) if total_size > 0 else 0
-                            progress_callback(percent, downloaded, total_size, speed)
-                
-                return True
-                
-        except URLError as e:
-            print(f"Error de conexión: {e}")
-            return False
-        except Exception as e:
-            print(f"Error: {e}")
+                    progress_callback(downloaded[0] / total_size * 100, downloaded[0], total_size, speed)
+                if time.time() - last_saved >= 2:
+                    save_state()
+                    last_saved = time.time()
+        finally:
+            os.close(fd)
+
+        save_state()
+        if errors or downloaded[0] < total_size:
+            error = errors[0] if errors else "segmentos incompletos"
+            print(f"Error en descarga segmentada: {error}")
+            print(f"💾 Descarga parcial guardada ({downloaded[0] / (1024*1024):.1f} MB), se reanudará en el próximo intento")
             return False
+
+        if progress_callback:
+            progress_callback(100, total_size, total_size, self.download_speed)
+        os.replace(part_path, destination)
+        os.remove(state_path)
+        self.download_validator = validator
+        return True
     
 
-    def extract_tar_gz_with_progress(self, archive_path, extract_to, progress_callback=None):
-        """Extrae .tar.gz con callback de progreso"""
+    def _extract_tar_single_pass(self, archive_path, extract_to, mode, progress_callback=None):
+        """Extrae en una sola pasada sin getmembers() previo.
+
+        El .tar se recorre miembro a miembro (``r:`` con copia por desplazamiento
+        para .tar simple, ``r|gz`` en flujo para .tar.gz) y los TarInfo ya
+        procesados se descartan. El progreso se calcula con los bytes leídos del
+        archivo frente a su tamaño, así que no hace falta contar miembros antes.
+        """
+        archive_size = os.path.getsize(archive_path) or 1
+        self.total_files = 0
+        self.processed_files = 0
+        self.extraction_method = "sequential"
+        last_report = 0
+
+        # En un .tar sin comprimir el índice sale gratis durante la pasada
+        # y los datos se copian por desplazamiento sin pasar por tarfile
+        index = None
+        zero_copy = mode == 'r:'
+        if zero_copy:
+            st = os.stat(archive_path)
+            index = TarIndex(st.st_size, st.st_mtime_ns)
+
+        created_dirs = set()
+        src_fd = os.open(archive_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
         try:
-            with tarfile.open(archive_path, 'r:gz') as tar:  # 'r:gz' para .tar.gz
-                members = tar.getmembers()
-                self.total_files = len(members)
-                self.processed_files = 0
-                
-                print(f"📦 Total de miembros en el tar.gz: {self.total_files}")
-                
-                for member in members:
+            with self._open_tar_stream(archive_path, mode) as (raw, tar):
+                while True:
+                    member = tar.next()
+                    if member is None:
+                        break
+                    # No acumular TarInfo: en modo flujo no se vuelve atrás
+                    tar.members.clear()
+                    if index is not None:
+                        index.add(member)
+
                     dest_path = os.path.join(extract_to, member.name)
-                    
-                    # Saltar si no es archivo ni directorio
+
+                    # Saltar si es un enlace simbólico o dispositivo especial
                     if not member.isfile() and not member.isdir():
                         continue
-                    
+
                     if member.isdir():
-                        os.makedirs(dest_path, exist_ok=True)
+                        self._ensure_dir(dest_path, created_dirs)
                     else:
-                        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                        
+                        self._ensure_dir(os.path.dirname(dest_path), created_dirs)
+
                         try:
-                            with tar.extractfile(member) as source, open(dest_path, 'wb') as dest:
-                                shutil.copyfileobj(source, dest)
+                            if zero_copy and not member.issparse():
+                                self._write_member_at(src_fd, member, dest_path)
+                            else:
+                                self._write_member_stream(tar, member, dest_path)
                         except (AttributeError, KeyError) as e:
+                            # Algunos miembros pueden no tener contenido (como enlaces)
                             print(f"⚠️  Saltando {member.name}: {e}")
                             continue
-                    
+
                     self.processed_files += 1
-                    
-                    if progress_callback:
-                        percent = (self.processed_files / self.total_files) * 100
+
+                    now = time.time()
+                    if progress_callback and now - last_report >= 0.1:
+                        last_report = now
+                        percent = min(raw.tell() / archive_size * 100, 100)
                         progress_callback(percent, self.processed_files, self.total_files)
-                    
-                    if self.processed_files % 100 == 0:
-                        print(f"📁 Procesados: {self.processed_files}/{self.total_files} archivos")
-                
-                print(f"✅ Extracción completada: {self.processed_files} archivos")
-                return True
+
+                    # Mostrar progreso cada 1000 archivos
+                    if self.processed_files % 1000 == 0:
+                        print(f"📁 Procesados: {self.processed_files} archivos "
+                              f"({raw.tell() / archive_size * 100:.1f}% del archivo)")
+        finally:
+            os.close(src_fd)
+
+        self.total_files = self.processed_files
+        if index is not None:
+            self.tar_index = index
+            try:
+                index.save(archive_path + ".idx")
+            except OSError:
+                pass
+        if progress_callback:
+            progress_callback(100, self.processed_files, self.total_files)
+        print(f"✅ Extracción completada: {self.processed_files} archivos")
+        return True
+
+    @contextlib.contextmanager
+    def _open_tar_stream(self, archive_path, mode):
+        """(archivo, tarfile) para recorrer ``archive_path`` en una pasada.
+
+        Los .tar.gz comprimidos en paralelo por create_patches.py se leen con
+        ``ParallelGzipReader`` (varios bloques descomprimiéndose a la vez).
+        """
+        with open(archive_path, 'rb') as raw:
+            gz = None
+            if mode == 'r|gz' and ParallelGzipReader.detect(archive_path):
+                gz, mode = ParallelGzipReader(raw, self.extract_workers), 'r|'
+                self.extraction_method = "parallel-gzip"
+            try:
+                with tarfile.open(fileobj=gz if gz is not None else raw, mode=mode,
+                                  bufsize=1024 * 1024) as tar:
+                    yield raw, tar
+            finally:
+                if gz is not None:
+                    gz.close()
+
+    def extract_tar_gz_with_progress(self, archive_path, extract_to, progress_callback=None):
+        """Extrae .tar.gz con callback de progreso (una sola descompresión)"""
+        try:
+            return self._extract_tar_single_pass(archive_path, extract_to, 'r|gz', progress_callback)
                 
         except Exception as e:
             print(f"❌ Error extrayendo .tar.gz: {type(e).__name__}: {e}")
@@ -330,19 +795,61 @@ CARACTERÍSTICAS:
             return False
 
     # ========== MÉTODOS DE INSTALACIÓN ==========
-    def check_disk_space(self):
-        """Verifica espacio en disco disponible"""
-        stat = shutil.disk_usage(self.home)
-        free_gb = stat.free / (1024**3)
-        required_gb = 15  # 15GB mínimo
-        
-        if free_gb < required_gb:
-            return False, f"Espacio insuficiente. Necesitas {required_gb}GB, tienes {free_gb:.1f}GB"
+    # Margen por sistema de archivos (índices, temporales, duplicados materializados)
+    DISK_MARGIN = 1024**3
+    # Tamaño supuesto del .tar completo si el servidor no lo informa
+    FULL_ARCHIVE_SIZE_ESTIMATE = 7 * 1024**3
+
+    @staticmethod
+    def _existing_parent(path):
+        """``path`` o su primer ancestro que existe (para medir su sistema de archivos)"""
+        path = os.path.abspath(path)
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        return path
+
+    def check_disk_space(self, archive_size=None):
+        """Verifica espacio en disco según el tamaño del archivo completo y el modo.
+
+        El .tar no va comprimido: lo extraído ocupa lo mismo que el archivo.
+        La descarga normal guarda el .tar y lo extraído a la vez (≈ 2× tamaño);
+        en streaming basta con lo extraído, y el spool para reanudar (otra
+        copia del .tar) solo se usa si cabe (``_spool_allowed``). Sin
+        ``archive_size`` se consulta al servidor.
+        """
+        if archive_size is None:
+            try:
+                archive_size, _, _ = self._probe_download(self._full_download_url())
+            except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException):
+                archive_size = 0
+        archive_size = archive_size or self.FULL_ARCHIVE_SIZE_ESTIMATE
+
+        # Bytes necesarios por sistema de archivos (descargas e instalación pueden estar en discos distintos)
+        needs = {}
+        uses = [(self.install_dir, archive_size)]
+        if not self.stream_install:
+            uses.append((self.download_dir, archive_size))
+        for path, size in uses:
+            path = self._existing_parent(path)
+            device = os.stat(path).st_dev
+            measured, required = needs.get(device, (path, self.DISK_MARGIN))
+            needs[device] = (measured, required + size)
+
+        for path, required in needs.values():
+            free = shutil.disk_usage(path).free
+            if free < required:
+                return False, (f"Espacio insuficiente en {path}. Necesitas {required / 1024**3:.1f}GB, "
+                               f"tienes {free / 1024**3:.1f}GB")
+
+        free_gb = min(shutil.disk_usage(path).free for path, _ in needs.values()) / 1024**3
+        if self.stream_install and self.stream_spool and not self._spool_allowed(archive_size):
+            return True, (f"Espacio suficiente: {free_gb:.1f}GB libres "
+                          "(sin copia para reanudar: necesita 2× el tamaño del archivo + 1GB)")
         return True, f"Espacio suficiente: {free_gb:.1f}GB libres"
     
 
     def extract_archive_with_progress(self, archive_path, extract_to, progress_callback=None):
-        """Extrae archivo detectando automáticamente si es .tar o .tar.gz"""
+        """Extrae archivo detectando automáticamente si es .tar, .tar.gz o .zip"""
         try:
             # Verificar que el archivo existe
             if not os.path.exists(archive_path):
@@ -353,21 +860,28 @@ CARACTERÍSTICAS:
             print(f"   Tamaño: {os.path.getsize(archive_path) / (1024*1024):.2f} MB")
             print(f"   Destino: {extract_to}")
             
-            # Detectar tipo de archivo por extensión
-            if archive_path.endswith('.tar.gz') or archive_path.endswith('.tgz'):
+            # Detectar tipo por extensión; la firma solo se mira si no se reconoce
+            # (is_zipfile mira el final del archivo: un .tar que acaba en un .zip pasaría por ZIP)
+            if archive_path.endswith('.zip'):
+                print("🔍 Detectado: archivo .zip")
+                return self.extract_zip_with_progress(archive_path, extract_to, progress_callback)
+            elif archive_path.endswith('.tar.gz') or archive_path.endswith('.tgz'):
                 print("🔍 Detectado: archivo .tar.gz comprimido")
                 return self.extract_tar_gz_with_progress(archive_path, extract_to, progress_callback)
             elif archive_path.endswith('.tar'):
                 print("🔍 Detectado: archivo .tar simple")
                 return self.extract_tar_with_progress(archive_path, extract_to, progress_callback)
-            elif archive_path.endswith('.zip'):
-                print("🔍 Detectado: archivo .zip")
-                # Si no tienes esta función, comenta esta línea o implementa extract_zip_with_progress
-                # return self.extract_zip_with_progress(archive_path, extract_to, progress_callback)
-                print("⚠️  Extracción de ZIP no implementada, intentando como tar...")
-                return self.extract_tar_with_progress(archive_path, extract_to, progress_callback)
+            
+            print(f"⚠️  Extensión no reconocida: {archive_path}")
+            with open(archive_path, 'rb') as f:
+                magic = f.read(4)
+            if magic == b'PK\x03\x04':
+                print("🔍 Detectado por contenido: archivo .zip")
+                return self.extract_zip_with_progress(archive_path, extract_to, progress_callback)
+            elif magic[:2] == b'\x1f\x8b':
+                print("🔍 Detectado por contenido: archivo .tar.gz comprimido")
+                return self.extract_tar_gz_with_progress(archive_path, extract_to, progress_callback)
             else:
-                print(f"⚠️  Extensión no reconocida: {archive_path}")
                 # Intentar como tar simple
                 print("🔄 Intentando extraer como .tar simple...")
                 return self.extract_tar_with_progress(archive_path, extract_to, progress_callback)
@@ -379,6 +893,93 @@ CARACTERÍSTICAS:
             return False
 
 
+    # ========== INSTALACIÓN EN STREAMING ==========
+    def _spool_allowed(self, total_size):
+        """Decide si hay espacio para guardar copia del archivo mientras se extrae"""
+        if not self.stream_spool or total_size <= 0:
+            return False
+        if self.stream_spool_limit is not None and total_size > self.stream_spool_limit:
+            return False
+        # Espacio para el spool más los datos extraídos y 1 GB de margen
+        free = shutil.disk_usage(self._existing_parent(self.download_dir)).free
+        return free >= 2 * total_size + self.DISK_MARGIN
+
+    def stream_install_archive(self, url, extract_to, progress_callback=None, compressed=False):
+        """Descarga y extrae a la vez alimentando tarfile en modo flujo (r| / r|gz).
+
+        Los miembros se escriben mientras llegan los bytes, sin guardar el .tar
+        completo. Si hay espacio, se guarda un spool acotado para que un nuevo
+        intento no vuelva a descargar lo ya recibido.
+        """
+        try:
+            total_size, validator, accepts_ranges = self._probe_download(url)
+        except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException) as e:
+            print(f"❌ No se pudo consultar el archivo: {e}")
+            return False
+
+        os.makedirs(self.download_dir, exist_ok=True)
+        spool_path = None
+        if accepts_ranges and self._spool_allowed(total_size):
+            spool_path = os.path.join(self.download_dir, "Atlas_Linux.stream.part")
+
+        reader = ResumableHTTPReader(self, url, total_size, validator, accepts_ranges, spool_path)
+        self.extraction_method = "streaming"
+        index = None if compressed else TarIndex(total_size, 0, validator or "")
+        created_dirs = set()
+        self.processed_files = 0
+        self.download_attempts = 1
+        self.start_time = time.time()
+        last_report = 0
+        success = False
+
+        try:
+            mode = 'r|gz' if compressed else 'r|'
+            with tarfile.open(fileobj=reader, mode=mode, bufsize=1024 * 1024) as tar:
+                while True:
+                    member = tar.next()
+                    if member is None:
+                        break
+                    tar.members.clear()
+                    if index is not None:
+                        index.add(member)
+                    dest_path = os.path.join(extract_to, member.name)
+
+                    if not member.isfile() and not member.isdir():
+                        continue
+
+                    if member.isdir():
+                        self._ensure_dir(dest_path, created_dirs)
+                    else:
+                        self._ensure_dir(os.path.dirname(dest_path), created_dirs)
+                        self._write_member_stream(tar, member, dest_path)
+
+                    self.processed_files += 1
+
+                    now = time.time()
+                    if progress_callback and now - last_report >= 0.2:
+                        last_report = now
+                        elapsed = now - self.start_time
+                        self.download_speed = reader.offset / elapsed if elapsed > 0 else 0
+                        percent = (reader.offset / total_size * 100) if total_size > 0 else 0
+                        progress_callback(percent, reader.offset, total_size, self.processed_files)
+
+            if progress_callback:
+                progress_callback(100, total_size, total_size, self.processed_files)
+            print(f"✅ Extracción en streaming completada: {self.processed_files} archivos")
+            self.tar_index = index
+            success = True
+            return True
+
+        except Exception as e:
+            print(f"❌ Error en instalación en streaming: {type(e).__name__}: {e}")
+            if spool_path:
+                print(f"💾 Copia parcial guardada ({reader.offset / (1024*1024):.1f} MB), se reutilizará en el próximo intento")
+            return False
+
+        finally:
+            reader.close(keep_spool=not success)
+    
+
     def install_full_version(self, progress_callback=None, status_callback=None):
         """Instala la versión completa"""
         try:
@@ -396,11 +997,12 @@ CARACTERÍSTICAS:
             if status_callback:
                 status_callback("Descargando Atlas desde Google Drive...")
             
-            file_id = self.drive_files["linux"]
-            download_url = f"https://drive.google.com/uc?id={file_id}&export=download"
+            download_url = self._full_download_url()
 
             # CAMBIA ESTO: Quita el .gz porque tu archivo es .tar simple
-            archive_path = os.path.join(self.temp_dir, "Atlas_Linux.tar")  # Sin .gz
+            # Ruta fija (no temp_dir) para reanudar la descarga si se interrumpe
+            os.makedirs(self.download_dir, exist_ok=True)
+            archive_path = os.path.join(self.download_dir, "Atlas_Linux.tar")  # Sin .gz
             
             # Función para callback de progreso de descarga
             def dl_progress(percent, downloaded, total, speed):
@@ -412,7 +1014,10 @@ CARACTERÍSTICAS:
                     speed_mbps = speed / (1024*1024)
                     status_callback(f"Descarga: {downloaded_mb:.1f}/{total_mb:.1f} MB ({speed_mbps:.1f} MB/s)")
             
-            if not self.download_with_progress(download_url, archive_path, dl_progress):
+            if self.stream_install:
+                return self._install_streaming(download_url, progress_callback, status_callback)
+            
+            if not self.download_segmented(download_url, archive_path, progress_callback=dl_progress):
                 return False, "Error en la descarga"
             
             # Extraer
@@ -424,7 +1029,10 @@ CARACTERÍSTICAS:
                 if progress_callback:
                     progress_callback(percent, f"Extrayendo...")
                 if status_callback:
-                    status_callback(f"Extraídos: {processed}/{total} archivos")
+                    if total:
+                        status_callback(f"Extraídos: {processed}/{total} archivos")
+                    else:
+                        status_callback(f"Extraídos: {processed} archivos")
             
             # Usa la función automática que detecta el tipo
             success = self.extract_archive_with_progress(archive_path, self.install_dir, ex_progress)
@@ -432,70 +1040,827 @@ CARACTERÍSTICAS:
             if not success:
                 return False, "Error extrayendo archivos"
             
-            # Limpiar archivo temporal
+            # Limpiar archivo temporal (el índice se guarda luego en la instalación)
             os.remove(archive_path)
+            if os.path.exists(archive_path + ".idx"):
+                os.remove(archive_path + ".idx")
             
-            # Hacer ejecutable
-            atlas_binary = os.path.join(self.install_dir, "Atlas_Interactivo")
-            if os.path.exists(atlas_binary):
-                os.chmod(atlas_binary, 0o755)
-            
-            # Crear archivos de sistema
-            self.create_version_file()
-            self.create_desktop_launcher()
-            
-            return True, "Instalación completada exitosamente"
+            return self._finish_install()
             
         except Exception as e:
             return False, f"Error durante la instalación: {str(e)}"
 
-    def extract_tar_with_progress(self, archive_path, extract_to, progress_callback=None):
-        """Extrae .tar simple (sin comprimir) con callback de progreso"""
+    def _install_streaming(self, download_url, progress_callback=None, status_callback=None):
+        """Descarga y extrae en un solo paso (sin guardar el .tar completo)"""
+        def st_progress(percent, downloaded, total, files):
+            if progress_callback:
+                progress_callback(percent, f"Descargando y extrayendo...")
+            if status_callback:
+                downloaded_mb = downloaded / (1024*1024)
+                total_mb = total / (1024*1024) if total > 0 else 0
+                speed_mbps = self.download_speed / (1024*1024)
+                status_callback(f"Descarga: {downloaded_mb:.1f}/{total_mb:.1f} MB ({speed_mbps:.1f} MB/s) - {files} archivos")
+        
+        if not self.stream_install_archive(download_url, self.install_dir, st_progress):
+            return False, "Error en la descarga/extracción en streaming"
+        
+        return self._finish_install()
+
+    def _finish_install(self):
+        """Pasos finales comunes tras extraer"""
+        # Archivos repetidos que el archivo completo guarda una sola vez (también en el índice)
+        duplicated = self._materialize_duplicates(self.install_dir, self.tar_index)
+        if duplicated:
+            print(f"🔗 {duplicated} archivo(s) duplicados")
+        
+        # Guardar el índice de miembros para verificar/reparar después
+        if self.tar_index is not None:
+            if not self.tar_index.source and self.download_validator:
+                self.tar_index.source = self.download_validator
+            self.tar_index.version = self.full_archive_version
+            self.tar_index.save(os.path.join(self.install_dir, ".atlas_index"))
+        
+        # Hacer ejecutable
+        atlas_binary = os.path.join(self.install_dir, "Atlas_Interactivo")
+        if os.path.exists(atlas_binary):
+            os.chmod(atlas_binary, 0o755)
+        
+        # Crear archivos de sistema
+        self.create_version_file()
+        self.create_desktop_launcher()
+        
+        return True, "Instalación completada exitosamente"
+
+    # ========== ÍNDICE DEL ARCHIVO ==========
+    def get_tar_index(self, archive_path, rebuild=False):
+        """Carga el índice ``.idx`` junto al .tar o lo crea si falta o no coincide"""
+        index_path = archive_path + ".idx"
+        index = None if rebuild else TarIndex.load(index_path)
+        if index is None or not index.matches(archive_path):
+            print("🗂️  Creando índice de miembros del archivo...")
+            index = TarIndex.build(archive_path)
+            try:
+                index.save(index_path)
+            except OSError as e:
+                print(f"⚠️  No se pudo guardar el índice: {e}")
+        self.tar_index = index
+        return index
+
+    @staticmethod
+    def _tarinfo_at(tar, entry):
+        """Lee el TarInfo completo de una entrada del índice saltando a su cabecera"""
+        tar.offset = entry.offset
+        tar.members.clear()
+        return tar.next()
+
+    def list_archive(self, archive_path):
+        """Lista el contenido del .tar usando el índice"""
+        index = self.get_tar_index(archive_path)
+        total = 0
+        for entry in index:
+            kind = "d" if entry.isdir() else "-"
+            mtime = datetime.fromtimestamp(entry.mtime).strftime("%Y-%m-%d %H:%M")
+            print(f"{kind} {entry.size:>14,} {mtime}  {entry.name}")
+            total += entry.size
+        print(f"\n📦 {len(index)} miembros, {total / (1024*1024):.1f} MB")
+        return len(index)
+
+    def extract_member(self, archive_path, name, extract_to):
+        """Extrae una sola ruta del .tar saltando directamente a sus datos"""
+        index = self.get_tar_index(archive_path)
+        entry = index.find(name)
+        if entry is None:
+            print(f"❌ No existe en el archivo: {name}")
+            return False
+        dest_path = os.path.join(extract_to, entry.name)
+        if entry.isdir():
+            os.makedirs(dest_path, exist_ok=True)
+        elif entry.issparse():
+            with tarfile.open(archive_path, 'r:') as tar:
+                tar.extract(self._tarinfo_at(tar, entry), extract_to)
+        elif entry.isfile():
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            counters = {"bytes": 0, "files": 0}
+            self._extract_group_by_offset(archive_path, extract_to, [entry], counters, threading.Lock())
+        else:
+            print(f"⚠️  Tipo de miembro no soportado: {name}")
+            return False
+        print(f"✅ Extraído: {entry.name}")
+        return True
+
+    def installed_version(self, install_dir=None):
+        """Versión de ``.atlas_version.json`` o None si no hay instalación registrada"""
+        version_file = os.path.join(install_dir or self.install_dir, ".atlas_version.json")
         try:
-            # Abre como .tar simple, no .tar.gz
-            with tarfile.open(archive_path, 'r:') as tar:  # 'r:' para tar simple
-                members = tar.getmembers()
-                self.total_files = len(members)
-                self.processed_files = 0
-                
-                # Opcional: filtrar archivos muy pequeños o innecesarios
-                # members = [m for m in members if m.size > 0 or m.isdir()]
-                
-                print(f"📦 Total de miembros en el tar: {self.total_files}")
-                
-                for member in members:
+            with open(version_file, 'r') as f:
+                return json.load(f).get('version')
+        except (OSError, ValueError):
+            return None
+
+    def verify_install(self, install_dir=None, manifest=None):
+        """Compara la instalación con su índice (.atlas_index) y devuelve lo que falta o difiere.
+
+        Con un manifest (formato de ``PatchSystem.create_manifest``) también se
+        comprueba el hash de los archivos que lo tienen.
+        """
+        install_dir = install_dir or self.install_dir
+        index = TarIndex.load(os.path.join(install_dir, ".atlas_index"))
+        if index is None:
+            print("❌ No hay índice de instalación (.atlas_index) para verificar")
+            return None
+        # Índices de antes de aplicar un parche: describen otra versión
+        installed = self.installed_version(install_dir)
+        index_version = index.version or self.full_archive_version
+        if installed and installed != index_version:
+            print(f"❌ El índice de instalación es de la versión {index_version} y la instalada es la {installed}")
+            return None
+        problems = []
+        for entry in index:
+            # La tabla de duplicados se consume al instalar
+            if not entry.isfile() or entry.name == self.PATCH_DUPLICATES_FILE:
+                continue
+            reason = self._entry_problem(entry, manifest, install_dir)
+            if reason:
+                problems.append((entry.name, reason))
+        return problems
+
+    def _entry_problem(self, entry, manifest=None, install_dir=None):
+        """Motivo por el que el archivo de ``entry`` no está bien en disco, o None"""
+        path = os.path.join(install_dir or self.install_dir, entry.name)
+        try:
+            if os.path.getsize(path) != entry.size:
+                return "tamaño distinto"
+            info = manifest.get("files", {}).get(entry.name) if manifest else None
+            if info and self._file_digest(path, manifest.get("algo", "md5")) != info.get("hash"):
+                return "hash distinto"
+        except OSError:
+            return "falta"
+        return None
+
+    def _check_repaired(self, entries, manifest=None):
+        """Vuelve a comprobar los archivos reparados (con hash si el manifest lo tiene).
+
+        Devuelve (True, None) o (False, mensaje) con los que siguen mal.
+        """
+        problems = [(entry.name, reason) for entry in entries
+                    for reason in [self._entry_problem(entry, manifest)] if reason]
+        if not problems:
+            return True, None
+        listed = ", ".join(f"{name} ({reason})" for name, reason in problems[:5])
+        more = f" y {len(problems) - 5} más" if len(problems) > 5 else ""
+        return False, f"{len(problems)} archivo(s) siguen dañados tras reparar: {listed}{more}"
+
+    @staticmethod
+    def load_manifest(manifest_path):
+        """Carga un manifest JSON exportado con ``create_patches.py export-manifest``"""
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), dict):
+            raise ValueError("no tiene el formato de manifest")
+        return manifest
+
+    # ========== REPARACIÓN INCREMENTAL ==========
+    def _full_download_url(self):
+        file_id = self.drive_files["linux"]
+        return f"https://drive.google.com/uc?id={file_id}&export=download"
+
+    @staticmethod
+    def _file_digest(path, algo="md5"):
+        digest = hashlib.new(algo)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def find_damaged_files(self, index, manifest=None, install_dir=None):
+        """Miembros del índice que faltan o difieren en disco.
+
+        Compara tamaño y mtime con el índice y, si se da un manifest con el
+        formato de ``PatchSystem.create_manifest``, también el hash del archivo.
+        """
+        install_dir = install_dir or self.install_dir
+        manifest_files = manifest.get("files", {}) if manifest else {}
+        algo = manifest.get("algo", "md5") if manifest else None
+        damaged = []
+        for entry in index:
+            path = os.path.join(install_dir, entry.name)
+            if entry.isdir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            if not entry.isfile() or entry.name == self.PATCH_DUPLICATES_FILE:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                damaged.append(entry)
+                continue
+            if st.st_size != entry.size or abs(int(st.st_mtime) - entry.mtime) > 1:
+                damaged.append(entry)
+                continue
+            info = manifest_files.get(entry.name)
+            if info and self._file_digest(path, algo) != info.get("hash"):
+                damaged.append(entry)
+        return damaged
+
+    def _write_repaired(self, entry, fill):
+        """Escribe un miembro en un temporal junto al destino y lo reemplaza"""
+        dest_path = os.path.join(self.install_dir, entry.name)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".atlas_repair_", dir=os.path.dirname(dest_path))
+        try:
+            with os.fdopen(fd, 'wb') as dest:
+                fill(dest)
+            os.chmod(tmp_path, entry.mode & 0o7777)
+            os.utime(tmp_path, (entry.mtime, entry.mtime))
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _fetch_member_range(self, url, validator, start, end, entries, on_bytes):
+        """Descarga un rango del .tar remoto y escribe los miembros que contiene.
+        
+        Los duplicados se indexan con el offset de su origen: si el origen ya se
+        escribió en este rango, la copia sale de él en vez de leer del flujo.
+        """
+        done = 0
+        attempt = 0
+        written = {}  # offset_data -> ruta ya reparada con esos bytes
+        while done < len(entries):
+            headers = dict(self.http_headers)
+            range_start = entries[done].offset_data
+            headers['Range'] = f"bytes={range_start}-{end - 1}"
+            if validator:
+                headers['If-Range'] = validator
+            try:
+                with urlopen(Request(url, headers=headers), timeout=60) as response:
+                    if response.getcode() != 206:
+                        raise ValueError("el archivo cambió en el servidor")
+                    position = range_start
+                    while done < len(entries):
+                        entry = entries[done]
+                        if entry.offset_data < position:
+                            # Los bytes ya pasaron: solo puede ser un duplicado de un miembro escrito
+                            if entry.offset_data not in written:
+                                raise ValueError(f"miembros solapados en el índice: {entry.name}")
+
+                            def copy(dest, src_path=written[entry.offset_data]):
+                                with open(src_path, 'rb') as src:
+                                    shutil.copyfileobj(src, dest, 1024 * 1024)
+
+                            self._write_repaired(entry, copy)
+                            on_bytes(entry.size)
+                            done += 1
+                            continue
+
+                        # Saltar los bytes entre miembros (cabeceras y miembros sanos)
+                        while position < entry.offset_data:
+                            skipped = response.read(min(1024 * 1024, entry.offset_data - position))
+                            if not skipped:
+                                raise ConnectionError("conexión cerrada")
+                            position += len(skipped)
+
+                        def fill(dest):
+                            remaining = entry.size
+                            while remaining > 0:
+                                block = response.read(min(1024 * 1024, remaining))
+                                if not block:
+                                    raise ConnectionError("conexión cerrada")
+                                dest.write(block)
+                                remaining -= len(block)
+                                on_bytes(len(block))
+
+                        self._write_repaired(entry, fill)
+                        written[entry.offset_data] = os.path.join(self.install_dir, entry.name)
+                        position += entry.size
+                        done += 1
+                        attempt = 0
+            except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException):
+                attempt += 1
+                if attempt > self.download_retries:
+                    raise
+                time.sleep(min(self.retry_backoff * (2 ** (attempt - 1)), 60))
+
+    def _repair_from_full_archive(self, manifest, status_callback=None, progress_callback=None):
+        """Sin índice o sin rangos: descarga el .tar completo y extrae solo lo dañado"""
+        os.makedirs(self.download_dir, exist_ok=True)
+        archive_path = os.path.join(self.download_dir, "Atlas_Linux.tar")
+
+        def dl_progress(percent, downloaded, total, speed):
+            if progress_callback:
+                progress_callback(percent, "Descargando...")
+
+        if not self.download_segmented(self._full_download_url(), archive_path, progress_callback=dl_progress):
+            return False, "Error en la descarga"
+
+        index = self.get_tar_index(archive_path)
+        duplicates = index.find(self.PATCH_DUPLICATES_FILE)
+        if duplicates is not None:
+            # Las rutas repetidas no son miembros del .tar: se reparan desde su origen
+            with open(archive_path, 'rb') as f:
+                f.seek(duplicates.offset_data)
+                self._index_duplicates(index, json.loads(f.read(duplicates.size)))
+        damaged = self.find_damaged_files(index, manifest)
+        if status_callback:
+            status_callback(f"Restaurando {len(damaged)} archivo(s) desde el archivo descargado...")
+        fd = os.open(archive_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            for entry in damaged:
+                if entry.issparse():
+                    with tarfile.open(archive_path, 'r:') as tar:
+                        tar.extract(self._tarinfo_at(tar, entry), self.install_dir)
+                    continue
+
+                def fill(dest, entry=entry):
+                    self._copy_range(fd, dest.fileno(), entry.offset_data, entry.size)
+
+                self._write_repaired(entry, fill)
+        finally:
+            os.close(fd)
+
+        ok, message = self._check_repaired(damaged, manifest)
+        if not ok:
+            return False, message
+
+        index.source = self.download_validator or ""
+        index.version = self.full_archive_version
+        index.save(os.path.join(self.install_dir, ".atlas_index"))
+        os.remove(archive_path)
+        if os.path.exists(archive_path + ".idx"):
+            os.remove(archive_path + ".idx")
+        return True, f"Reparados {len(damaged)} archivo(s)"
+
+    def repair_install(self, manifest_path=None, progress_callback=None, status_callback=None):
+        """Repara una instalación interrumpida o dañada descargando solo lo necesario.
+
+        Usa el índice ``.atlas_index`` de la instalación para saber qué miembros
+        faltan o difieren y los pide con ``Range`` al .tar remoto (agrupando
+        miembros cercanos en un mismo rango). Si no hay índice, el archivo
+        remoto cambió o el servidor no admite rangos, descarga el .tar completo
+        (reanudable) y extrae solo los miembros dañados.
+        
+        El archivo completo es la versión ``full_archive_version``: si ya se
+        aplicaron parches, repararla desde él la bajaría de versión y no se hace.
+        """
+        installed = self.installed_version()
+        if installed and installed != self.full_archive_version:
+            return False, (f"La instalación está en la versión {installed} y el archivo completo es la "
+                           f"{self.full_archive_version}: reparar la bajaría de versión. "
+                           "Reinstala para volver a una instalación reparable.")
+
+        manifest = None
+        if manifest_path:
+            try:
+                manifest = self.load_manifest(manifest_path)
+            except (OSError, ValueError) as e:
+                return False, f"No se pudo leer el manifest {manifest_path}: {e}"
+
+        try:
+            return self._repair_install(manifest, progress_callback, status_callback)
+        except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException) as e:
+            return False, f"Error de conexión: {e}"
+        except (OSError, ValueError, tarfile.TarError) as e:
+            return False, f"Error durante la reparación: {e}"
+
+    def _repair_install(self, manifest, progress_callback=None, status_callback=None):
+        """Cuerpo de ``repair_install``: las excepciones las convierte él en (False, mensaje)"""
+        index = TarIndex.load(os.path.join(self.install_dir, ".atlas_index"))
+        if index is None:
+            if status_callback:
+                status_callback("Sin índice de instalación: se descargará el archivo completo")
+            return self._repair_from_full_archive(manifest, status_callback, progress_callback)
+
+        if status_callback:
+            status_callback("Comprobando archivos instalados...")
+        damaged = [e for e in self.find_damaged_files(index, manifest) if not e.issparse()]
+        if not damaged:
+            return True, "La instalación está completa, no hay nada que reparar"
+
+        url = self._full_download_url()
+        try:
+            total_size, validator, accepts_ranges = self._probe_download(url)
+        except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException) as e:
+            return False, f"Error de conexión: {e}"
+
+        if (not accepts_ranges or total_size != index.archive_size
+                or (index.source and validator and index.source != validator)):
+            if status_callback:
+                status_callback("El archivo remoto no permite reparar por rangos, descargándolo completo")
+            return self._repair_from_full_archive(manifest, status_callback, progress_callback)
+
+        # Agrupar miembros cercanos en un mismo rango (hueco máximo de 1 MB)
+        damaged.sort(key=lambda e: e.offset_data)
+        ranges = []
+        for entry in damaged:
+            if ranges and entry.offset_data - ranges[-1][1] <= 1024 * 1024:
+                ranges[-1][1] = max(ranges[-1][1], entry.offset_data + entry.size)
+                ranges[-1][2].append(entry)
+            else:
+                ranges.append([entry.offset_data, entry.offset_data + entry.size, [entry]])
+
+        total_bytes = sum(e.size for e in damaged) or 1
+        fetched = [0]
+        lock = threading.Lock()
+
+        def on_bytes(n):
+            with lock:
+                fetched[0] += n
+
+        if status_callback:
+            status_callback(f"Reparando {len(damaged)} archivo(s): {total_bytes / (1024*1024):.1f} MB en {len(ranges)} rango(s)")
+
+        with ThreadPoolExecutor(max_workers=max(1, self.download_connections)) as pool:
+            pending = {pool.submit(self._fetch_member_range, url, validator, start, end, entries, on_bytes)
+                       for start, end, entries in ranges}
+            while pending:
+                done, pending = wait(pending, timeout=0.5)
+                for future in done:
+                    if future.exception() is not None:
+                        # La reparación ya falló: los rangos que no empezaron no se piden
+                        for other in pending:
+                            other.cancel()
+                        future.result()
+                if progress_callback:
+                    progress_callback(fetched[0] / total_bytes * 100, "Reparando...")
+
+        ok, message = self._check_repaired(damaged, manifest)
+        if not ok:
+            return False, message
+        return True, f"Reparados {len(damaged)} archivo(s) ({fetched[0] / (1024*1024):.1f} MB descargados)"
+
+    # ========== ESCRITURA DE MIEMBROS (ARCHIVOS PEQUEÑOS) ==========
+    # Hasta este tamaño los datos se leen de una vez y se escriben con os.write
+    SMALL_FILE_LIMIT = 256 * 1024
+    _WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+
+    @staticmethod
+    def _ensure_dir(path, created_dirs):
+        """Crea el directorio solo la primera vez que aparece (y marca sus padres)"""
+        if not path or path in created_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        while path and path not in created_dirs:
+            created_dirs.add(path)
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+
+    def _write_small_file(self, dest_path, data):
+        """Escribe un archivo pequeño con os.open/os.write, sin objeto archivo"""
+        fd = os.open(dest_path, self._WRITE_FLAGS, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+    def _write_member_at(self, src_fd, member, dest_path, on_copied=None):
+        """Escribe un miembro leyendo el .tar por desplazamiento"""
+        if member.size <= self.SMALL_FILE_LIMIT and hasattr(os, 'pread'):
+            data = os.pread(src_fd, member.size, member.offset_data)
+            if len(data) != member.size:
+                raise EOFError(f"archivo truncado en {member.name}")
+            self._write_small_file(dest_path, data)
+            if on_copied:
+                on_copied(len(data))
+        else:
+            dest_fd = os.open(dest_path, self._WRITE_FLAGS, 0o644)
+            try:
+                self._copy_range(src_fd, dest_fd, member.offset_data, member.size, on_copied)
+            except EOFError:
+                raise EOFError(f"archivo truncado en {member.name}")
+            finally:
+                os.close(dest_fd)
+        # Conservar mtime del archivo para poder detectar cambios al reparar
+        os.utime(dest_path, (member.mtime, member.mtime))
+
+    def _write_member_stream(self, tar, member, dest_path):
+        """Escribe un miembro leído del flujo de tarfile (.tar.gz o streaming)"""
+        with tar.extractfile(member) as source:
+            if member.size <= self.SMALL_FILE_LIMIT:
+                self._write_small_file(dest_path, source.read())
+            else:
+                with open(dest_path, 'wb') as dest:
+                    shutil.copyfileobj(source, dest, 1024 * 1024)
+        os.utime(dest_path, (member.mtime, member.mtime))
+
+    # ========== EXTRACCIÓN ZIP ==========
+    @staticmethod
+    def _safe_member_path(extract_to, name):
+        """Ruta de destino de un miembro o None si intenta salir del directorio"""
+        parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.')]
+        if not parts or '..' in parts or ':' in parts[0]:
+            return None
+        return os.path.join(extract_to, *parts)
+
+    def extract_zip_with_progress(self, archive_path, extract_to, progress_callback=None, workers=None):
+        """Extrae un .zip en paralelo usando el directorio central.
+
+        Los miembros se reparten entre procesos en grupos equilibrados por tamaño
+        comprimido; cada proceso descomprime en flujo sus miembros directamente en
+        su destino. El progreso se informa por bytes comprimidos procesados.
+        """
+        if workers is None:
+            workers = self.extract_workers
+
+        with zipfile.ZipFile(archive_path) as zf:
+            infos = zf.infolist()
+
+        created_dirs = set()
+        files = []
+        for info in infos:
+            dest_path = self._safe_member_path(extract_to, info.filename)
+            if dest_path is None:
+                print(f"⚠️  Saltando ruta no segura: {info.filename}")
+                continue
+            if info.is_dir():
+                self._ensure_dir(dest_path, created_dirs)
+            else:
+                self._ensure_dir(os.path.dirname(dest_path), created_dirs)
+                files.append(info)
+
+        self.total_files = len(files)
+        self.processed_files = 0
+        self.extraction_method = "zip_groups" if workers > 1 else "sequential"
+        total_bytes = sum(info.compress_size for info in files) or 1
+        counters = {"bytes": 0}
+        print(f"📦 Total de miembros en el zip: {self.total_files} ({workers} procesos)")
+
+        # Grupos más pequeños que el número de procesos para repartir mejor la cola
+        groups = self._plan_extract_groups(files, workers * 4 if workers > 1 else 1,
+                                           key=lambda info: info.compress_size)
+        names = [[info.filename for info in group] for group in groups]
+
+        if workers <= 1:
+            progress_queue = queue.SimpleQueue()
+            _zip_worker_init(progress_queue)
+            try:
+                for group in names:
+                    _extract_zip_group(archive_path, extract_to, group)
+                    self._drain_zip_progress(progress_queue, counters, total_bytes, progress_callback)
+            finally:
+                _zip_worker_init(None)
+        else:
+            context = multiprocessing.get_context("spawn")
+            progress_queue = context.Queue()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_zip_worker_init, initargs=(progress_queue,)) as pool:
+                pending = {pool.submit(_extract_zip_group, archive_path, extract_to, group) for group in names}
+                while pending:
+                    done, pending = wait(pending, timeout=0.5)
+                    for future in done:
+                        future.result()
+                    self._drain_zip_progress(progress_queue, counters, total_bytes, progress_callback)
+            self._drain_zip_progress(progress_queue, counters, total_bytes, progress_callback)
+
+        self.processed_files = self.total_files
+        if progress_callback:
+            progress_callback(100, self.processed_files, self.total_files)
+        print(f"✅ Extracción completada: {self.processed_files} archivos")
+        return True
+
+    def _drain_zip_progress(self, progress_queue, counters, total_bytes, progress_callback):
+        """Suma el progreso enviado por los procesos y lo reporta"""
+        updated = False
+        while True:
+            try:
+                files, consumed = progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.processed_files += files
+            counters["bytes"] += consumed
+            updated = True
+        if updated and progress_callback:
+            percent = min(counters["bytes"] / total_bytes * 100, 100)
+            progress_callback(percent, self.processed_files, self.total_files)
+
+    # ========== EXTRACCIÓN PARALELA ==========
+    @staticmethod
+    def _plan_extract_groups(members, groups, key=lambda m: m.size):
+        """Reparte miembros en grupos equilibrados por bytes (mayores primero)"""
+        buckets = [(0, i, []) for i in range(max(1, groups))]
+        heapq.heapify(buckets)
+        for member in sorted(members, key=key, reverse=True):
+            size, i, items = heapq.heappop(buckets)
+            items.append(member)
+            heapq.heappush(buckets, (size + key(member), i, items))
+        return [items for _, _, items in sorted(buckets, key=lambda b: b[1]) if items]
+
+    # Errores con los que se pasa al siguiente método de copia
+    _ZERO_COPY_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF, errno.EPERM,
+                         errno.EOPNOTSUPP, getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP)}
+    _copy_buffer = threading.local()
+
+    def _copy_range(self, src_fd, dst_fd, offset, size, on_copied=None):
+        """Copia ``size`` bytes desde ``offset`` de src_fd a dst_fd sin pasar por Python.
+
+        Usa ``os.copy_file_range`` (el kernel copia o clona bloques), luego
+        ``os.sendfile`` y por último lecturas grandes en un búfer reutilizable.
+        El método que falla se descarta para el resto de la extracción.
+        """
+        chunk = 64 * 1024 * 1024
+        dst_offset = 0
+        remaining = size
+
+        while remaining > 0:
+            method = self.copy_method
+            try:
+                if method == "copy_file_range":
+                    copied = os.copy_file_range(src_fd, dst_fd, min(chunk, remaining), offset, dst_offset)
+                elif method == "sendfile":
+                    os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+                    copied = os.sendfile(dst_fd, src_fd, offset, min(chunk, remaining))
+                else:
+                    copied = self._copy_range_buffered(src_fd, dst_fd, offset, dst_offset, min(chunk, remaining))
+            except OSError as e:
+                if method == "buffered" or e.errno not in self._ZERO_COPY_ERRNOS:
+                    raise
+                self.copy_method = "sendfile" if method == "copy_file_range" and hasattr(os, 'sendfile') else "buffered"
+                continue
+
+            if copied == 0:
+                raise EOFError("archivo truncado")
+            offset += copied
+            dst_offset += copied
+            remaining -= copied
+            if on_copied:
+                on_copied(copied)
+
+    def _copy_range_buffered(self, src_fd, dst_fd, offset, dst_offset, size):
+        """Último recurso: lecturas de 8 MB en un búfer reutilizado por hilo"""
+        buffer = getattr(self._copy_buffer, "view", None)
+        if buffer is None:
+            buffer = self._copy_buffer.view = memoryview(bytearray(8 * 1024 * 1024))
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+        copied = 0
+        with open(src_fd, 'rb', buffering=0, closefd=False) as src:
+            while copied < size:
+                n = src.readinto(buffer[:min(len(buffer), size - copied)])
+                if not n:
+                    break
+                os.write(dst_fd, buffer[:n])
+                copied += n
+        return copied
+
+    def _extract_group_by_offset(self, archive_path, extract_to, members, counters, lock):
+        """Copia los datos de cada miembro desde el .tar por desplazamiento (copia cero)"""
+        def on_copied(n):
+            with lock:
+                counters["bytes"] += n
+
+        fd = os.open(archive_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            for member in members:
+                self._write_member_at(fd, member, os.path.join(extract_to, member.name), on_copied)
+                with lock:
+                    counters["files"] += 1
+        finally:
+            os.close(fd)
+
+    def extract_tar_parallel(self, archive_path, extract_to, progress_callback=None, workers=None):
+        """Extrae un .tar sin comprimir en paralelo usando offset_data de cada miembro.
+
+        Los directorios se crean primero; los archivos se reparten en grupos
+        equilibrados por tamaño y cada hilo copia sus regiones de datos leyendo el
+        .tar por desplazamiento. El progreso se informa en conjunto.
+        """
+        if workers is None:
+            workers = self.extract_workers
+
+        index = self.get_tar_index(archive_path)
+        members = list(index)
+        self.total_files = len([m for m in members if m.isfile() or m.isdir()])
+        self.processed_files = 0
+        print(f"📦 Total de miembros en el tar: {self.total_files} ({workers} hilos)")
+
+        # Directorios primero (en orden de árbol) para que los hilos no compitan
+        parents = set()
+        for member in members:
+            if member.isdir():
+                parents.add(os.path.join(extract_to, member.name))
+            elif member.isfile():
+                parents.add(os.path.dirname(os.path.join(extract_to, member.name)))
+        created_dirs = set()
+        for directory in sorted(parents):
+            self._ensure_dir(directory, created_dirs)
+        self.processed_files = len([m for m in members if m.isdir()])
+
+        # Los miembros dispersos (sparse) no tienen datos contiguos
+        regular = [m for m in members if m.isfile() and not m.issparse()]
+        sparse = [m for m in members if m.issparse()]
+        if sparse:
+            with tarfile.open(archive_path, 'r:') as tar:
+                for entry in sparse:
+                    tar.extract(self._tarinfo_at(tar, entry), extract_to)
+                    self.processed_files += 1
+
+        self.extraction_method = "incremental_groups"
+        total_bytes = sum(m.size for m in regular) or 1
+        counters = {"bytes": 0, "files": self.processed_files}
+        lock = threading.Lock()
+        groups = self._plan_extract_groups(regular, workers)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._extract_group_by_offset, archive_path, extract_to, group, counters, lock)
+                       for group in groups]
+            pending = set(futures)
+            last_printed = 0
+            while pending:
+                done, pending = wait(pending, timeout=0.5)
+                for future in done:
+                    future.result()
+                with lock:
+                    self.processed_files = counters["files"]
+                    copied = counters["bytes"]
+                if progress_callback:
+                    progress_callback(copied / total_bytes * 100, self.processed_files, self.total_files)
+                if self.processed_files - last_printed >= 1000:
+                    last_printed = self.processed_files
+                    print(f"📁 Procesados: {self.processed_files}/{self.total_files} archivos")
+
+        print(f"✅ Extracción completada: {self.processed_files} archivos")
+        return True
+
+    # ========== BENCHMARK DE EXTRACCIÓN ==========
+    def benchmark_extraction(self, n_files=100_000, file_size=512):
+        """Compara archivos/s de la extracción anterior frente a la actual.
+
+        Crea un .tar sintético con ``n_files`` archivos pequeños repartidos en
+        subdirectorios y lo extrae con el bucle original (makedirs + objeto
+        archivo por miembro), con la pasada secuencial y con la paralela.
+        """
+        bench_dir = tempfile.mkdtemp(prefix="atlas_bench_", dir=self.temp_dir)
+        archive_path = os.path.join(bench_dir, "bench.tar")
+        payload = os.urandom(file_size)
+
+        print(f"🧪 Creando .tar sintético con {n_files:,} archivos de {file_size} bytes...")
+        with tarfile.open(archive_path, 'w') as tar:
+            for i in range(n_files):
+                info = tarfile.TarInfo(f"Atlas/datos/{i // 10000:02d}/{(i // 100) % 100:02d}/f{i:06d}.bin")
+                info.size = file_size
+                info.mtime = time.time()
+                tar.addfile(info, io.BytesIO(payload))
+
+        def legacy(extract_to):
+            with tarfile.open(archive_path, 'r:') as tar:
+                for member in tar.getmembers():
                     dest_path = os.path.join(extract_to, member.name)
-                    
-                    # Saltar si es un enlace simbólico o dispositivo especial
-                    if not member.isfile() and not member.isdir():
-                        continue
-                    
-                    # Crear directorios necesarios
                     if member.isdir():
                         os.makedirs(dest_path, exist_ok=True)
-                    else:
+                    elif member.isfile():
                         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                        
-                        try:
-                            with tar.extractfile(member) as source, open(dest_path, 'wb') as dest:
-                                shutil.copyfileobj(source, dest)
-                        except (AttributeError, KeyError) as e:
-                            # Algunos miembros pueden no tener contenido (como enlaces)
-                            print(f"⚠️  Saltando {member.name}: {e}")
-                            continue
-                    
-                    self.processed_files += 1
-                    
-                    if progress_callback:
-                        percent = (self.processed_files / self.total_files) * 100
-                        progress_callback(percent, self.processed_files, self.total_files)
-                    
-                    # Mostrar progreso cada 100 archivos
-                    if self.processed_files % 100 == 0:
-                        print(f"📁 Procesados: {self.processed_files}/{self.total_files} archivos")
-                
-                print(f"✅ Extracción completada: {self.processed_files} archivos")
-                return True
+                        with tar.extractfile(member) as source, open(dest_path, 'wb') as dest:
+                            shutil.copyfileobj(source, dest)
+
+        workers = self.extract_workers
+        modes = [
+            ("original (makedirs + open por miembro)", legacy),
+            ("secuencial (caché de dirs + os.write)", None),
+            (f"paralela ({max(2, workers)} hilos)", None),
+        ]
+        results = {}
+        try:
+            for i, (label, func) in enumerate(modes):
+                extract_to = os.path.join(bench_dir, f"out{i}")
+                os.makedirs(extract_to)
+                start = time.perf_counter()
+                with open(os.devnull, 'w') as devnull:
+                    saved_stdout, sys.stdout = sys.stdout, devnull
+                    try:
+                        if func:
+                            func(extract_to)
+                        else:
+                            self.extract_workers = 1 if i == 1 else max(2, workers)
+                            self.extract_tar_with_progress(archive_path, extract_to)
+                    finally:
+                        sys.stdout = saved_stdout
+                        self.extract_workers = workers
+                elapsed = time.perf_counter() - start
+                results[label] = n_files / elapsed
+                print(f"  {label:<42}: {elapsed:7.2f}s  {n_files / elapsed:>10,.0f} archivos/s")
+                if os.path.exists(archive_path + ".idx"):
+                    os.remove(archive_path + ".idx")
+                shutil.rmtree(extract_to, ignore_errors=True)
+        finally:
+            shutil.rmtree(bench_dir, ignore_errors=True)
+
+        base = results[modes[0][0]]
+        for label, rate in list(results.items())[1:]:
+            print(f"  ⚡ {label}: x{rate / base:.2f} frente al original")
+        return results
+
+    def extract_tar_with_progress(self, archive_path, extract_to, progress_callback=None):
+        """Extrae .tar simple (sin comprimir) con callback de progreso"""
+        try:
+            if self.extract_workers > 1:
+                return self.extract_tar_parallel(archive_path, extract_to, progress_callback)
+            
+            # Abre como .tar simple (acceso directo para copiar por desplazamiento), no .tar.gz
+            return self._extract_tar_single_pass(archive_path, extract_to, 'r:', progress_callback)
                 
         except tarfile.ReadError as e:
             print(f"❌ Error leyendo archivo tar: {e}")
@@ -515,7 +1880,10 @@ CARACTERÍSTICAS:
             "installed": True,
             "install_date": datetime.now().isoformat(),
             "install_path": self.install_dir,
-            "total_files": self.count_files()
+            "total_files": self.count_files(),
+            "download_resumable": True,
+            "download_attempts": self.download_attempts,
+            "extraction_method": self.extraction_method
         }
         
         version_file = os.path.join(self.install_dir, ".atlas_version.json")
@@ -601,8 +1969,10 @@ StartupNotify=true
                     'id': file['id'],
                     'name': file['name'],
                     'size': f"{int(file.get('size', 0)) / (1024*1024):.1f}MB",
+                    'bytes': int(file.get('size', 0)),
                     'date': file['modifiedTime'][:10],  # Solo fecha
-                    'version': self.extract_version_from_name(file['name'])
+                    'version': self.extract_version_from_name(file['name']),
+                    'base': self.extract_base_from_name(file['name'])
                 })
             
             return patches
@@ -614,10 +1984,128 @@ StartupNotify=true
     def extract_version_from_name(self, filename):
         """Extrae versión del nombre del archivo"""
         # Ejemplo: "atlas_patch_v1.0.1.tar.gz" -> "1.0.1"
+        # Ejemplo: "patch_20250101_120000.tar.gz" -> "20250101_120000"
+        # Ejemplo: "squash_1.0.0_to_20250101_120000.tar.gz" -> "20250101_120000"
         import re
+        match = re.search(r'(?:^|_to_|patch_)(\d{8}_\d{6})', filename)
+        if match:
+            return match.group(1)
         match = re.search(r'v?(\d+\.\d+\.\d+)', filename)
         return match.group(1) if match else "1.0.0"
     
+    def extract_base_from_name(self, filename):
+        """Versión de partida de un parche acumulativo (None en parches normales)"""
+        # Ejemplo: "squash_1.0.0_to_20250101_120000.tar.gz" -> "1.0.0"
+        import re
+        match = re.match(r'squash_(.+?)_to_', filename)
+        return match.group(1) if match else None
+    
+    @staticmethod
+    def parse_version(version):
+        """Clave de orden para versiones "X.Y.Z" y releases "AAAAMMDD_HHMMSS".
+        
+        Compara numéricamente ("1.0.10" > "1.0.9"); las releases con timestamp
+        (parches de create_patches.py) van después de cualquier versión X.Y.Z.
+        """
+        match = re.fullmatch(r'(\d{8})_(\d{6})', version or "")
+        if match:
+            return (1, int(match.group(1)), int(match.group(2)))
+        return (0,) + tuple(int(part) for part in re.findall(r'\d+', version or ""))
+    
+    def plan_updates(self, current_version=None, patches=None, include_full=True):
+        """Planifica la actualización con menos bytes de descarga.
+        
+        Construye un grafo de versiones: cada parche normal va de la versión
+        anterior de la cadena a la suya, cada acumulativo de su base a su
+        versión, y la reinstalación completa lleva a ``full_archive_version``.
+        Con Dijkstra elige el camino más barato hasta la versión más nueva.
+        
+        Devuelve {"current", "target", "steps", "bytes", "seconds"}; los pasos
+        son los dicts de ``list_patches`` en orden de aplicación (la
+        reinstalación completa lleva ``'full': True``).
+        """
+        if current_version is None:
+            version_file = os.path.join(self.install_dir, ".atlas_version.json")
+            with open(version_file, 'r') as f:
+                current_version = json.load(f).get('version', '1.0.0')
+        if patches is None:
+            patches = self.list_patches()
+        
+        key = self.parse_version
+        edges = {}
+        
+        def add_edge(source, target, step):
+            edges.setdefault(source, []).append((target, step.get('bytes', 0), step))
+        
+        regular = sorted((p for p in patches if not p.get('base')), key=lambda p: key(p['version']))
+        chain = sorted({self.full_archive_version} | {p['version'] for p in regular}, key=key)
+        for patch in regular:
+            older = [v for v in chain if key(v) < key(patch['version'])]
+            if older:
+                add_edge(older[-1], patch['version'], patch)
+        
+        # Una versión que no está en la cadena entra por el primer parche más nuevo
+        if current_version not in chain:
+            following = [p for p in regular if key(p['version']) > key(current_version)]
+            if following:
+                add_edge(current_version, following[0]['version'], following[0])
+        
+        for patch in patches:
+            if patch.get('base'):
+                add_edge(patch['base'], patch['version'], patch)
+        
+        if include_full and current_version != self.full_archive_version:
+            try:
+                full_bytes, _, _ = self._probe_download(self._full_download_url())
+                add_edge(current_version, self.full_archive_version, {
+                    'id': None,
+                    'name': 'Reinstalación completa',
+                    'size': f"{full_bytes / (1024*1024):.1f}MB",
+                    'bytes': full_bytes,
+                    'date': '',
+                    'version': self.full_archive_version,
+                    'full': True
+                })
+            except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException, ValueError):
+                pass
+        
+        # Dijkstra por bytes (a igual coste, menos pasos)
+        best = {current_version: (0, 0, [])}
+        heap = [(0, 0, 0, current_version)]
+        counter = 1
+        while heap:
+            cost, steps, _, version = heapq.heappop(heap)
+            if (cost, steps) > best[version][:2]:
+                continue
+            for target, edge_bytes, step in edges.get(version, []):
+                candidate = (cost + edge_bytes, steps + 1)
+                if target not in best or candidate < best[target][:2]:
+                    best[target] = candidate + (best[version][2] + [step],)
+                    heapq.heappush(heap, candidate + (counter, target))
+                    counter += 1
+        
+        target = max(best, key=key)
+        if key(target) <= key(current_version):
+            target = current_version
+        total_bytes, _, steps = best[target]
+        bandwidth = self.download_speed or self.estimated_bandwidth
+        return {
+            "current": current_version,
+            "target": target,
+            "steps": steps,
+            "bytes": total_bytes,
+            "seconds": total_bytes / bandwidth if bandwidth else 0
+        }
+    
+    def describe_update_plan(self, plan=None):
+        """Resumen de una línea del plan de actualización (bytes y tiempo estimado)"""
+        plan = plan or self.update_plan
+        if not plan or not plan["steps"]:
+            return "✅ Sin actualizaciones pendientes"
+        minutes, seconds = divmod(int(plan["seconds"]), 60)
+        return (f"📦 v{plan['current']} → v{plan['target']}: "
+                f"{plan['bytes'] / (1024*1024):.1f} MB, ~{minutes}m {seconds:02d}s de descarga")
+    
     def download_patch(self, patch_id, destination, progress_callback=None):
         """Descarga un parche específico"""
         if not self.service:
@@ -657,16 +2145,9 @@ StartupNotify=true
             
             current_version = current_info.get('version', '1.0.0')
             
-            # Obtener parches reales de Drive
-            available_patches = self.list_patches()
-            
-            # Filtrar solo parches con versión mayor
-            newer_patches = []
-            for patch in available_patches:
-                if patch['version'] > current_version:
-                    newer_patches.append(patch)
-            
-            return newer_patches
+            # Plan más barato con los parches reales de Drive, en orden de aplicación
+            self.update_plan = self.plan_updates(current_version)
+            return self.update_plan["steps"]
             
         except Exception as e:
             print(f"Error verificando actualizaciones: {e}")
@@ -674,38 +2155,382 @@ StartupNotify=true
 
 
 
+    def _patch_download_path(self, patch_info):
+        """Ruta fija de descarga de un parche (reanudable; conserva la extensión)"""
+        return os.path.join(self.download_dir, f"{patch_info['id']}_{os.path.basename(patch_info['name'])}")
+    
+    def _download_patch_file(self, patch_info, progress_callback=None):
+        """Descarga un parche a su ruta fija y la devuelve (None si falla)"""
+        os.makedirs(self.download_dir, exist_ok=True)
+        patch_url = f"https://drive.google.com/uc?id={patch_info['id']}&export=download"
+        patch_path = self._patch_download_path(patch_info)
+        if not self.download_with_progress(patch_url, patch_path, progress_callback):
+            return None
+        return patch_path
+    
+    def _apply_patch_file(self, patch_info, patch_path, progress_callback=None):
+        """Aplica un parche ya descargado y actualiza la versión instalada"""
+        try:
+            patch_format = self._read_patch_format(patch_path)
+        except (OSError, ValueError, tarfile.TarError, zipfile.BadZipFile) as e:
+            print(f"❌ Parche ilegible: {patch_info['name']}: {e}")
+            return False
+        if patch_format > self.PATCH_FORMAT:
+            print(f"❌ {patch_info['name']} usa el formato de parche {patch_format} y este instalador "
+                  f"solo entiende hasta el {self.PATCH_FORMAT}: descarga la última versión del instalador")
+            return False
+        
+        # El índice describe los miembros del archivo completo: deja de valer en cuanto cambia un archivo
+        index_path = os.path.join(self.install_dir, ".atlas_index")
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        
+        if not self.extract_archive_with_progress(patch_path, self.install_dir, progress_callback):
+            return False
+        
+        # Archivos grandes por chunks, duplicados y archivos eliminados
+        self._apply_patch_metadata(self.install_dir)
+        
+        # Actualizar versión
+        self.update_version(patch_info['version'])
+        
+        # Limpiar
+        os.remove(patch_path)
+        return True
+    
     def apply_patch(self, patch_info, progress_callback=None, status_callback=None):
         """Aplica un parche"""
+        if patch_info.get('full'):
+            # Paso de reinstalación completa del plan de actualización
+            return self.install_full_version(progress_callback, status_callback)
+        
         try:
             # Descargar parche
-            patch_url = f"https://drive.google.com/uc?id={patch_info['id']}&export=download"  # Cambia 'file_id' por 'id'
-            patch_path = os.path.join(self.temp_dir, f"patch_{patch_info['id']}.tar")  # Sin .gz
-            
             if status_callback:
                 status_callback(f"Descargando {patch_info['name']}...")
             
-            if not self.download_with_progress(patch_url, patch_path, progress_callback):
+            patch_path = self._download_patch_file(patch_info, progress_callback)
+            if not patch_path:
                 return False, "Error descargando parche"
             
             # Aplicar parche
             if status_callback:
                 status_callback(f"Aplicando {patch_info['name']}...")
             
-            # Usa la función automática
-            if not self.extract_archive_with_progress(patch_path, self.install_dir, progress_callback):
+            if not self._apply_patch_file(patch_info, patch_path, progress_callback):
                 return False, "Error aplicando parche"
             
-            # Actualizar versión
-            self.update_version(patch_info['version'])
-            
-            # Limpiar
-            os.remove(patch_path)
-            
             return True, f"Parche {patch_info['name']} aplicado exitosamente"
             
         except Exception as e:
             return False, f"Error aplicando parche: {str(e)}"
+    
+    def apply_patches(self, patches, progress_callback=None, status_callback=None, prefetch=None):
+        """Aplica una lista ordenada de parches descargando por delante.
+        
+        Un hilo descarga los parches en orden y los deja en una cola acotada
+        (``prefetch`` parches descargados a la espera como máximo) mientras el
+        hilo que llama los aplica estrictamente en orden: la red y el disco
+        trabajan a la vez. Si un paso falla se detiene todo; los parches ya
+        descargados quedan en ``download_dir`` para reanudar.
+        
+        ``progress_callback(percent, texto)`` recibe el avance global.
+        """
+        patches = list(patches)
+        if not patches:
+            return True, "No hay parches que aplicar"
+        if prefetch is None:
+            prefetch = self.patch_prefetch
+        
+        ready = queue.Queue(maxsize=max(1, prefetch))
+        stop = threading.Event()
+        full_done = threading.Event()
+        total = len(patches)
+        applied = [0]
+        
+        def report(fraction, text):
+            if progress_callback:
+                progress_callback((applied[0] + fraction) / total * 100, text)
+        
+        def put(item):
+            # put() con espera acotada para poder cancelar
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def downloader():
+            for number, patch in enumerate(patches, 1):
+                if stop.is_set():
+                    return
+                if patch.get('full'):
+                    # La reinstalación descarga por su cuenta; esperar a que termine
+                    if not put((patch, None, None)):
+                        return
+                    full_done.wait()
+                    continue
+                if status_callback:
+                    status_callback(f"Descargando {number}/{total}: {patch['name']}")
+                try:
+                    patch_path = self._download_patch_file(patch)
+                    error = None if patch_path else "Error descargando parche"
+                except Exception as e:
+                    patch_path, error = None, f"Error descargando parche: {e}"
+                if not put((patch, patch_path, error)) or error:
+                    return
+        
+        thread = threading.Thread(target=downloader, daemon=True)
+        thread.start()
+        
+        try:
+            for number in range(1, total + 1):
+                report(0, f"Esperando descarga {number}/{total}...")
+                patch, patch_path, error = ready.get()
+                if error:
+                    return False, f"{patch['name']}: {error}"
+                
+                if status_callback:
+                    status_callback(f"Aplicando {number}/{total}: {patch['name']}")
+                
+                if patch.get('full'):
+                    try:
+                        success, message = self.install_full_version(
+                            lambda percent, text: report(percent / 100, text), status_callback)
+                    finally:
+                        full_done.set()
+                    if not success:
+                        return False, message
+                else:
+                    try:
+                        ok = self._apply_patch_file(
+                            patch, patch_path,
+                            lambda percent, *_: report(percent / 100, f"Aplicando {patch['name']}..."))
+                    except Exception as e:
+                        return False, f"Error aplicando {patch['name']}: {e}"
+                    if not ok:
+                        return False, f"Error aplicando {patch['name']}"
+                
+                applied[0] += 1
+                report(0, f"{applied[0]}/{total} parches aplicados")
+            
+            return True, f"{total} parche(s) aplicados exitosamente"
+        
+        finally:
+            stop.set()
+            full_done.set()
+            thread.join(timeout=1)
+
+    # Metadatos que create_patches.py agrega a los parches
+    PATCH_CHUNKED_FILES = ".chunked_files.json"
+    PATCH_CHUNKS_DIR = ".chunks"
+    PATCH_DELETED_FILES = ".deleted_files.txt"
+    PATCH_DUPLICATES_FILE = ".duplicates.json"
+    PATCH_RENAMES_FILE = ".renames.json"
+    # Formato de parche más nuevo que entiende este instalador (PATCH_FORMAT de
+    # create_patches.py); los parches de formato 2 o posterior lo declaran en
+    # su primer miembro y los de formato 1 no llevan marca
+    PATCH_FORMAT = 2
+    PATCH_FORMAT_FILE = ".patch_format.json"
 
+    def _read_patch_format(self, patch_path):
+        """Formato declarado por un parche (1 si no lleva ``PATCH_FORMAT_FILE``)"""
+        if patch_path.endswith('.zip'):
+            with zipfile.ZipFile(patch_path, 'r') as zipf:
+                if self.PATCH_FORMAT_FILE not in zipf.namelist():
+                    return 1
+                return json.loads(zipf.read(self.PATCH_FORMAT_FILE)).get("format", 1)
+        # Solo se lee el primer miembro: no hace falta recorrer el .tar(.gz)
+        with open(patch_path, 'rb') as raw, contextlib.ExitStack() as stack:
+            source, mode = raw, 'r|*'
+            if ParallelGzipReader.detect(patch_path):
+                # tarfile en flujo no lee gzip de varios miembros
+                source, mode = stack.enter_context(ParallelGzipReader(raw, 1)), 'r|'
+            with tarfile.open(fileobj=source, mode=mode) as tar:
+                first = tar.next()
+                if first is None or first.name != self.PATCH_FORMAT_FILE:
+                    return 1
+                return json.load(tar.extractfile(first)).get("format", 1)
+    
+    def _rebuild_chunked_files(self, patch_dir, target_dir):
+        """Reconstruye archivos modificados reutilizando lo que ya está instalado.
+        
+        La receta del parche (chunks de archivos grandes o delta binario) indica,
+        tramo a tramo, si se copia del archivo instalado ("old") o de los datos
+        del parche ("new"). Cada chunk y el
+        archivo final se verifican por hash antes de reemplazar el original.
+        """
+        index_path = os.path.join(patch_dir, self.PATCH_CHUNKED_FILES)
+        if not os.path.exists(index_path):
+            return 0
+        
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        algo = index.get("algo", "md5")
+        
+        for rel_path, recipe in index["files"].items():
+            dest_path = os.path.join(target_dir, rel_path)
+            fd, tmp_path = tempfile.mkstemp(prefix=".atlas_patch_", dir=os.path.dirname(dest_path))
+            try:
+                with open(dest_path, 'rb') as old, \
+                        open(os.path.join(patch_dir, recipe["data"]), 'rb') as new, \
+                        os.fdopen(fd, 'wb') as out:
+                    whole = hashlib.new(algo)
+                    for source, offset, size, chunk_hash in recipe["chunks"]:
+                        src = old if source == "old" else new
+                        src.seek(offset)
+                        block = src.read(size)
+                        if len(block) != size or hashlib.new(algo, block).hexdigest() != chunk_hash:
+                            raise ValueError(f"{rel_path} no coincide con la versión esperada "
+                                             f"(prueba --repair)")
+                        out.write(block)
+                        whole.update(block)
+                    if whole.hexdigest() != recipe["hash"]:
+                        raise ValueError(f"hash final incorrecto en {rel_path}")
+                shutil.copymode(dest_path, tmp_path)
+                os.replace(tmp_path, dest_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        
+        return len(index["files"])
+    
+    def _materialize_duplicates(self, target_dir, tar_index=None):
+        """Crea los archivos repetidos que el archivo o parche lista en ``.duplicates.json``.
+        
+        Con ``dedup_hardlinks`` se usan enlaces duros (sin espacio extra); si
+        no, o si el sistema de archivos no los admite, copias. Los orígenes que
+        ya estaban instalados se verifican por hash antes de usarlos. Con
+        ``tar_index`` las copias se añaden al índice para verificarlas y repararlas.
+        """
+        index_path = os.path.join(target_dir, self.PATCH_DUPLICATES_FILE)
+        if not os.path.exists(index_path):
+            return 0
+        
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        algo = index.get("algo", "md5")
+        if tar_index is not None:
+            self._index_duplicates(tar_index, index)
+        
+        copied = 0
+        for rel_path, entry in index["files"].items():
+            src_path = self._safe_member_path(target_dir, entry["source"])
+            dest_path = self._safe_member_path(target_dir, rel_path)
+            if not src_path or not dest_path:
+                continue
+            if entry.get("installed") and self._file_digest(src_path, algo) != entry["hash"]:
+                raise ValueError(f"{entry['source']} no coincide con la versión esperada (prueba --repair)")
+            
+            self._copy_local(src_path, dest_path)
+            copied += 1
+        
+        os.remove(index_path)
+        return copied
+    
+    @classmethod
+    def _index_duplicates(cls, tar_index, table):
+        """Añade al índice las rutas de ``.duplicates.json`` con el offset y tamaño de su origen"""
+        added = []
+        for rel_path, entry in table["files"].items():
+            # Las rutas que no se materializan tampoco se verifican ni se reparan
+            if cls._safe_member_path(".", rel_path) is None:
+                continue
+            source = tar_index.find(entry["source"])
+            if source is not None and tar_index.find(rel_path) is None:
+                added.append(source._replace(name=rel_path))
+        # add() invalida la tabla de búsqueda: primero se buscan todas, luego se añaden
+        for entry in added:
+            tar_index.add(entry)
+        return len(added)
+    
+    def _copy_local(self, src_path, dest_path):
+        """Copia (o enlace duro con ``dedup_hardlinks``) reemplazando ``dest_path`` de forma atómica"""
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = dest_path + ".atlas_dup"
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            if self.dedup_hardlinks:
+                os.link(src_path, tmp_path)
+            else:
+                shutil.copy2(src_path, tmp_path)
+        except OSError:
+            shutil.copy2(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    
+    def _apply_renames(self, target_dir):
+        """Ejecuta las copias y movimientos locales de ``.renames.json``.
+        
+        El contenido de los archivos movidos ya está en la instalación en una
+        ruta que el parche elimina: se mueve (``os.replace``, sin copiar
+        datos) o se copia desde ella. Tiene que ir antes de los eliminados.
+        """
+        index_path = os.path.join(target_dir, self.PATCH_RENAMES_FILE)
+        if not os.path.exists(index_path):
+            return 0
+        
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        
+        for op, source, dest, file_hash, size in index["ops"]:
+            src_path = self._safe_member_path(target_dir, source)
+            dest_path = self._safe_member_path(target_dir, dest)
+            if not src_path or not dest_path:
+                continue
+            if not os.path.exists(src_path):
+                # Parche reanudado: el movimiento ya se hizo
+                if os.path.exists(dest_path) and os.path.getsize(dest_path) == size:
+                    continue
+                raise ValueError(f"{source} no existe en la instalación (prueba --repair)")
+            if os.path.getsize(src_path) != size:
+                raise ValueError(f"{source} no coincide con la versión esperada (prueba --repair)")
+            
+            if op == "move":
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                os.replace(src_path, dest_path)
+            else:
+                self._copy_local(src_path, dest_path)
+        
+        os.remove(index_path)
+        return len(index["ops"])
+    
+    def _apply_patch_metadata(self, target_dir):
+        """Procesa y elimina los metadatos de un parche extraído en ``target_dir``"""
+        try:
+            renamed = self._apply_renames(target_dir)
+            if renamed:
+                print(f"🚚 {renamed} archivo(s) movidos/copiados localmente")
+            
+            rebuilt = self._rebuild_chunked_files(target_dir, target_dir)
+            if rebuilt:
+                print(f"♻️  {rebuilt} archivo(s) reconstruidos desde delta")
+            
+            duplicated = self._materialize_duplicates(target_dir)
+            if duplicated:
+                print(f"🔗 {duplicated} archivo(s) duplicados")
+            
+            deleted_path = os.path.join(target_dir, self.PATCH_DELETED_FILES)
+            if os.path.exists(deleted_path):
+                with open(deleted_path, 'r') as f:
+                    for line in f:
+                        rel_path = line.strip()
+                        if not rel_path:
+                            continue
+                        file_path = self._safe_member_path(target_dir, rel_path)
+                        if file_path and os.path.isfile(file_path):
+                            os.remove(file_path)
+        finally:
+            for name in (self.PATCH_CHUNKED_FILES, self.PATCH_DELETED_FILES, self.PATCH_DUPLICATES_FILE,
+                         self.PATCH_RENAMES_FILE, self.PATCH_FORMAT_FILE):
+                path = os.path.join(target_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            shutil.rmtree(os.path.join(target_dir, self.PATCH_CHUNKS_DIR), ignore_errors=True)
+    
     def update_version(self, new_version):
         """Actualiza archivo de versión"""
         version_file = os.path.join(self.install_dir, ".atlas_version.json")
@@ -725,6 +2550,419 @@ StartupNotify=true
         if os.path.exists(self.temp_dir):
             shutil.rmtree(self.temp_dir)
 
+# ========== DESCOMPRESIÓN PARALELA DE PARCHES ==========
+class ParallelGzipReader(io.RawIOBase):
+    """Lee un .tar.gz de miembros gzip independientes descomprimiendo varios a la vez.
+
+    create_patches.py comprime los parches en bloques separados y guarda en
+    la cabecera de cada miembro el subcampo extra "AP" con su tamaño
+    comprimido: los miembros se localizan sin descomprimir y se descomprimen
+    en un pool de hilos (zlib suelta el GIL), entregándose en orden.
+    """
+
+    # Formato compartido con ParallelGzipWriter/ParallelGzipReader de
+    # create_patches.py (el instalador se distribuye solo y no lo importa):
+    # el subcampo "AP" y la disposición de la cabecera se cambian en las dos
+    # copias a la vez; test_create_patches.py lee con esta clase lo que escribe
+    # ParallelGzipWriter.
+    EXTRA_ID = b"AP"
+
+    def __init__(self, fileobj, workers=None):
+        super().__init__()
+        self.fileobj = fileobj
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.block = memoryview(b"")
+        self.eof = False
+
+    @classmethod
+    def detect(cls, path):
+        """True si ``path`` es un gzip comprimido en paralelo (subcampo "AP")"""
+        with open(path, 'rb') as f:
+            header = f.read(14)
+        return (len(header) == 14 and header[:2] == b"\x1f\x8b"
+                and header[3] & 4 and header[12:14] == cls.EXTRA_ID)
+
+    def _next_member(self):
+        """Siguiente miembro comprimido (bytes) o None al final"""
+        header = self.fileobj.read(12)
+        if not header:
+            return None
+        if len(header) < 12 or header[:2] != b"\x1f\x8b" or not header[3] & 4:
+            raise OSError("miembro gzip sin tamaño en un parche comprimido en paralelo")
+        xlen = struct.unpack("<H", header[10:12])[0]
+        extra = self.fileobj.read(xlen)
+        i = 0
+        while i + 4 <= len(extra):
+            field_id, field_len = extra[i:i + 2], struct.unpack("<H", extra[i + 2:i + 4])[0]
+            if field_id == self.EXTRA_ID and field_len == 4:
+                size = struct.unpack("<I", extra[i + 4:i + 8])[0]
+                rest = self.fileobj.read(size - 12 - xlen)
+                if len(rest) != size - 12 - xlen:
+                    raise EOFError("parche comprimido truncado")
+                return header + extra + rest
+            i += 4 + field_len
+        raise OSError("miembro gzip sin tamaño en un parche comprimido en paralelo")
+
+    def _fill(self):
+        # Como mucho 2 miembros por hilo descomprimidos por delante
+        while not self.eof and len(self.pending) < 2 * self.workers:
+            member = self._next_member()
+            if member is None:
+                self.eof = True
+                break
+            # wbits=31: cabecera gzip y comprobación de CRC/tamaño
+            self.pending.append(self.pool.submit(zlib.decompress, member, 31))
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.block:
+            self._fill()
+            if not self.pending:
+                return 0
+            self.block = memoryview(self.pending.popleft().result())
+        size = min(len(buffer), len(self.block))
+        buffer[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+
+    def close(self):
+        if self.pool is not None:
+            for future in self.pending:
+                future.cancel()
+            self.pool.shutdown()
+            self.pool = None
+        super().close()
+
+# ========== FLUJO HTTP REANUDABLE (INSTALACIÓN EN STREAMING) ==========
+class ResumableHTTPReader:
+    """Objeto tipo archivo de solo lectura sobre una descarga HTTP.
+
+    Se reconecta con ``Range`` desde el último byte entregado si la conexión se
+    corta, y opcionalmente guarda una copia (spool) de lo recibido en un
+    ``.part`` con el mismo sidecar que ``download_with_progress``. En un nuevo
+    intento, los bytes del spool se releen desde disco antes de volver a la red.
+    """
+
+    def __init__(self, installer, url, total_size, validator, accepts_ranges, spool_path=None):
+        self.installer = installer
+        self.url = url
+        self.total_size = total_size
+        self.validator = validator
+        self.accepts_ranges = accepts_ranges
+        self.offset = 0
+        self.response = None
+        self.attempt = 0
+
+        self.spool_path = spool_path
+        self.state_path = spool_path + ".json" if spool_path else None
+        self.spool = None
+        self.replay = None
+        self.replay_size = 0
+        self.last_saved = 0
+
+        if spool_path:
+            state = installer._load_download_state(self.state_path, url)
+            if (state and os.path.exists(spool_path) and state.get("validator") == validator
+                    and state.get("total_size") == total_size and "segments" not in state):
+                self.replay_size = min(os.path.getsize(spool_path), state.get("downloaded", 0))
+            self.spool = open(spool_path, 'r+b' if self.replay_size else 'wb')
+            self.spool.truncate(self.replay_size)
+            if self.replay_size:
+                self.replay = open(spool_path, 'rb')
+                print(f"🔁 Reutilizando {self.replay_size / (1024*1024):.1f} MB ya descargados")
+            self.spool.seek(self.replay_size)
+
+    def _connect(self):
+        headers = dict(self.installer.http_headers)
+        if self.offset > 0:
+            if not self.accepts_ranges:
+                raise ConnectionError("el servidor no permite reanudar la descarga")
+            headers['Range'] = f"bytes={self.offset}-"
+            if self.validator:
+                headers['If-Range'] = self.validator
+        response = urlopen(Request(self.url, headers=headers), timeout=60)
+        if self.offset > 0 and response.getcode() != 206:
+            response.close()
+            raise ValueError("el archivo cambió en el servidor durante la descarga")
+        self.response = response
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = 1024 * 1024
+
+        # Primero los bytes que ya están en el spool
+        if self.replay is not None:
+            data = self.replay.read(min(size, self.replay_size - self.offset))
+            if data:
+                self.offset += len(data)
+                return data
+            self.replay.close()
+            self.replay = None
+
+        while True:
+            try:
+                if self.response is None:
+                    self._connect()
+                data = self.response.read(size)
+                if not data and self.total_size and self.offset < self.total_size:
+                    raise ConnectionError(f"conexión cerrada en {self.offset}/{self.total_size} bytes")
+                break
+            except (URLError, ConnectionError, TimeoutError, socket.timeout, http.client.HTTPException) as e:
+                if self.response is not None:
+                    self.response.close()
+                    self.response = None
+                self.attempt += 1
+                if self.attempt > self.installer.download_retries or not self.accepts_ranges:
+                    raise
+                delay = min(self.installer.retry_backoff * (2 ** (self.attempt - 1)), 60)
+                print(f"⚠️  Conexión interrumpida ({e}). Reintento {self.attempt}/{self.installer.download_retries} en {delay:.0f}s...")
+                time.sleep(delay)
+
+        self.attempt = 0
+        if data and self.spool is not None:
+            self.spool.write(data)
+            if self.offset + len(data) - self.last_saved >= 8 * 1024 * 1024:
+                self.save_state(self.offset + len(data))
+        self.offset += len(data)
+        return data
+
+    def save_state(self, downloaded=None):
+        if self.spool is None:
+            return
+        self.spool.flush()
+        if downloaded is None:
+            downloaded = self.offset
+        self.installer._save_download_state(self.state_path, self.url, self.validator,
+                                            downloaded, self.total_size)
+        self.last_saved = downloaded
+
+    def close(self, keep_spool=True):
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
+        if self.spool is not None:
+            if keep_spool:
+                self.save_state()
+            self.spool.close()
+            self.spool = None
+            if not keep_spool:
+                for path in (self.spool_path, self.state_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+# ========== ÍNDICE DE MIEMBROS DEL TAR ==========
+class TarIndexEntry(namedtuple("TarIndexEntry", "name offset offset_data size mode mtime type")):
+    """Entrada del índice; mismos nombres de atributos que tarfile.TarInfo"""
+    __slots__ = ()
+
+    def isfile(self):
+        return self.type in (tarfile.REGTYPE, tarfile.AREGTYPE, tarfile.CONTTYPE, TarIndex.SPARSE)
+
+    def isdir(self):
+        return self.type == tarfile.DIRTYPE
+
+    def issparse(self):
+        return self.type == TarIndex.SPARSE
+
+
+class TarIndex:
+    """Índice compacto de los miembros de un .tar (nombre, offsets, tamaño, modo, mtime).
+
+    Se guarda en binario: una cabecera fija, una columna ``array`` por campo y un
+    bloque con los nombres en UTF-8. Permite listar, extraer una ruta, verificar
+    y planificar la extracción paralela sin recorrer las cabeceras del .tar.
+    """
+
+    MAGIC = b"ATIX"
+    FORMAT_VERSION = 2
+    HEADER = struct.Struct("<4sHHQQII")  # magic, versión, reservado, tamaño, mtime_ns, miembros, bytes de source
+    VERSION_HEADER = struct.Struct("<I")  # desde la versión 2: bytes de la versión de Atlas del archivo
+    SPARSE = b"S"  # tipo propio para miembros dispersos (GNU o PAX)
+    COLUMNS = (("offset", "Q"), ("offset_data", "Q"), ("size", "Q"), ("mtime", "q"), ("mode", "I"), ("name_end", "I"))
+
+    def __init__(self, archive_size=0, archive_mtime_ns=0, source="", version=""):
+        self.archive_size = archive_size
+        self.archive_mtime_ns = archive_mtime_ns
+        self.source = source  # p. ej. validador ETag del archivo remoto
+        self.version = version  # versión de Atlas que contiene el archivo ("" si se desconoce)
+        self.columns = {name: array(code) for name, code in self.COLUMNS}
+        self.types = bytearray()
+        self.names = bytearray()
+        self._lookup = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def add(self, member):
+        """Añade un TarInfo (también funciona durante la lectura en modo flujo)"""
+        col = self.columns
+        col["offset"].append(member.offset)
+        col["offset_data"].append(member.offset_data)
+        col["size"].append(member.size)
+        col["mtime"].append(int(member.mtime))
+        col["mode"].append(member.mode)
+        member_type = self.SPARSE if member.issparse() else member.type
+        self.types += member_type[:1] or tarfile.REGTYPE
+        self.names += member.name.encode("utf-8", "surrogateescape")
+        col["name_end"].append(len(self.names))
+        self._lookup = None
+
+    def entry(self, i):
+        col = self.columns
+        start = col["name_end"][i - 1] if i > 0 else 0
+        name = self.names[start:col["name_end"][i]].decode("utf-8", "surrogateescape")
+        return TarIndexEntry(name, col["offset"][i], col["offset_data"][i], col["size"][i],
+                             col["mode"][i], col["mtime"][i], bytes(self.types[i:i + 1]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.entry(i)
+
+    def find(self, name):
+        """Busca un miembro por ruta (se construye la tabla al primer uso)"""
+        if self._lookup is None:
+            self._lookup = {}
+            start = 0
+            for i, end in enumerate(self.columns["name_end"]):
+                self._lookup[bytes(self.names[start:end])] = i
+                start = end
+        i = self._lookup.get(name.rstrip("/").encode("utf-8", "surrogateescape"))
+        return self.entry(i) if i is not None else None
+
+    def matches(self, archive_path):
+        """Comprueba que el índice corresponde al archivo (tamaño y mtime)"""
+        try:
+            st = os.stat(archive_path)
+        except OSError:
+            return False
+        return st.st_size == self.archive_size and st.st_mtime_ns == self.archive_mtime_ns
+
+    @classmethod
+    def build(cls, archive_path, source=""):
+        """Recorre las cabeceras del .tar una vez y crea el índice"""
+        st = os.stat(archive_path)
+        index = cls(st.st_size, st.st_mtime_ns, source)
+        with tarfile.open(archive_path, 'r:') as tar:
+            while True:
+                member = tar.next()
+                if member is None:
+                    break
+                tar.members.clear()
+                index.add(member)
+        return index
+
+    def save(self, path):
+        source = self.source.encode("utf-8")
+        version = self.version.encode("utf-8")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION, 0, self.archive_size,
+                                     self.archive_mtime_ns, len(self), len(source)))
+            f.write(source)
+            f.write(self.VERSION_HEADER.pack(len(version)))
+            f.write(version)
+            for name, _ in self.COLUMNS:
+                column = self.columns[name]
+                if sys.byteorder != "little":
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(f)
+            f.write(self.types)
+            f.write(self.names)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Carga un índice guardado; devuelve None si no existe o no es válido"""
+        try:
+            with open(path, 'rb') as f:
+                magic, version, _, size, mtime_ns, count, source_len = cls.HEADER.unpack(f.read(cls.HEADER.size))
+                # La versión 1 no guardaba la versión de Atlas
+                if magic != cls.MAGIC or version not in (1, cls.FORMAT_VERSION):
+                    return None
+                index = cls(size, mtime_ns, f.read(source_len).decode("utf-8"))
+                if version >= 2:
+                    version_len, = cls.VERSION_HEADER.unpack(f.read(cls.VERSION_HEADER.size))
+                    index.version = f.read(version_len).decode("utf-8")
+                for name, code in cls.COLUMNS:
+                    column = array(code)
+                    column.fromfile(f, count)
+                    if sys.byteorder != "little":
+                        column.byteswap()
+                    index.columns[name] = column
+                index.types = bytearray(f.read(count))
+                index.names = bytearray(f.read())
+                if len(index.types) != count or (count and len(index.names) != index.columns["name_end"][-1]):
+                    return None
+                return index
+        except (OSError, struct.error, EOFError, ValueError):
+            return None
+
+# ========== EXTRACCIÓN ZIP EN PROCESOS ==========
+# Funciones de módulo para que ProcessPoolExecutor pueda enviarlas a los procesos
+_zip_progress_queue = None
+
+
+def _zip_worker_init(queue):
+    global _zip_progress_queue
+    _zip_progress_queue = queue
+
+
+def _extract_zip_group(archive_path, extract_to, names):
+    """Descomprime en flujo un grupo de miembros del ZIP.
+
+    El progreso se envía por la cola como (archivos, bytes comprimidos); en
+    miembros grandes se reparte en proporción a lo ya descomprimido.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    report_every = 8 * 1024 * 1024
+    files = 0
+    pending = 0.0
+
+    def report(force=False):
+        nonlocal files, pending
+        if _zip_progress_queue is not None and (force or pending >= report_every or files >= 200):
+            _zip_progress_queue.put((files, int(pending)))
+            files = 0
+            pending -= int(pending)
+
+    with zipfile.ZipFile(archive_path) as zf:
+        for name in names:
+            info = zf.getinfo(name)
+            dest_path = AtlasInstaller._safe_member_path(extract_to, name)
+            with zf.open(info) as source:
+                if info.file_size <= AtlasInstaller.SMALL_FILE_LIMIT:
+                    fd = os.open(dest_path, flags, 0o644)
+                    try:
+                        view = memoryview(source.read())
+                        while view:
+                            view = view[os.write(fd, view):]
+                    finally:
+                        os.close(fd)
+                    pending += info.compress_size
+                else:
+                    ratio = info.compress_size / info.file_size
+                    with open(dest_path, 'wb') as dest:
+                        while True:
+                            block = source.read(1024 * 1024)
+                            if not block:
+                                break
+                            dest.write(block)
+                            pending += len(block) * ratio
+                            report()
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(dest_path, (mtime, mtime))
+            files += 1
+            report()
+    report(force=True)
+
 # ========== INTERFAZ GRÁFICA MEJORADA ==========
 class InstallerGUI:
     def __init__(self, root):
@@ -1214,11 +3452,25 @@ class InstallerGUI:
     
     def check_updates(self):
         """Verifica actualizaciones disponibles"""
-        # Esto sería la implementación real
-        messagebox.showinfo("🔄 Actualizaciones", 
-                          "La verificación de actualizaciones se implementará en la versión final.\n\n"
-                          "Por ahora, descarga los parches manualmente desde la página web.",
-                          parent=self.root)
+        self.update_btn.config(state=tk.DISABLED)
+        self.status_label.config(text="🔄 Buscando actualizaciones...")
+        
+        def worker():
+            patches = self.installer.check_for_updates()
+            self.root.after(0, lambda: self.show_updates(patches))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def show_updates(self, patches):
+        """Muestra el diálogo de actualizaciones (o avisa si no hay)"""
+        self.update_btn.config(state=tk.NORMAL)
+        self.status_label.config(text=self.installer.describe_update_plan())
+        if not patches:
+            messagebox.showinfo("🔄 Actualizaciones",
+                              "Atlas está actualizado (o no está instalado en esta carpeta).",
+                              parent=self.root)
+            return
+        UpdateDialog(self.root, self.installer, patches)
     
     def launch_atlas(self):
         """Ejecuta Atlas"""
@@ -1300,6 +3552,7 @@ class UpdateDialog:
         self.dialog.rowconfigure(0, weight=0)
         self.dialog.rowconfigure(1, weight=1)
         self.dialog.rowconfigure(2, weight=0)
+        self.dialog.rowconfigure(3, weight=0)
         
         # Título
         tk.Label(
@@ -1353,7 +3606,7 @@ class UpdateDialog:
         button_frame = tk.Frame(self.dialog)
         button_frame.grid(row=2, column=0, pady=(0, 20), padx=20)
         
-        tk.Button(
+        self.apply_btn = tk.Button(
             button_frame,
             text="🔄 Aplicar Seleccionados",
             command=self.apply_selected,
@@ -1361,9 +3614,10 @@ class UpdateDialog:
             fg='white',
             padx=20,
             pady=8
-        ).pack(side=tk.LEFT, padx=(0, 10))
+        )
+        self.apply_btn.pack(side=tk.LEFT, padx=(0, 10))
         
-        tk.Button(
+        self.cancel_btn = tk.Button(
             button_frame,
             text="❌ Cancelar",
             command=self.dialog.destroy,
@@ -1371,22 +3625,62 @@ class UpdateDialog:
             fg='white',
             padx=20,
             pady=8
-        ).pack(side=tk.LEFT)
+        )
+        self.cancel_btn.pack(side=tk.LEFT)
+        
+        # Progreso de la actualización
+        progress_frame = tk.Frame(self.dialog)
+        progress_frame.grid(row=3, column=0, sticky="ew", padx=20, pady=(0, 20))
+        progress_frame.columnconfigure(0, weight=1)
+        
+        self.progress_var = tk.DoubleVar()
+        ttk.Progressbar(progress_frame, variable=self.progress_var, maximum=100).grid(
+            row=0, column=0, sticky="ew")
+        self.status_label = tk.Label(progress_frame, text="", anchor="w")
+        self.status_label.grid(row=1, column=0, sticky="ew", pady=(5, 0))
     
     def apply_selected(self):
         """Aplica los parches seleccionados"""
         selected = self.tree.selection()
         if not selected:
-            messagebox.showwarning("Selección", "Selecciona al menos un parche.")
+            messagebox.showwarning("Selección", "Selecciona al menos un parche.", parent=self.dialog)
             return
         
-        self.dialog.destroy()
-        # Aquí iría la lógica para aplicar parches
+        # Cada parche parte de la versión del anterior: aplicar en orden
+        # hasta el último seleccionado
+        last = max(self.tree.index(item) for item in selected)
+        patches = self.patches[:last + 1]
+        
+        self.apply_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.dialog.protocol("WM_DELETE_WINDOW", lambda: None)
+        
+        def progress_callback(percent, status):
+            self.dialog.after(0, lambda: (self.progress_var.set(percent),
+                                          self.status_label.config(text=status)))
+        
+        def worker():
+            success, message = self.installer.apply_patches(patches, progress_callback)
+            self.dialog.after(0, lambda: self.finish(success, message))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def finish(self, success, message):
+        """Cierra el diálogo al terminar la actualización"""
+        if success:
+            messagebox.showinfo("✅ Actualización", message, parent=self.dialog)
+            self.dialog.destroy()
+        else:
+            messagebox.showerror("❌ Error", message, parent=self.dialog)
+            self.apply_btn.config(state=tk.NORMAL)
+            self.cancel_btn.config(state=tk.NORMAL)
+            self.dialog.protocol("WM_DELETE_WINDOW", self.dialog.destroy)
 
 # ========== MODO CONSOLA ==========
-def run_cli():
+def run_cli(installer=None):
     """Ejecuta el instalador en modo consola"""
-    installer = AtlasInstaller()
+    if installer is None:
+        installer = AtlasInstaller()
     
     print("🌍 Atlas Interactivo - Instalador")
     print("=" * 50)
@@ -1453,16 +3747,17 @@ def run_cli():
                     print(f"\n📋 {len(patches)} actualizaciones disponibles:")
                     for i, patch in enumerate(patches, 1):
                         print(f"  {i}. {patch['name']} ({patch['size']}) - {patch['date']} - v{patch['version']}")
+                    print(installer.describe_update_plan())
                     
                     apply = input("\n¿Aplicar todas las actualizaciones? (s/n): ").lower()
                     if apply == 's':
-                        for patch in patches:
-                            print(f"\n🔄 Aplicando {patch['name']}...")
-                            success, message = installer.apply_patch(patch)
-                            if success:
-                                print(f"✅ {message}")
-                            else:
-                                print(f"❌ {message}")
+                        success, message = installer.apply_patches(
+                            patches,
+                            progress_callback=lambda percent, status: print(
+                                f"\r{status} {percent:.1f}%", end='', flush=True),
+                            status_callback=lambda message: print(f"\n🔄 {message}")
+                        )
+                        print(f"\n{'✅' if success else '❌'} {message}")
                 else:
                     print("✅ Ya tienes la última versión")
             
@@ -1504,6 +3799,28 @@ def parse_arguments():
                        help='No crear accesos directos en escritorio/menú')
     parser.add_argument('--no-gui', action='store_true',
                        help='Forzar modo consola')
+    parser.add_argument('--connections', type=int, default=None,
+                       help='Conexiones simultáneas de descarga')
+    parser.add_argument('--stream', action='store_true',
+                       help='Extraer mientras se descarga')
+    parser.add_argument('--extract-workers', type=int, default=None,
+                       help='Hilos de extracción del .tar')
+    parser.add_argument('--list-archive', metavar='TAR',
+                       help='Lista el contenido de un .tar')
+    parser.add_argument('--extract-member', nargs=2, metavar=('TAR', 'RUTA'),
+                       help='Extrae una sola ruta de un .tar')
+    parser.add_argument('--verify', action='store_true',
+                       help='Verifica la instalación contra su índice')
+    parser.add_argument('--repair', action='store_true',
+                       help='Repara la instalación descargando solo lo dañado')
+    parser.add_argument('--manifest',
+                       help='Manifest de hashes para --repair y --verify')
+    parser.add_argument('--update', action='store_true',
+                       help='Aplica todos los parches pendientes')
+    parser.add_argument('--prefetch', type=int,
+                       help='Parches descargados por delante durante --update')
+    parser.add_argument('--benchmark-extract', type=int, nargs='?', const=100_000, default=None,
+                       metavar='N', help='Benchmark de extracción con N archivos pequeños')
     
     return parser.parse_args()
 
@@ -1512,6 +3829,15 @@ def main():
     args = parse_arguments()
     installer = AtlasInstaller()
     
+    if args.connections:
+        installer.download_connections = max(1, args.connections)
+    
+    if args.stream:
+        installer.stream_install = True
+    
+    if args.extract_workers:
+        installer.extract_workers = max(1, args.extract_workers)
+    
     # Manejar argumentos
     if args.help:
         installer.show_help()
@@ -1525,6 +3851,71 @@ def main():
         installer.check_updates_cli()
         return
     
+    if args.prefetch:
+        installer.patch_prefetch = max(1, args.prefetch)
+    
+    if args.install_dir and (args.verify or args.extract_member or args.repair or args.update):
+        installer.install_dir = args.install_dir
+    
+    if args.list_archive:
+        installer.list_archive(args.list_archive)
+        return
+    
+    if args.benchmark_extract:
+        installer.benchmark_extraction(args.benchmark_extract)
+        installer.cleanup()
+        return
+    
+    if args.extract_member:
+        archive, member = args.extract_member
+        installer.extract_member(archive, member, installer.install_dir)
+        return
+    
+    if args.repair:
+        def repair_progress(percent, status):
+            print(f"\r{status} {percent:.1f}%", end='', flush=True)
+        
+        success, message = installer.repair_install(
+            manifest_path=args.manifest,
+            progress_callback=repair_progress,
+            status_callback=lambda message: print(f"\n{message}")
+        )
+        print(f"\n{'✅' if success else '❌'} {message}")
+        installer.cleanup()
+        return
+    
+    if args.update:
+        patches = installer.check_for_updates()
+        print(installer.describe_update_plan())
+        if patches:
+            success, message = installer.apply_patches(
+                patches,
+                progress_callback=lambda percent, status: print(
+                    f"\r{status} {percent:.1f}%", end='', flush=True),
+                status_callback=lambda message: print(f"\n🔄 {message}")
+            )
+            print(f"\n{'✅' if success else '❌'} {message}")
+        installer.cleanup()
+        return
+    
+    if args.verify:
+        manifest = None
+        if args.manifest:
+            try:
+                manifest = installer.load_manifest(args.manifest)
+            except (OSError, ValueError) as e:
+                print(f"❌ No se pudo leer el manifest {args.manifest}: {e}")
+                return
+        problems = installer.verify_install(manifest=manifest)
+        if problems is not None:
+            for name, reason in problems:
+                print(f"  ❌ {name}: {reason}")
+            if problems:
+                print(f"\n⚠️  {len(problems)} archivo(s) con problemas")
+            else:
+                print("✅ Instalación verificada: todos los archivos están presentes")
+        return
+    
     # Modo instalación CLI directa
     if args.install_dir or args.skip_desktop:
         installer.install_cli(
@@ -1535,7 +3926,7 @@ def main():
     
     # Modo CLI interactivo
     if args.cli or args.no_gui or not HAS_GUI:
-        run_cli()
+        run_cli(installer)
         return
     
     # Modo GUI por defecto
@@ -1559,7 +3950,9 @@ def main():
         root.mainloop()
     else:
         print("Tkinter no está disponible. Ejecutando en modo consola...")
-        run_cli()
+        run_cli(installer)
 
 if __name__ == "__main__":
+    # Necesario para los procesos de extracción ZIP en el ejecutable congelado
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
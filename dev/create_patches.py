@@ -12,60 +12,1013 @@ import tarfile
 import zipfile
 import shutil
 import subprocess
+import argparse
+import time
+import mmap
+import io
+import struct
+import sqlite3
+import zlib
+import tempfile
+import math
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 import sys
 
+# Troceado FastCDC en C (opcional): sin él se usa la implementación en Python
+try:
+    from fastcdc.fastcdc_cy import fastcdc_cy as _fastcdc
+except ImportError:
+    _fastcdc = None
+
+
+
+# ========== HASHING ==========
+# Algoritmos admitidos en el manifest ("algo"); los manifests sin "algo" son MD5
+HASH_ALGORITHMS = ("sha256", "blake2b", "md5")
+DEFAULT_HASH_ALGO = "sha256"
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Buffers reutilizables por proceso (uno por tamaño)
+_hash_buffers = {}
+
+
+def digest_file(filepath, algo="md5", method="auto", buffer_size=HASH_BUFFER_SIZE):
+    """Calcula el hash hexadecimal de un archivo.
+    
+    ``method`` puede ser ``"file_digest"`` (hashlib.file_digest, Python 3.11+),
+    ``"mmap"`` o ``"buffer"`` (readinto sobre un buffer reutilizable de
+    ``buffer_size`` bytes). ``"auto"`` usa file_digest si existe.
+    """
+    if method == "auto":
+        method = "file_digest" if hasattr(hashlib, "file_digest") else "buffer"
+    
+    with open(filepath, "rb") as f:
+        if method == "file_digest":
+            return hashlib.file_digest(f, algo).hexdigest()
+        
+        digest = hashlib.new(algo)
+        if method == "mmap":
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+            return digest.hexdigest()
+        
+        buffer = _hash_buffers.get(buffer_size)
+        if buffer is None:
+            buffer = _hash_buffers[buffer_size] = bytearray(buffer_size)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+        return digest.hexdigest()
+
+
+# ========== CHUNKS DEFINIDOS POR CONTENIDO ==========
+# Los archivos mayores que CHUNK_THRESHOLD se describen en el manifest como una
+# lista de chunks [hash, tamaño]. Los cortes dependen solo del contenido: se
+# usa FastCDC (hash Gear rodante sobre los últimos ~32 bytes con chunking
+# normalizado), así que todos los valores de byte cuentan, también hay cortes
+# en CSV/JSON numéricos y una inserción solo desplaza los cortes cercanos.
+# Con el paquete ``fastcdc`` instalado los cortes se buscan en C (~1 GB/s);
+# sin él, _cdc_chunks_py da exactamente los mismos cortes en Python puro
+# (~5 MB/s), de modo que manifests y firmas no dependen de la máquina.
+CHUNK_THRESHOLD = 100_000_000
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_AVG_SIZE = 1024 * 1024
+CHUNK_MAX_SIZE = 8 * 1024 * 1024
+# Identifica el troceado en el manifest: listas de chunks de otro esquema se recalculan
+CHUNKER = "fastcdc"
+CHUNKED_FILES = ".chunked_files.json"
+CHUNKS_DIR = ".chunks"
+# Tabla ruta -> origen para archivos idénticos que no viajan en el archivo
+DUPLICATES_FILE = ".duplicates.json"
+# Operaciones locales ["copy"/"move", origen, destino, hash, tamaño] para
+# archivos movidos: el contenido ya está en el cliente en una ruta que se elimina
+RENAMES_FILE = ".renames.json"
+# Lista de rutas eliminadas (una por línea)
+DELETED_FILES = ".deleted_files.txt"
+
+# Formato de parche. 1: archivos completos y DELETED_FILES (lo que entiende
+# cualquier instalador); 2: además deltas/chunks, duplicados y movidos. Un
+# instalador de formato 1 extraería esos metadatos como archivos normales, así
+# que el formato 2 solo se genera si se declara que los instaladores
+# publicados lo entienden (--client-format 2), y va marcado con
+# PATCH_FORMAT_FILE como primer miembro para que los instaladores lo comprueben.
+PATCH_FORMAT = 2
+PATCH_FORMAT_FILE = ".patch_format.json"
+
+# Deltas: los archivos se trocean igual pero más fino (~8 KB de media) y se
+# guarda una firma (tamaño + digest de 16 bytes por chunk) por cada contenido
+# publicado, indexada por su hash. Con la firma de la versión anterior basta
+# para calcular un delta sin conservar los archivos antiguos.
+DELTA_MIN_SIZE = 2 * 1024
+DELTA_AVG_SIZE = 8 * 1024
+DELTA_MAX_SIZE = 64 * 1024
+# Por debajo de este tamaño el archivo completo cuesta poco más que su delta
+DELTA_CANDIDATE_MIN_SIZE = 256 * 1024
+SIGNATURE_DIGEST_SIZE = 16
+# Las firmas se nombran <hash><SIGNATURE_EXT>; la extensión cambia con el troceado
+# para que prune_signatures descarte las calculadas con otro esquema
+SIGNATURE_EXT = f".{CHUNKER}.sig"
+
+# Tabla Gear de FastCDC (la del paquete fastcdc, licencia MIT): fija los cortes
+_FASTCDC_GEAR = [
+    0x5C95C078, 0x22408989, 0x2D48A214, 0x12842087, 0x530F8AFB, 0x474536B9, 0x2963B4F1, 0x44CB738B,
+    0x4EA7403D, 0x4D606B6E, 0x074EC5D3, 0x3AF39D18, 0x726003CA, 0x37A62A74, 0x51A2F58E, 0x7506358E,
+    0x5D4AB128, 0x4D4AE17B, 0x41E85924, 0x470C36F7, 0x4741CBE1, 0x01BB7F30, 0x617C1DE3, 0x2B0C3A1F,
+    0x50C48F73, 0x21A82D37, 0x6095ACE0, 0x419167A0, 0x3CAF49B0, 0x40CEA62D, 0x66BC1C66, 0x545E1DAD,
+    0x2BFA77CD, 0x6E85DA24, 0x5FB0BDC5, 0x652CFC29, 0x3A0AE1AB, 0x2837E0F3, 0x6387B70E, 0x13176012,
+    0x4362C2BB, 0x66D8F4B1, 0x37FCE834, 0x2C9CD386, 0x21144296, 0x627268A8, 0x650DF537, 0x2805D579,
+    0x3B21EBBD, 0x7357ED34, 0x3F58B583, 0x7150DDCA, 0x7362225E, 0x620A6070, 0x2C5EF529, 0x7B522466,
+    0x768B78C0, 0x4B54E51E, 0x75FA07E5, 0x06A35FC6, 0x30B71024, 0x1C8626E1, 0x296AD578, 0x28D7BE2E,
+    0x1490A05A, 0x7CEE43BD, 0x698B56E3, 0x09DC0126, 0x4ED6DF6E, 0x02C1BFC7, 0x2A59AD53, 0x29C0E434,
+    0x7D6C5278, 0x507940A7, 0x5EF6BA93, 0x68B6AF1E, 0x46537276, 0x611BC766, 0x155C587D, 0x301BA847,
+    0x2CC9DDA7, 0x0A438E2C, 0x0A69D514, 0x744C72D3, 0x4F326B9B, 0x7EF34286, 0x4A0EF8A7, 0x6AE06EBE,
+    0x669C5372, 0x12402DCB, 0x5FEAE99D, 0x76C7F4A7, 0x6ABDB79C, 0x0DFAA038, 0x20E2282C, 0x730ED48B,
+    0x069DAC2F, 0x168ECF3E, 0x2610E61F, 0x2C512C8E, 0x15FB8C06, 0x5E62BC76, 0x69555135, 0x0ADB864C,
+    0x4268F914, 0x349AB3AA, 0x20EDFDB2, 0x51727981, 0x37B4B3D8, 0x5DD17522, 0x6B2CBFE4, 0x5C47CF9F,
+    0x30FA1CCD, 0x23DEDB56, 0x13D1F50A, 0x64EDDEE7, 0x0820B0F7, 0x46E07308, 0x1E2D1DFD, 0x17B06C32,
+    0x250036D8, 0x284DBF34, 0x68292EE0, 0x362EC87C, 0x087CB1EB, 0x76B46720, 0x104130DB, 0x71966387,
+    0x482DC43F, 0x2388EF25, 0x524144E1, 0x44BD834E, 0x448E7DA3, 0x3FA6EAF9, 0x3CDA215C, 0x3A500CF3,
+    0x395CB432, 0x5195129F, 0x43945F87, 0x51862CA4, 0x56EA8FF1, 0x201034DC, 0x4D328FF5, 0x7D73A909,
+    0x6234D379, 0x64CFBF9C, 0x36F6589A, 0x0A2CE98A, 0x5FE4D971, 0x03BC15C5, 0x44021D33, 0x16C1932B,
+    0x37503614, 0x1ACAF69D, 0x3F03B779, 0x49E61A03, 0x1F52D7EA, 0x1C6DDD5C, 0x062218CE, 0x07E7A11A,
+    0x1905757A, 0x7CE00A53, 0x49F44F29, 0x4BCC70B5, 0x39FEEA55, 0x5242CEE8, 0x3CE56B85, 0x00B81672,
+    0x46BEECCC, 0x3CA0AD56, 0x2396CEE8, 0x78547F40, 0x6B08089B, 0x66A56751, 0x781E7E46, 0x1E2CF856,
+    0x3BC13591, 0x494A4202, 0x520494D7, 0x2D87459A, 0x757555B6, 0x42284CC1, 0x1F478507, 0x75C95DFF,
+    0x35FF8DD7, 0x4E4757ED, 0x2E11F88C, 0x5E1B5048, 0x420E6699, 0x226B0695, 0x4D1679B4, 0x5A22646F,
+    0x161D1131, 0x125C68D9, 0x1313E32E, 0x4AA85724, 0x21DC7EC1, 0x4FFA29FE, 0x72968382, 0x1CA8EEF3,
+    0x3F3B1C28, 0x39C2FB6C, 0x6D76493F, 0x7A22A62E, 0x789B1C2A, 0x16E0CB53, 0x7DECEEEB, 0x0DC7E1C6,
+    0x5C75BF3D, 0x52218333, 0x106DE4D6, 0x7DC64422, 0x65590FF4, 0x2C02EC30, 0x64A9AC67, 0x59CAB2E9,
+    0x4A21D2F3, 0x0F616E57, 0x23B54EE8, 0x02730AAA, 0x2F3C634D, 0x7117FC6C, 0x01AC6F05, 0x5A9ED20C,
+    0x158C4E2A, 0x42B699F0, 0x0C7C14B3, 0x02BD9641, 0x15AD56FC, 0x1C722F60, 0x7DA1AF91, 0x23E0DBCB,
+    0x0E93E12B, 0x64B2791D, 0x440D2476, 0x588EA8DD, 0x4665A658, 0x7446C418, 0x1877A774, 0x5626407E,
+    0x7F63BD46, 0x32D2DBD8, 0x3C790F4A, 0x772B7239, 0x6F8B2826, 0x677FF609, 0x0DC82C11, 0x23FFE354,
+    0x2EAC53A6, 0x16139E09, 0x0AFD0DBC, 0x2A4D4237, 0x56A368C7, 0x234325E4, 0x2DCE9187, 0x32E8EA7E,
+]
+
+
+def _cdc_chunks_py(data, min_size, avg_size, max_size):
+    """(offset, tamaño) de los chunks de ``data``: mismo algoritmo que fastcdc, en Python"""
+    gear = _FASTCDC_GEAR
+    # Chunking normalizado: máscara más exigente hasta el tamaño central, más laxa después
+    center = avg_size - min(min_size + (min_size + 1) // 2, avg_size)
+    center = min(center, max_size)
+    bits = round(math.log2(avg_size))
+    mask_s = (1 << (bits + 1)) - 1
+    mask_l = (1 << (bits - 1)) - 1
+    offset = 0
+    while offset < len(data):
+        size = min(max_size, len(data) - offset)
+        cut = min(min_size, size)
+        pattern = 0
+        found = False
+        for barrier, mask in ((min(center, size), mask_s), (size, mask_l)):
+            for b in data[offset + cut:offset + barrier]:
+                pattern = (pattern >> 1) + gear[b]
+                cut += 1
+                if not pattern & mask:
+                    found = True
+                    break
+            if found:
+                break
+        yield offset, cut
+        offset += cut
+
+
+def _cdc_chunks(data, min_size, avg_size, max_size):
+    """(offset, tamaño) de los chunks de ``data`` (un bytes/bytearray/memoryview)"""
+    if _fastcdc is None:
+        return _cdc_chunks_py(data, min_size, avg_size, max_size)
+    return ((chunk.offset, chunk.length) for chunk in _fastcdc(data, min_size, avg_size, max_size))
+
+
+def iter_chunks(f, min_size=CHUNK_MIN_SIZE, avg_size=CHUNK_AVG_SIZE, max_size=CHUNK_MAX_SIZE):
+    """Divide un archivo abierto en chunks definidos por contenido (bytes)"""
+    read_size = max(4 * max_size, 8 * 1024 * 1024)
+    data = bytearray()
+    eof = False
+    
+    while True:
+        while not eof and len(data) < read_size:
+            block = f.read(read_size)
+            if block:
+                data += block
+            else:
+                eof = True
+        if not data:
+            return
+        
+        # Cada corte mira como mucho max_size bytes desde el inicio del chunk: los
+        # chunks que empiezan a menos de eso del final esperan a la siguiente lectura
+        start = 0
+        view = memoryview(data)
+        chunks = _cdc_chunks(view, min_size, avg_size, max_size)
+        try:
+            for offset, length in chunks:
+                if not eof and len(data) - offset < max_size:
+                    break
+                yield bytes(view[offset:offset + length])
+                start = offset + length
+        finally:
+            # Soltar las referencias al buffer antes de compactarlo
+            chunks.close()
+            del chunks
+            view.release()
+        del data[:start]
+
+
+def hash_file_chunks(filepath, algo="md5"):
+    """Hash completo y lista de chunks [hash, tamaño] de un archivo"""
+    whole = hashlib.new(algo)
+    chunks = []
+    with open(filepath, "rb") as f:
+        for chunk in iter_chunks(f):
+            whole.update(chunk)
+            chunks.append([hashlib.new(algo, chunk).hexdigest(), len(chunk)])
+    return whole.hexdigest(), chunks
+
+
+def is_delta_candidate(path, info):
+    """True si ``path`` (entrada ``info`` del manifest) puede viajar como delta.
+    
+    Quedan fuera los archivos pequeños, los que ya van por chunks y los de
+    formatos comprimidos (cualquier cambio reescribe todo el archivo).
+    """
+    return ("chunks" not in info
+            and DELTA_CANDIDATE_MIN_SIZE <= info["size"] <= CHUNK_THRESHOLD
+            and os.path.splitext(path)[1].lower() not in INCOMPRESSIBLE_EXTENSIONS)
+
+
+def file_signature(filepath, algo="md5"):
+    """Firma de delta de un archivo: (array de tamaños, digests concatenados)"""
+    sizes = array("I")
+    digests = bytearray()
+    with open(filepath, "rb") as f:
+        for chunk in iter_chunks(f, DELTA_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE):
+            sizes.append(len(chunk))
+            digests += hashlib.new(algo, chunk).digest()[:SIGNATURE_DIGEST_SIZE]
+    return sizes, bytes(digests)
+
+
+def save_signature(path, sizes, digests):
+    """Guarda una firma: <I cantidad> + tamaños uint32 LE + digests"""
+    if sys.byteorder != "little":
+        sizes = array("I", sizes)
+        sizes.byteswap()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<I", len(sizes)))
+        f.write(sizes.tobytes())
+        f.write(digests)
+    os.replace(tmp_path, path)
+
+
+def load_signature(path):
+    """Lee una firma guardada con save_signature o None si no existe"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    count, = struct.unpack_from("<I", raw)
+    sizes = array("I")
+    sizes.frombytes(raw[4:4 + 4 * count])
+    if sys.byteorder != "little":
+        sizes.byteswap()
+    return sizes, raw[4 + 4 * count:]
+
+
+def _signature_batch(items, algo, signatures_dir):
+    """Calcula y guarda en un proceso del pool las firmas de [(ruta, hash)]"""
+    for path, file_hash in items:
+        sizes, digests = file_signature(path, algo)
+        save_signature(os.path.join(signatures_dir, f"{file_hash}{SIGNATURE_EXT}"), sizes, digests)
+    return len(items)
+
+
+def _hash_files_batch(paths, algo):
+    """Hashea un lote de archivos en un proceso del pool: [(ruta, hash, chunks)]"""
+    results = []
+    for path in paths:
+        if os.path.getsize(path) > CHUNK_THRESHOLD:
+            results.append((path,) + hash_file_chunks(path, algo))
+        else:
+            results.append((path, PatchSystem.get_file_hash(path, algo), None))
+    return results
+
+
+class _RangesReader:
+    """Objeto tipo archivo que concatena rangos (offset, tamaño) de un archivo"""
+    
+    def __init__(self, path, ranges):
+        self.file = open(path, "rb")
+        self.ranges = list(ranges)
+        self.index = 0
+        self.remaining = self.ranges[0][1] if self.ranges else 0
+        if self.ranges:
+            self.file.seek(self.ranges[0][0])
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = sum(length for _, length in self.ranges)
+        out = bytearray()
+        while len(out) < size and self.index < len(self.ranges):
+            if self.remaining == 0:
+                self.index += 1
+                if self.index == len(self.ranges):
+                    break
+                offset, self.remaining = self.ranges[self.index]
+                self.file.seek(offset)
+                continue
+            block = self.file.read(min(size - len(out), self.remaining))
+            if not block:
+                raise IOError("archivo truncado mientras se creaba el parche")
+            out += block
+            self.remaining -= len(block)
+        return bytes(out)
+    
+    def close(self):
+        self.file.close()
+
+
+# Compresión paralela de parches: bloques de GZIP_BLOCK_SIZE comprimidos por
+# separado como miembros gzip concatenados (cualquier lector gzip los lee en
+# serie). Cada miembro lleva en la cabecera el subcampo extra "AP" con su
+# tamaño comprimido, así el instalador localiza los miembros sin descomprimir
+# y los descomprime en paralelo. zlib suelta el GIL: bastan hilos.
+# El formato está duplicado en ParallelGzipReader de AtlasInstaller.py (que no
+# importa este módulo): cualquier cambio se hace en los dos a la vez.
+GZIP_BLOCK_SIZE = 4 * 1024 * 1024
+GZIP_EXTRA_ID = b"AP"
+_GZIP_HEADER = struct.Struct("<BBBBIBBH2sHI")
+
+
+def _gzip_member(data, level=6):
+    """Miembro gzip completo de ``data`` con el subcampo "AP" (tamaño del miembro)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    size = _GZIP_HEADER.size + len(body) + 8
+    # FLG=FEXTRA, MTIME=0, XFL=0, OS=255; XLEN=8: "AP", 4 bytes de tamaño
+    header = _GZIP_HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 255, 8, GZIP_EXTRA_ID, 4, size)
+    return header + body + struct.pack("<II", zlib.crc32(data), len(data) & 0xffffffff)
+
+
+# Política de compresión por archivo: lo que ya viene comprimido (imágenes,
+# audio, archivos comprimidos) se guarda tal cual. Si la extensión no lo dice,
+# se comprime rápido (nivel 1) una muestra del centro del archivo: si no baja
+# de COMPRESSION_MIN_RATIO, deflate no va a ganar nada.
+INCOMPRESSIBLE_EXTENSIONS = frozenset((
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".heic",
+    ".mp3", ".ogg", ".opus", ".m4a", ".aac", ".flac", ".mp4", ".webm", ".mkv", ".mov",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar", ".jar", ".apk",
+    ".woff", ".woff2", ".pbf", ".mbtiles", ".pdf", ".appimage"
+))
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+COMPRESSION_MIN_RATIO = 0.95
+
+
+class CompressionPolicy:
+    """Decide por archivo entre guardar y comprimir y lleva las estadísticas"""
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stored = [0, 0]        # [archivos, bytes] guardados sin comprimir
+        self.compressed = [0, 0]    # [archivos, bytes] comprimidos
+        self.sample_time = 0.0
+        self.start = time.perf_counter()
+    
+    def should_compress(self, filepath, packed_size=None):
+        """True si vale la pena comprimir ``filepath`` (extensión + muestra de entropía).
+        
+        ``packed_size``: bytes que se empaquetan si no es el archivo entero
+        (chunks/deltas); solo cuenta para las estadísticas.
+        """
+        size = os.path.getsize(filepath)
+        compress = True
+        if self.enabled:
+            if os.path.splitext(filepath)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+                compress = False
+            elif size > 4096:
+                started = time.perf_counter()
+                with open(filepath, "rb") as f:
+                    # Del centro: las cabeceras suelen comprimir aunque el resto no
+                    f.seek(max(0, size // 2 - COMPRESSION_SAMPLE_SIZE // 2))
+                    sample = f.read(COMPRESSION_SAMPLE_SIZE)
+                compress = len(zlib.compress(sample, 1)) < len(sample) * COMPRESSION_MIN_RATIO
+                self.sample_time += time.perf_counter() - started
+        
+        stats = self.compressed if compress else self.stored
+        stats[0] += 1
+        stats[1] += size if packed_size is None else packed_size
+        return compress
+    
+    def report(self, compressed_out=None):
+        """Imprime archivos/bytes guardados y comprimidos, lo ahorrado y el tiempo"""
+        if not (self.stored[0] or self.compressed[0]):
+            return
+        elapsed = time.perf_counter() - self.start
+        line = f"   🗜️  Comprimidos: {self.compressed[0]} ({self.compressed[1] / (1024*1024):.2f} MB"
+        if compressed_out is not None:
+            saved = self.compressed[1] - compressed_out
+            line += f" → {compressed_out / (1024*1024):.2f} MB, -{saved / (1024*1024):.2f} MB"
+        print(line + ")")
+        if self.stored[0]:
+            print(f"   📥 Sin comprimir (ya comprimidos): {self.stored[0]} "
+                  f"({self.stored[1] / (1024*1024):.2f} MB)")
+        print(f"   ⏱️  Muestreo: {self.sample_time:.2f} s, empaquetado: {elapsed:.2f} s")
+
+
+class ParallelGzipWriter:
+    """Objeto tipo archivo que comprime en bloques independientes en paralelo.
+    
+    Los bloques se comprimen en un pool de hilos y se escriben en orden;
+    como mucho hay ``2 * workers`` bloques en vuelo.
+    """
+    
+    def __init__(self, fileobj, workers=None, block_size=GZIP_BLOCK_SIZE, level=6):
+        self.fileobj = fileobj
+        self.block_size = block_size
+        self.level = level
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.buffer = bytearray()
+        # {nivel: [bytes de entrada, bytes de salida]}
+        self.stats = {}
+    
+    def set_level(self, level):
+        """Cambia el nivel para lo que se escriba después (nivel 0: sección sin comprimir)"""
+        if level != self.level:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            self.level = level
+    
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+    
+    def _submit(self, block):
+        self.pending.append((self.level, len(block), self.pool.submit(_gzip_member, block, self.level)))
+        while len(self.pending) > 2 * self.workers:
+            self._write_next()
+    
+    def _write_next(self):
+        level, size, future = self.pending.popleft()
+        member = future.result()
+        stats = self.stats.setdefault(level, [0, 0])
+        stats[0] += size
+        stats[1] += len(member)
+        self.fileobj.write(member)
+    
+    def close(self):
+        if self.pool is None:
+            return
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self._write_next()
+        finally:
+            self.pool.shutdown()
+            self.pool = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParallelGzipReader(io.RawIOBase):
+    """Lee los miembros de ``ParallelGzipWriter`` descomprimiendo varios a la vez.
+    
+    Copia de ``ParallelGzipReader`` de AtlasInstaller.py: los cambios de
+    formato se hacen en las dos.
+    """
+    
+    def __init__(self, fileobj, workers=None):
+        super().__init__()
+        self.fileobj = fileobj
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.block = memoryview(b"")
+        self.eof = False
+    
+    @staticmethod
+    def detect(fileobj):
+        """True si el gzip de ``fileobj`` (posición actual) tiene el subcampo "AP" """
+        position = fileobj.tell()
+        header = fileobj.read(_GZIP_HEADER.size)
+        fileobj.seek(position)
+        return (len(header) == _GZIP_HEADER.size and header[:2] == b"\x1f\x8b"
+                and header[3] & 4 and header[12:14] == GZIP_EXTRA_ID)
+    
+    def _next_member(self):
+        """Siguiente miembro comprimido (bytes) o None al final"""
+        header = self.fileobj.read(12)
+        if not header:
+            return None
+        if len(header) < 12 or header[:2] != b"\x1f\x8b" or not header[3] & 4:
+            raise OSError("miembro gzip sin tamaño: no es un parche comprimido en paralelo")
+        xlen = struct.unpack("<H", header[10:12])[0]
+        extra = self.fileobj.read(xlen)
+        i = 0
+        while i + 4 <= len(extra):
+            field_id, field_len = extra[i:i + 2], struct.unpack("<H", extra[i + 2:i + 4])[0]
+            if field_id == GZIP_EXTRA_ID and field_len == 4:
+                size = struct.unpack("<I", extra[i + 4:i + 8])[0]
+                rest = self.fileobj.read(size - 12 - xlen)
+                if len(rest) != size - 12 - xlen:
+                    raise EOFError("parche comprimido truncado")
+                return header + extra + rest
+            i += 4 + field_len
+        raise OSError("miembro gzip sin tamaño: no es un parche comprimido en paralelo")
+    
+    def _fill(self):
+        while not self.eof and len(self.pending) < 2 * self.workers:
+            member = self._next_member()
+            if member is None:
+                self.eof = True
+                break
+            # wbits=31: cabecera gzip y comprobación de CRC/tamaño
+            self.pending.append(self.pool.submit(zlib.decompress, member, 31))
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while not self.block:
+            self._fill()
+            if not self.pending:
+                return 0
+            self.block = memoryview(self.pending.popleft().result())
+        size = min(len(buffer), len(self.block))
+        buffer[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+    
+    def close(self):
+        if self.pool is not None:
+            for future in self.pending:
+                future.cancel()
+            self.pool.shutdown()
+            self.pool = None
+        super().close()
+
+
+def merge_diff(old_items, new_items):
+    """Diff por mezcla de dos secuencias (ruta, info) ordenadas por ruta.
+    
+    Recorre ambas a la vez sin cargarlas en memoria y produce
+    (ruta, info_anterior, info_nueva); la que falta en un lado es None.
+    """
+    old_items, new_items = iter(old_items), iter(new_items)
+    old = next(old_items, None)
+    new = next(new_items, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield old[0], old[1], None
+            old = next(old_items, None)
+        elif old is None or new[0] < old[0]:
+            yield new[0], None, new[1]
+            new = next(new_items, None)
+        else:
+            yield new[0], old[1], new[1]
+            old = next(old_items, None)
+            new = next(new_items, None)
+
+
+class ManifestStore:
+    """Manifest indexado en SQLite: una fila por archivo.
+    
+    Permite consultar por ruta o por hash sin cargar todo el manifest,
+    guarda solo las filas que cambian y devuelve los archivos ordenados por
+    ruta para ``merge_diff``. ``to_dict``/``export_json`` producen el formato
+    JSON de siempre ({"version", "algo", "chunker", "release", "files"}).
+    """
+    META_KEYS = ("version", "algo", "chunker", "release")
+    
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                hash BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                modified REAL,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                chunks TEXT
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+        """)
+    
+    def close(self):
+        self.db.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    
+    def is_empty(self):
+        return not self.db.execute(
+            "SELECT EXISTS (SELECT 1 FROM meta) OR EXISTS (SELECT 1 FROM files)").fetchone()[0]
+    
+    @staticmethod
+    def _info(row):
+        """Fila (hash, size, modified, mtime_ns, inode, chunks) → entrada del manifest"""
+        file_hash, size, modified, mtime_ns, inode, chunks = row
+        info = {"hash": file_hash.hex(), "size": size}
+        if inode is not None and inode < 0:
+            inode += 1 << 64
+        # Manifests antiguos no tienen mtime_ns/inodo: se omiten igual que en el JSON
+        for key, value in (("modified", modified), ("mtime_ns", mtime_ns), ("inode", inode)):
+            if value is not None:
+                info[key] = value
+        if chunks is not None:
+            info["chunks"] = json.loads(chunks)
+        return info
+    
+    @staticmethod
+    def _row(path, info):
+        chunks = info.get("chunks")
+        inode = info.get("inode")
+        if inode is not None and inode >= 1 << 63:
+            # INTEGER de SQLite es de 64 bits con signo; algunos sistemas de archivos usan el bit alto
+            inode -= 1 << 64
+        return (path, bytes.fromhex(info["hash"]), info["size"], info.get("modified"), info.get("mtime_ns"),
+                inode, json.dumps(chunks, separators=(",", ":")) if chunks is not None else None)
+    
+    def meta(self):
+        """{"version", "algo", "chunker", "release"} guardados (solo los presentes)"""
+        return dict(self.db.execute("SELECT key, value FROM meta"))
+    
+    def get(self, path):
+        """Entrada de ``path`` o None"""
+        row = self.db.execute(
+            "SELECT hash, size, modified, mtime_ns, inode, chunks FROM files WHERE path = ?",
+            (path,)).fetchone()
+        return self._info(row) if row else None
+    
+    def paths_with_hash(self, file_hash):
+        """Rutas (ordenadas) cuyo contenido tiene ``file_hash``"""
+        return [path for path, in self.db.execute(
+            "SELECT path FROM files WHERE hash = ? ORDER BY path", (bytes.fromhex(file_hash),))]
+    
+    def _rows(self):
+        # Orden binario de SQLite sobre UTF-8 = orden de los str de Python
+        return self.db.execute(
+            "SELECT path, hash, size, modified, mtime_ns, inode, chunks FROM files ORDER BY path")
+    
+    def items(self):
+        """(ruta, info) ordenados por ruta"""
+        for row in self._rows():
+            yield row[0], self._info(row[1:])
+    
+    def to_dict(self):
+        """Manifest completo en el formato JSON"""
+        manifest = self.meta()
+        manifest.setdefault("version", "1.0.0")
+        manifest["files"] = dict(self.items())
+        return manifest
+    
+    def set_meta(self, meta):
+        """Sustituye la cabecera por las claves de ``META_KEYS`` presentes en ``meta``"""
+        with self.db:
+            self.db.execute("DELETE FROM meta")
+            self.db.executemany("INSERT INTO meta VALUES (?, ?)",
+                                [(key, str(meta[key])) for key in self.META_KEYS if key in meta])
+    
+    def extend(self, items):
+        """Escribe las entradas (ruta, info) de ``items`` sin acumularlas en memoria"""
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (self._row(path, info) for path, info in items))
+    
+    def update(self, manifest):
+        """Deja el store igual que ``manifest`` (dict u otro ``ManifestStore``)
+        escribiendo solo lo que cambia.
+        
+        Devuelve (filas escritas, filas eliminadas).
+        """
+        upserts, deletes = [], []
+        # Se comparan filas ya codificadas: sin construir un dict por entrada guardada
+        if isinstance(manifest, ManifestStore):
+            # Otro store: mezcla de los dos cursores ordenados por ruta
+            new_rows = ((row[0], row) for row in manifest._rows())
+            manifest = manifest.meta()
+        else:
+            new_rows = ((path, self._row(path, info)) for path, info in sorted(manifest["files"].items()))
+        old_rows = ((row[0], row) for row in self._rows())
+        for path, old, new in merge_diff(old_rows, new_rows):
+            if new is None:
+                deletes.append((path,))
+            elif old != new:
+                upserts.append(new)
+        
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE path = ?", deletes)
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", upserts)
+            self.db.execute("DELETE FROM meta")
+            self.db.executemany("INSERT INTO meta VALUES (?, ?)",
+                                [(key, str(manifest[key])) for key in self.META_KEYS if key in manifest])
+        return len(upserts), len(deletes)
+    
+    def diff(self, other):
+        """``merge_diff`` entre este store (anterior) y ``other`` (nuevo)"""
+        return merge_diff(self.items(), other.items())
+    
+    def export_json(self, path):
+        """Exporta el manifest al formato JSON, entrada por entrada (memoria constante)"""
+        header = self.meta()
+        header.setdefault("version", "1.0.0")
+        with open(path, 'w') as f:
+            f.write(json.dumps(header)[:-1] + (', "files": {' if header else '"files": {'))
+            for i, (file_path, info) in enumerate(self.items()):
+                f.write((", " if i else "") + f"{json.dumps(file_path)}: {json.dumps(info)}")
+            f.write("}}")
 
 
 class PatchSystem:
-    def __init__(self, platform="linux"):
+    # Tamaño máximo de un lote enviado a un proceso del pool
+    HASH_BATCH_FILES = 64
+    HASH_BATCH_BYTES = 64 * 1024 * 1024
+    
+    def __init__(self, platform="linux", workers=None, full_rehash=False, algo=None, stream_diff=False,
+                 compress_all=False, client_format=1):
         self.platform = platform
         self.base_folder = f"Atlas_Interactivo-1.0.0-{platform}-x64"
-        self.manifest_file = f".manifest_{platform}.json"
+        self.manifest_file = f".manifest_{platform}.db"
+        # Manifest JSON de versiones anteriores (se migra al store la primera vez)
+        self.legacy_manifest_file = f".manifest_{platform}.json"
         self.patches_dir = f"drive_files/patches/{platform}"
+        self.signatures_dir = f".signatures_{platform}"
+        # Manifest de cada release publicada (para parches acumulativos)
+        self.history_dir = f"{self.patches_dir}/manifests"
+        self.workers = workers or os.cpu_count() or 1
+        self.full_rehash = full_rehash
+        # None: el del manifest anterior (o DEFAULT_HASH_ALGO si no hay)
+        self.algo = algo
+        # Diff en streaming contra el store (sin cargar el manifest anterior)
+        self.stream_diff = stream_diff
+        # Comprimir todo, sin CompressionPolicy (para comparar)
+        self.compress_all = compress_all
+        # Formato de parche más nuevo que entienden los instaladores publicados
+        self.client_format = min(client_format, PATCH_FORMAT)
         
         # Crear directorios
         Path(self.patches_dir).mkdir(parents=True, exist_ok=True)
         
-    def get_file_hash(self, filepath):
-        """Calcula hash MD5 de un archivo"""
-        hash_md5 = hashlib.md5()
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+    @staticmethod
+    def get_file_hash(filepath, algo="md5"):
+        """Calcula el hash de un archivo (MD5 por compatibilidad)"""
+        return digest_file(filepath, algo)
+    
+    def resolve_algo(self, previous=None):
+        """Algoritmo para el nuevo manifest"""
+        if self.algo:
+            return self.algo
+        if previous and previous.get("files"):
+            return previous.get("algo", "md5")
+        return DEFAULT_HASH_ALGO
+    
+    def open_manifest_store(self):
+        """Abre el store del manifest, migrando el JSON antiguo si hace falta"""
+        store = ManifestStore(self.manifest_file)
+        if store.is_empty() and os.path.exists(self.legacy_manifest_file):
+            with open(self.legacy_manifest_file, 'r') as f:
+                store.update(json.load(f))
+            print(f"   🗃️  Manifest migrado: {self.legacy_manifest_file} → {self.manifest_file}")
+        return store
     
     def load_manifest(self):
         """Carga el manifest anterior"""
-        if os.path.exists(self.manifest_file):
-            with open(self.manifest_file, 'r') as f:
-                return json.load(f)
-        return {"files": {}, "version": "0.0.0"}
+        with self.open_manifest_store() as store:
+            if store.is_empty():
+                return {"files": {}, "version": "0.0.0"}
+            return store.to_dict()
+    
+    def save_manifest(self, manifest):
+        """Guarda el manifest actual (solo se escriben las filas que cambian)"""
+        with self.open_manifest_store() as store:
+            written, deleted = store.update(manifest)
+        if written or deleted:
+            print(f"   🗃️  Manifest: {written} entradas escritas, {deleted} eliminadas")
+    
+    def export_manifest(self, path=None):
+        """Exporta el manifest a JSON (p. ej. para ``AtlasInstaller --repair --manifest``)"""
+        path = path or f"drive_files/manifest_{self.platform}.json"
+        Path(os.path.dirname(path) or ".").mkdir(parents=True, exist_ok=True)
+        with self.open_manifest_store() as store:
+            if store.is_empty():
+                print(f"❌ No hay manifest para {self.platform}")
+                return None
+            store.export_json(path)
+            count = len(store)
+        print(f"✅ Manifest exportado: {path} ({count} archivos)")
+        return path
     
-    def create_manifest(self):
-        """Crea nuevo manifest de todos los archivos"""
+    @staticmethod
+    def release_of(manifest):
+        """Identificador de release de un manifest ("1.0.0" = instalación completa)"""
+        return manifest.get("release", "1.0.0")
+    
+    def save_release_manifest(self, manifest):
+        """Guarda el manifest (dict o ``ManifestStore``) en el historial de releases si aún no está"""
+        Path(self.history_dir).mkdir(parents=True, exist_ok=True)
+        if isinstance(manifest, ManifestStore):
+            path = os.path.join(self.history_dir, f"{manifest.meta().get('release', '1.0.0')}.json")
+            if not os.path.exists(path):
+                manifest.export_json(path)
+            return
+        path = os.path.join(self.history_dir, f"{self.release_of(manifest)}.json")
+        if not os.path.exists(path):
+            with open(path, 'w') as f:
+                json.dump(manifest, f)
+    
+    def list_releases(self):
+        """Releases con manifest en el historial, de la más antigua a la más nueva"""
+        if not os.path.isdir(self.history_dir):
+            return []
+        # "1.0.0" (la instalación completa) va antes que cualquier timestamp
+        return sorted((name[:-5] for name in os.listdir(self.history_dir) if name.endswith(".json")),
+                      key=lambda release: (release != "1.0.0", release))
+    
+    def load_release_manifest(self, release):
+        with open(os.path.join(self.history_dir, f"{release}.json"), 'r') as f:
+            return json.load(f)
+    
+    def create_manifest(self, progress_callback=None, previous=None, store=None):
+        """Crea nuevo manifest de todos los archivos.
+        
+        Los hashes se calculan en un pool de ``self.workers`` procesos,
+        empezando por los archivos más grandes para repartir mejor la carga.
+        ``progress_callback(bytes_hasheados, bytes_totales, archivos)`` recibe
+        el avance; si no se pasa, se imprime en consola.
+        
+        Si se pasa el manifest ``previous`` (dict o ``ManifestStore``), se
+        reutiliza el hash de los archivos cuyo (tamaño, mtime_ns, inodo) no
+        cambió, salvo que ``self.full_rehash`` esté activo.
+        
+        Con ``store`` (un ``ManifestStore`` vacío) las entradas se escriben en
+        él en lugar de en el dict y se devuelve el store.
+        """
         print(f"🔍 Escaneando {self.base_folder}...")
-        manifest = {"version": "1.0.0", "files": {}}
+        if isinstance(previous, ManifestStore):
+            # Del store solo hace falta la cabecera; las entradas se recorren ordenadas
+            previous_items = previous.items()
+            previous = dict(previous.meta(), files=len(previous) > 0)
+        else:
+            previous_items = sorted(previous.get("files", {}).items()) if previous else ()
+        algo = self.resolve_algo(previous)
+        manifest = {"version": "1.0.0", "algo": algo, "chunker": CHUNKER, "files": {}}
         
+        entries = []
         for root, dirs, files in os.walk(self.base_folder):
             for file in files:
                 filepath = os.path.join(root, file)
-                rel_path = os.path.relpath(filepath, self.base_folder)
+                st = os.stat(filepath)
                 
-                # Omitir archivos muy grandes o temporales
-                if file.startswith('.') or os.path.getsize(filepath) > 100_000_000:
+                # Omitir archivos temporales
+                if file.startswith('.'):
                     continue
                 
-                file_hash = self.get_file_hash(filepath)
-                manifest["files"][rel_path] = {
-                    "hash": file_hash,
-                    "size": os.path.getsize(filepath),
-                    "modified": os.path.getmtime(filepath)
-                }
+                entries.append((filepath, os.path.relpath(filepath, self.base_folder), st))
+        
+        # Caché de stat: solo se rehashea lo que cambió desde el manifest anterior
+        cached = {}
+        # Los chunks de archivos grandes solo se reutilizan si se trocearon con el esquema actual
+        same_chunker = previous and previous.get("chunker") == CHUNKER
+        if previous and not self.full_rehash and previous.get("algo", "md5") == algo:
+            # Mezcla por ruta con el manifest anterior, sin indexarlo en memoria
+            current = sorted((rel_path, (filepath, st)) for filepath, rel_path, st in entries)
+            for rel_path, info, entry in merge_diff(previous_items, current):
+                if info is None or entry is None:
+                    continue
+                filepath, st = entry
+                if (self._stat_matches(info, st.st_size, st.st_mtime_ns, st.st_ino)
+                        and (st.st_size <= CHUNK_THRESHOLD or ("chunks" in info and same_chunker))):
+                    cached[filepath] = (info["hash"], info.get("chunks"))
+        
+        to_hash = [filepath for filepath, _, _ in entries if filepath not in cached]
+        if cached:
+            print(f"   ♻️  {len(cached)} archivos sin cambios (caché), {len(to_hash)} por hashear")
+        
+        hashes = self._hash_files(to_hash,
+                                  {filepath: st.st_size for filepath, _, st in entries},
+                                  algo, progress_callback)
+        hashes.update(cached)
+        
+        def entry(filepath, st):
+            file_hash, chunks = hashes.pop(filepath)
+            info = {
+                "hash": file_hash,
+                "size": st.st_size,
+                "modified": st.st_mtime,
+                "mtime_ns": st.st_mtime_ns,
+                "inode": st.st_ino
+            }
+            if chunks is not None:
+                # Archivos grandes: chunks definidos por contenido [hash, tamaño]
+                info["chunks"] = chunks
+            return info
+        
+        if store is not None:
+            store.set_meta(manifest)
+            store.extend((rel_path, entry(filepath, st)) for filepath, rel_path, st in entries)
+            return store
+        
+        for filepath, rel_path, st in entries:
+            manifest["files"][rel_path] = entry(filepath, st)
         
         return manifest
     
+    @staticmethod
+    def _stat_matches(info, size, mtime_ns, inode):
+        """True si la entrada del manifest corresponde al mismo (tamaño, mtime_ns, inodo)"""
+        # Manifests antiguos no guardan mtime_ns/inodo: se rehashea
+        return (mtime_ns is not None
+                and info.get("size") == size
+                and info.get("mtime_ns") == mtime_ns
+                and info.get("inode") == inode)
+    
+    def _hash_files(self, paths, sizes, algo="md5", progress_callback=None):
+        """Hashea ``paths`` en paralelo y devuelve {ruta: (hash, chunks o None)}"""
+        total_bytes = sum(sizes[path] for path in paths) or 1
+        done_bytes = 0
+        hashes = {}
+        last_report = [0.0]
+        
+        def report():
+            # Limitar la frecuencia: con miles de archivos pequeños la consola frena el hasheo
+            now = time.monotonic()
+            if now - last_report[0] < 0.2 and len(hashes) < len(paths):
+                return
+            last_report[0] = now
+            if progress_callback:
+                progress_callback(done_bytes, total_bytes, len(hashes))
+            else:
+                print(f"\r   🔢 Hasheando: {len(hashes)}/{len(paths)} archivos "
+                      f"({done_bytes / total_bytes * 100:.1f}%)", end='', flush=True)
+        
+        # Los más grandes primero: así el último archivo en terminar es pequeño
+        paths = sorted(paths, key=lambda path: sizes[path], reverse=True)
+        
+        if self.workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                _, file_hash, chunks = _hash_files_batch([path], algo)[0]
+                hashes[path] = (file_hash, chunks)
+                done_bytes += sizes[path]
+                report()
+        else:
+            # Lotes de archivos pequeños para no pagar un viaje al pool por archivo
+            batches = []
+            batch, batch_bytes = [], 0
+            for path in paths:
+                batch.append(path)
+                batch_bytes += sizes[path]
+                if len(batch) >= self.HASH_BATCH_FILES or batch_bytes >= self.HASH_BATCH_BYTES:
+                    batches.append(batch)
+                    batch, batch_bytes = [], 0
+            if batch:
+                batches.append(batch)
+            
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(_hash_files_batch, batch, algo) for batch in batches]
+                for future in as_completed(futures):
+                    for path, file_hash, chunks in future.result():
+                        hashes[path] = (file_hash, chunks)
+                        done_bytes += sizes[path]
+                    report()
+        
+        if paths and not progress_callback:
+            print()
+        return hashes
+    
     def find_changes(self, old_manifest, new_manifest):
         """Encuentra archivos nuevos/modificados"""
         changes = {"new": [], "modified": [], "deleted": []}
@@ -73,11 +1026,18 @@ class PatchSystem:
         old_files = old_manifest.get("files", {})
         new_files = new_manifest["files"]
         
+        # Con distinto algoritmo los hashes no son comparables: se usa la caché de stat
+        same_algo = old_manifest.get("algo", "md5") == new_manifest.get("algo", "md5")
+        
         # Buscar nuevos y modificados
         for path, info in new_files.items():
             if path not in old_files:
                 changes["new"].append(path)
-            elif info["hash"] != old_files[path]["hash"]:
+            elif same_algo:
+                if info["hash"] != old_files[path]["hash"]:
+                    changes["modified"].append(path)
+            elif not self._stat_matches(old_files[path], info["size"],
+                                        info.get("mtime_ns"), info.get("inode")):
                 changes["modified"].append(path)
         
         # Buscar eliminados
@@ -87,63 +1047,596 @@ class PatchSystem:
         
         return changes
     
-    def create_patch(self, changes):
-        """Crea archivo de parche con los cambios"""
+    def iter_changes(self, old_items, new_items, same_algo=True):
+        """Diff en streaming de dos secuencias (ruta, info) ordenadas por ruta.
+        
+        Una sola pasada con ``merge_diff`` y memoria constante: produce
+        (tipo, ruta, info_anterior, info_nueva) con tipo "new", "modified" o
+        "deleted" en lugar de construir las listas de ``find_changes``.
+        """
+        for path, old_info, info in merge_diff(old_items, new_items):
+            if info is None:
+                yield "deleted", path, old_info, None
+            elif old_info is None:
+                yield "new", path, None, info
+            elif same_algo:
+                if info["hash"] != old_info["hash"]:
+                    yield "modified", path, old_info, info
+            elif not self._stat_matches(old_info, info["size"],
+                                        info.get("mtime_ns"), info.get("inode")):
+                yield "modified", path, old_info, info
+    
+    def iter_patch_changes(self, old_store, new_store, plans, duplicates, counts, renames):
+        """Cambios entre ``old_store`` y ``new_store`` listos para empaquetar.
+        
+        Produce (tipo, ruta) para ``_create_tar_patch``/``_create_zip_patch`` y,
+        a medida que avanza, completa ``plans`` (chunks/deltas), ``renames``
+        y ``duplicates`` (el contenido ya instalado se busca por hash en el
+        store) y ``counts``. Los dos manifests se recorren con cursores
+        ordenados por ruta: solo crece lo que cambia, nunca con el árbol entero.
+        """
+        algo = new_store.meta().get("algo", "md5")
+        same_algo = old_store.meta().get("algo", "md5") == algo
+        stored = {}
+        
+        for kind, path, old_info, info in self.iter_changes(old_store.items(), new_store.items(), same_algo):
+            counts[kind] += 1
+            if kind == "deleted" or self.client_format < 2:
+                # Formato 1: solo archivos completos
+                yield kind, path
+                continue
+            
+            # Contenido que el cliente tiene en una ruta que se elimina: se mueve allí
+            candidates = old_store.paths_with_hash(info["hash"]) if same_algo else []
+            moved = next((other for other in candidates if new_store.get(other) is None), None)
+            if moved is not None:
+                renames.append(["copy", moved, path, info["hash"], info["size"]])
+                continue
+            
+            # Contenido repetido: de un archivo instalado que no cambia o de otro del parche
+            source = installed = None
+            if same_algo:
+                source = next((other for other in candidates
+                               if (new_store.get(other) or {}).get("hash") == info["hash"]), None)
+                installed = source is not None
+            if source is None and info["hash"] in stored:
+                source, installed = stored[info["hash"]], False
+            if source is not None:
+                duplicates[path] = {"source": source, "hash": info["hash"],
+                                    "size": info["size"], "installed": installed}
+                continue
+            stored[info["hash"]] = path
+            
+            if kind == "modified" and same_algo:
+                plan = (self._plan_chunked_file(old_info, info)
+                        or self._plan_delta_file(path, old_info, info, algo))
+                if plan:
+                    plan[0]["data"] = f"{CHUNKS_DIR}/{len(plans)}.bin"
+                    plans[path] = plan
+            yield kind, path
+    
+    @staticmethod
+    def _change_stream(changes):
+        """(tipo, ruta) de una tabla {"new", "modified", "deleted"} o de un iterador de cambios"""
+        if isinstance(changes, dict):
+            for kind in ("new", "modified", "deleted"):
+                for path in changes[kind]:
+                    yield kind, path
+        else:
+            yield from changes
+    
+    def plan_chunked_files(self, changes, old_manifest, new_manifest):
+        """Recetas para reconstruir archivos grandes modificados a partir de chunks.
+        
+        Devuelve {ruta: (receta, rangos)}: la receta lista, en orden, cada chunk
+        del archivo nuevo como ["old", offset, tamaño, hash] (se copia del
+        archivo instalado) o ["new", offset, tamaño, hash] (se lee de los datos
+        del parche); ``rangos`` son los trozos del archivo nuevo a empaquetar.
+        """
+        if old_manifest.get("algo", "md5") != new_manifest.get("algo", "md5"):
+            return {}
+        
+        old_files = old_manifest.get("files", {})
+        plans = {}
+        for path in changes["modified"]:
+            plan = self._plan_chunked_file(old_files.get(path), new_manifest["files"][path])
+            if plan:
+                plans[path] = plan
+        
+        return plans
+    
+    @staticmethod
+    def _plan_chunked_file(old_info, new_info):
+        """(receta, rangos) de un archivo grande modificado, o None"""
+        if not (old_info and "chunks" in old_info and "chunks" in new_info):
+            return None
+        
+        old_offsets = {}
+        offset = 0
+        for chunk_hash, size in old_info["chunks"]:
+            old_offsets.setdefault((chunk_hash, size), offset)
+            offset += size
+        
+        chunks, ranges = [], []
+        offset = data_size = 0
+        for chunk_hash, size in new_info["chunks"]:
+            if (chunk_hash, size) in old_offsets:
+                chunks.append(["old", old_offsets[(chunk_hash, size)], size, chunk_hash])
+            else:
+                chunks.append(["new", data_size, size, chunk_hash])
+                ranges.append((offset, size))
+                data_size += size
+            offset += size
+        
+        # Si casi todo cambió, el archivo completo es igual de bueno
+        if data_size >= new_info["size"]:
+            return None
+        
+        recipe = {
+            "size": new_info["size"],
+            "hash": new_info["hash"],
+            "base_hash": old_info["hash"],
+            "chunks": chunks
+        }
+        return recipe, ranges
+    
+    def plan_delta_files(self, changes, old_manifest, new_manifest, skip=()):
+        """Deltas binarios para archivos modificados con firma de su versión anterior.
+        
+        El archivo nuevo se trocea con los mismos cortes que la firma y cada
+        chunk se busca en ella; los tramos consecutivos se agrupan en
+        operaciones ["old"/"new", offset, tamaño, hash] con el mismo formato de
+        receta que ``plan_chunked_files``. Si el delta no es más pequeño que el
+        archivo, se omite y el archivo viaja completo.
+        """
+        algo = new_manifest.get("algo", "md5")
+        if old_manifest.get("algo", "md5") != algo:
+            return {}
+        
+        old_files = old_manifest.get("files", {})
+        plans = {}
+        for path in changes["modified"]:
+            if path in skip:
+                continue
+            plan = self._plan_delta_file(path, old_files.get(path), new_manifest["files"][path], algo)
+            if plan:
+                plans[path] = plan
+        
+        return plans
+    
+    def _plan_delta_file(self, path, old_info, new_info, algo):
+        """(receta, rangos) del delta de un archivo modificado, o None"""
+        if not old_info or not is_delta_candidate(path, new_info):
+            return None
+        
+        signature = load_signature(os.path.join(self.signatures_dir, f"{old_info['hash']}{SIGNATURE_EXT}"))
+        if signature is None:
+            return None
+        
+        sizes, digests = signature
+        old_offsets = {}
+        offset = 0
+        for i, size in enumerate(sizes):
+            digest = digests[i * SIGNATURE_DIGEST_SIZE:(i + 1) * SIGNATURE_DIGEST_SIZE]
+            old_offsets.setdefault((digest, size), offset)
+            offset += size
+        
+        # Operaciones [origen, offset, tamaño, posición en el archivo nuevo, hash del tramo];
+        # el archivo se lee en flujo y el hash de cada tramo se va acumulando
+        ops, ranges = [], []
+        position = data_size = 0
+        with open(os.path.join(self.base_folder, path), "rb") as f:
+            for chunk in iter_chunks(f, DELTA_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE):
+                key = (hashlib.new(algo, chunk).digest()[:SIGNATURE_DIGEST_SIZE], len(chunk))
+                if key in old_offsets:
+                    source, offset = "old", old_offsets[key]
+                else:
+                    source, offset = "new", data_size
+                    if ranges and ranges[-1][0] + ranges[-1][1] == position:
+                        ranges[-1] = (ranges[-1][0], ranges[-1][1] + len(chunk))
+                    else:
+                        ranges.append((position, len(chunk)))
+                    data_size += len(chunk)
+                
+                last = ops[-1] if ops else None
+                if last and last[0] == source and last[1] + last[2] == offset:
+                    last[2] += len(chunk)
+                else:
+                    last = [source, offset, len(chunk), position, hashlib.new(algo)]
+                    ops.append(last)
+                last[4].update(chunk)
+                position += len(chunk)
+        
+        if data_size >= position:
+            return None
+        
+        recipe = {
+            "size": new_info["size"],
+            "hash": new_info["hash"],
+            "base_hash": old_info["hash"],
+            "chunks": [[source, offset, size, digest.hexdigest()]
+                       for source, offset, size, _, digest in ops]
+        }
+        return recipe, ranges
+    
+    @staticmethod
+    def _manifest_files(manifest):
+        """(meta, iterador de (ruta, info)) de un manifest dict o ``ManifestStore``"""
+        if isinstance(manifest, ManifestStore):
+            return manifest.meta(), manifest.items()
+        return manifest, manifest["files"].items()
+    
+    def update_signatures(self, manifest):
+        """Calcula las firmas de delta que falten para el contenido de ``manifest`` (dict o store)"""
+        Path(self.signatures_dir).mkdir(parents=True, exist_ok=True)
+        meta, files = self._manifest_files(manifest)
+        # Solo candidatos a delta: el resto nunca se consulta en _plan_delta_file
+        missing = [(os.path.join(self.base_folder, path), info["hash"])
+                   for path, info in files
+                   if is_delta_candidate(path, info)
+                   and not os.path.exists(os.path.join(self.signatures_dir, f"{info['hash']}{SIGNATURE_EXT}"))]
+        if not missing:
+            return 0
+        
+        print(f"   ✍️  Calculando firmas de delta: {len(missing)} archivos")
+        algo = meta.get("algo", "md5")
+        missing.sort(key=lambda item: os.path.getsize(item[0]), reverse=True)
+        if self.workers <= 1:
+            _signature_batch(missing, algo, self.signatures_dir)
+        else:
+            batches = [missing[i:i + self.HASH_BATCH_FILES]
+                       for i in range(0, len(missing), self.HASH_BATCH_FILES)]
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for future in as_completed([pool.submit(_signature_batch, batch, algo, self.signatures_dir)
+                                            for batch in batches]):
+                    future.result()
+        return len(missing)
+    
+    def prune_signatures(self, manifest):
+        """Elimina las firmas de contenidos que ya no están en ``manifest`` (dict o store) ni en el historial"""
+        keep = {f"{info['hash']}{SIGNATURE_EXT}" for _, info in self._manifest_files(manifest)[1]}
+        # Las releases del historial siguen siendo base de parches acumulativos
+        for release in self.list_releases():
+            history = self.load_release_manifest(release)
+            keep.update(f"{info['hash']}{SIGNATURE_EXT}" for info in history["files"].values())
+        if os.path.isdir(self.signatures_dir):
+            for name in os.listdir(self.signatures_dir):
+                if name not in keep:
+                    os.remove(os.path.join(self.signatures_dir, name))
+    
+    def plan_renames(self, changes, old_manifest, new_manifest):
+        """Detecta archivos movidos/copiados desde rutas que el parche elimina.
+        
+        Si el contenido de un archivo nuevo/modificado estaba en el cliente en
+        una ruta eliminada, no viaja: se crea localmente desde ella antes de
+        borrar los eliminados. Devuelve (cambios a empaquetar, operaciones
+        ["copy", origen, destino, hash, tamaño]); ``_renames_index`` convierte
+        el último uso de cada origen en "move".
+        """
+        if old_manifest.get("algo", "md5") != new_manifest.get("algo", "md5"):
+            return changes, []
+        
+        old_files = old_manifest.get("files", {})
+        new_files = new_manifest["files"]
+        deleted = {}
+        for path in changes["deleted"]:
+            if path in old_files:
+                deleted.setdefault(old_files[path]["hash"], path)
+        
+        ops = []
+        for path in changes["new"] + changes["modified"]:
+            info = new_files[path]
+            if info["hash"] in deleted:
+                ops.append(["copy", deleted[info["hash"]], path, info["hash"], info["size"]])
+        if not ops:
+            return changes, []
+        
+        renamed = {op[2] for op in ops}
+        packed = {
+            "new": [path for path in changes["new"] if path not in renamed],
+            "modified": [path for path in changes["modified"] if path not in renamed],
+            "deleted": changes["deleted"]
+        }
+        return packed, ops
+    
+    def plan_duplicates(self, changes, old_manifest, new_manifest):
+        """Deduplica por contenido los archivos nuevos/modificados.
+        
+        Cada contenido distinto viaja una sola vez: si ya existe en la
+        instalación en un archivo que no cambia, ninguna copia viaja y todas se
+        toman de él ("installed"); si no, viaja la primera ruta y las demás se
+        copian de ella tras extraer. Devuelve (cambios a empaquetar, tabla
+        {ruta: {"source", "hash", "size", "installed"}}).
+        """
+        old_files = old_manifest.get("files", {})
+        new_files = new_manifest["files"]
+        changed = set(changes["new"]) | set(changes["modified"])
+        
+        # Contenidos que el cliente ya tiene en archivos que el parche no toca
+        installed = {}
+        for path, info in new_files.items():
+            if path not in changed and old_files.get(path, {}).get("hash") == info["hash"]:
+                installed.setdefault(info["hash"], path)
+        
+        stored = {}
+        table = {}
+        for path in sorted(changed):
+            info = new_files[path]
+            if info["hash"] in installed:
+                table[path] = {"source": installed[info["hash"]], "hash": info["hash"],
+                               "size": info["size"], "installed": True}
+            elif info["hash"] in stored:
+                table[path] = {"source": stored[info["hash"]], "hash": info["hash"],
+                               "size": info["size"], "installed": False}
+            else:
+                stored[info["hash"]] = path
+        
+        packed = {
+            "new": [path for path in changes["new"] if path not in table],
+            "modified": [path for path in changes["modified"] if path not in table],
+            "deleted": changes["deleted"]
+        }
+        return packed, table
+    
+    @staticmethod
+    def _renames_index(ops, algo):
+        """Contenido de RENAMES_FILE: el último uso de cada origen se mueve en vez de copiarse"""
+        last = {op[1]: i for i, op in enumerate(ops)}
+        ops = [["move" if last[op[1]] == i else "copy"] + op[1:] for i, op in enumerate(ops)]
+        return json.dumps({"algo": algo, "ops": ops}).encode()
+    
+    def _patch_format_index(self):
+        """Contenido de PATCH_FORMAT_FILE"""
+        return json.dumps({"format": self.client_format}).encode()
+    
+    def _duplicates_index(self, table, algo):
+        """Contenido de DUPLICATES_FILE"""
+        return json.dumps({"algo": algo, "files": table}).encode()
+    
+    def _chunked_files_index(self, plans, algo):
+        """Contenido de CHUNKED_FILES para el parche"""
+        recipes = {path: recipe for path, (recipe, _) in plans.items()}
+        return json.dumps({"algo": algo, "files": recipes}).encode()
+    
+    def create_patch(self, changes, old_manifest=None, new_manifest=None, patch_name=None):
+        """Crea archivo de parche con los cambios.
+        
+        Con los manifests, los archivos modificados viajan como chunks nuevos
+        (archivos grandes) o como delta binario (el resto, si hay firma de la
+        versión anterior) más una receta en ``CHUNKED_FILES``, en lugar de
+        completos, y los contenidos repetidos viajan una sola vez
+        (``DUPLICATES_FILE``). Esto es el formato 2: solo con
+        ``client_format`` 2.
+        """
         if not (changes["new"] or changes["modified"]):
             print("✅ No hay cambios para crear parche")
             return None
         
-        # Nombre del parche con timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        patch_name = f"patch_{timestamp}"
+        # Nombre del parche con timestamp (el de la release nueva si lo tiene)
+        if patch_name is None:
+            timestamp = (new_manifest or {}).get("release") or datetime.now().strftime("%Y%m%d_%H%M%S")
+            patch_name = f"patch_{timestamp}"
+        
+        plans = {}
+        duplicates = {}
+        renames = []
+        packed = changes
+        algo = "md5"
+        # Formato 1: solo archivos completos
+        if old_manifest is not None and new_manifest is not None and self.client_format >= 2:
+            packed, renames = self.plan_renames(changes, old_manifest, new_manifest)
+            packed, duplicates = self.plan_duplicates(packed, old_manifest, new_manifest)
+            plans = self.plan_chunked_files(packed, old_manifest, new_manifest)
+            plans.update(self.plan_delta_files(packed, old_manifest, new_manifest, skip=plans))
+            algo = new_manifest.get("algo", "md5")
+            for i, (recipe, _) in enumerate(plans.values()):
+                recipe["data"] = f"{CHUNKS_DIR}/{i}.bin"
+        
+        if self.platform == "linux":
+            patch_file = f"{self.patches_dir}/{patch_name}.tar.gz"
+            self._create_tar_patch(patch_file, packed, plans, algo, duplicates, renames)
+        else:
+            patch_file = f"{self.patches_dir}/{patch_name}.zip"
+            self._create_zip_patch(patch_file, packed, plans, algo, duplicates, renames)
+        
+        self._print_patch_summary(patch_file, {kind: len(paths) for kind, paths in changes.items()},
+                                  duplicates, renames)
+        return patch_file
+    
+    def create_patch_stream(self, old_store, new_store, patch_name=None):
+        """Crea el parche con el diff en streaming entre ``old_store`` y ``new_store``.
+        
+        Equivale a ``create_patch(find_changes(...), ...)`` sin cargar ningún
+        manifest ni construir las listas de cambios: los archivos se
+        empaquetan a medida que salen de ``iter_patch_changes``. Devuelve
+        (parche o None si no hay nuevos/modificados, contadores por tipo).
+        """
+        meta = new_store.meta()
+        if patch_name is None:
+            timestamp = meta.get("release") or datetime.now().strftime("%Y%m%d_%H%M%S")
+            patch_name = f"patch_{timestamp}"
+        
+        plans, duplicates, renames = {}, {}, []
+        counts = {"new": 0, "modified": 0, "deleted": 0}
+        algo = meta.get("algo", "md5")
+        changes = self.iter_patch_changes(old_store, new_store, plans, duplicates, counts, renames)
         
         if self.platform == "linux":
             patch_file = f"{self.patches_dir}/{patch_name}.tar.gz"
-            self._create_tar_patch(patch_file, changes)
+            self._create_tar_patch(patch_file, changes, plans, algo, duplicates, renames)
         else:
             patch_file = f"{self.patches_dir}/{patch_name}.zip"
-            self._create_zip_patch(patch_file, changes)
+            self._create_zip_patch(patch_file, changes, plans, algo, duplicates, renames)
+        
+        if not (counts["new"] or counts["modified"]):
+            os.remove(patch_file)
+            return None, counts
         
+        self._print_patch_summary(patch_file, counts, duplicates, renames)
+        return patch_file, counts
+    
+    @staticmethod
+    def _print_patch_summary(patch_file, counts, duplicates, renames=()):
         # Calcular tamaño
         size_mb = os.path.getsize(patch_file) / (1024 * 1024)
         
         print(f"✅ Parche creado: {patch_file}")
-        print(f"   📊 Archivos nuevos: {len(changes['new'])}")
-        print(f"   📊 Archivos modificados: {len(changes['modified'])}")
+        print(f"   📊 Archivos nuevos: {counts['new']}")
+        print(f"   📊 Archivos modificados: {counts['modified']}")
+        if counts["deleted"]:
+            print(f"   📊 Archivos eliminados: {counts['deleted']}")
+        if duplicates:
+            saved = sum(entry["size"] for entry in duplicates.values()) / (1024 * 1024)
+            print(f"   🔗 Duplicados sin empaquetar: {len(duplicates)} ({saved:.2f} MB)")
+        if renames:
+            moved = sum(op[4] for op in renames) / (1024 * 1024)
+            print(f"   🚚 Movidos/copiados en el cliente: {len(renames)} ({moved:.2f} MB)")
         print(f"   📦 Tamaño: {size_mb:.2f} MB")
-        
-        return patch_file
     
-    def _create_tar_patch(self, patch_file, changes):
-        """Crea parche .tar.gz para Linux"""
-        with tarfile.open(patch_file, "w:gz") as tar:
-            # Agregar archivos nuevos/modificados
-            for path in changes["new"] + changes["modified"]:
+    def _create_tar_patch(self, patch_file, changes, plans=None, algo="md5", duplicates=None, renames=None):
+        """Crea parche .tar.gz para Linux.
+        
+        ``changes`` es la tabla de cambios o un iterador de (tipo, ruta) como
+        el de ``iter_patch_changes``: cada archivo se empaqueta al llegar y
+        ``plans``/``duplicates``/``renames`` se leen al final, así que el
+        iterador puede irlos completando.
+        
+        Según ``CompressionPolicy``, lo que ya viene comprimido se deja para
+        una sección final de miembros gzip sin comprimir (nivel 0).
+        """
+        plans = {} if plans is None else plans
+        duplicates = {} if duplicates is None else duplicates
+        renames = [] if renames is None else renames
+        policy = CompressionPolicy(enabled=not self.compress_all)
+        stored = []
+        
+        def add(path):
+            if path in plans:
+                # Archivos grandes: solo los chunks nuevos (la receta va al final)
+                recipe, ranges = plans[path]
+                info = tarfile.TarInfo(recipe["data"])
+                info.size = sum(size for _, size in ranges)
+                info.mtime = int(time.time())
+                reader = _RangesReader(os.path.join(self.base_folder, path), ranges)
+                try:
+                    tar.addfile(info, reader)
+                finally:
+                    reader.close()
+                self._print_chunked(path, recipe, info.size)
+            else:
+                tar.add(os.path.join(self.base_folder, path), arcname=path)
+                print(f"  + {path}")
+        
+        with open(patch_file, "wb") as raw, ParallelGzipWriter(raw, self.workers) as gz, \
+                tarfile.open(fileobj=gz, mode="w|") as tar, tempfile.TemporaryFile() as deleted:
+            # Primer miembro: el instalador lo lee antes de extraer nada
+            if self.client_format >= 2:
+                self._add_tar_bytes(tar, PATCH_FORMAT_FILE, self._patch_format_index())
+            for kind, path in self._change_stream(changes):
+                if kind == "deleted":
+                    # Lista de eliminados en disco, no en memoria
+                    deleted.write(("\n" if deleted.tell() else "").encode() + path.encode())
+                    continue
                 full_path = os.path.join(self.base_folder, path)
-                if os.path.exists(full_path):
-                    tar.add(full_path, arcname=path)
-                    print(f"  + {path}")
+                if not os.path.exists(full_path):
+                    continue
+                packed_size = sum(size for _, size in plans[path][1]) if path in plans else None
+                if policy.should_compress(full_path, packed_size):
+                    add(path)
+                else:
+                    stored.append(path)
+            
+            # Sección sin comprimir: sin gastar CPU en datos que no bajan
+            if stored:
+                gz.set_level(0)
+                for path in stored:
+                    add(path)
+                gz.set_level(6)
+            
+            if plans:
+                self._add_tar_bytes(tar, CHUNKED_FILES, self._chunked_files_index(plans, algo))
+            
+            if duplicates:
+                self._add_tar_bytes(tar, DUPLICATES_FILE, self._duplicates_index(duplicates, algo))
+            
+            if renames:
+                self._add_tar_bytes(tar, RENAMES_FILE, self._renames_index(renames, algo))
             
             # Agregar lista de eliminados
-            if changes["deleted"]:
-                deleted_file = "/tmp/deleted_files.txt"
-                with open(deleted_file, 'w') as f:
-                    f.write("\n".join(changes["deleted"]))
-                tar.add(deleted_file, arcname=".deleted_files.txt")
-                os.remove(deleted_file)
-    
-    def _create_zip_patch(self, patch_file, changes):
-        """Crea parche .zip para Windows"""
-        with zipfile.ZipFile(patch_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for path in changes["new"] + changes["modified"]:
+            if deleted.tell():
+                info = tarfile.TarInfo(DELETED_FILES)
+                info.size = deleted.tell()
+                info.mtime = int(time.time())
+                deleted.seek(0)
+                tar.addfile(info, deleted)
+        
+        policy.report(sum(out for level, (_, out) in gz.stats.items() if level))
+    
+    @staticmethod
+    def _add_tar_bytes(tar, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+    
+    def _create_zip_patch(self, patch_file, changes, plans=None, algo="md5", duplicates=None, renames=None):
+        """Crea parche .zip para Windows (cada entrada comprimida o guardada según ``CompressionPolicy``)"""
+        plans = {} if plans is None else plans
+        duplicates = {} if duplicates is None else duplicates
+        renames = [] if renames is None else renames
+        policy = CompressionPolicy(enabled=not self.compress_all)
+        compressed_out = 0
+        with zipfile.ZipFile(patch_file, 'w', zipfile.ZIP_DEFLATED) as zipf, tempfile.TemporaryFile() as deleted:
+            if self.client_format >= 2:
+                zipf.writestr(PATCH_FORMAT_FILE, self._patch_format_index())
+            for kind, path in self._change_stream(changes):
+                if kind == "deleted":
+                    deleted.write(("\n" if deleted.tell() else "").encode() + path.encode())
+                    continue
                 full_path = os.path.join(self.base_folder, path)
-                if os.path.exists(full_path):
-                    zipf.write(full_path, path)
+                if not os.path.exists(full_path):
+                    continue
+                packed_size = sum(size for _, size in plans[path][1]) if path in plans else None
+                compress = policy.should_compress(full_path, packed_size)
+                compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+                if path in plans:
+                    # Archivos grandes: solo los chunks nuevos (la receta va al final)
+                    recipe, ranges = plans[path]
+                    info = zipfile.ZipInfo(recipe["data"], time.localtime()[:6])
+                    info.compress_type = compress_type
+                    reader = _RangesReader(full_path, ranges)
+                    try:
+                        with zipf.open(info, 'w', force_zip64=True) as dest:
+                            shutil.copyfileobj(reader, dest, 1024 * 1024)
+                    finally:
+                        reader.close()
+                    self._print_chunked(path, recipe, sum(size for _, size in ranges))
+                else:
+                    zipf.write(full_path, path, compress_type=compress_type)
                     print(f"  + {path}")
+                if compress:
+                    compressed_out += zipf.infolist()[-1].compress_size
             
-            if changes["deleted"]:
-                deleted_content = "\n".join(changes["deleted"])
-                zipf.writestr(".deleted_files.txt", deleted_content)
+            if plans:
+                zipf.writestr(CHUNKED_FILES, self._chunked_files_index(plans, algo))
+            
+            if duplicates:
+                zipf.writestr(DUPLICATES_FILE, self._duplicates_index(duplicates, algo))
+            
+            if renames:
+                zipf.writestr(RENAMES_FILE, self._renames_index(renames, algo))
+            
+            if deleted.tell():
+                deleted.seek(0)
+                with zipf.open(DELETED_FILES, 'w') as dest:
+                    shutil.copyfileobj(deleted, dest, 1024 * 1024)
+        
+        policy.report(compressed_out)
+    
+    @staticmethod
+    def _print_chunked(path, recipe, data_size):
+        print(f"  ≈ {path} (delta: {data_size / (1024*1024):.2f} de "
+              f"{recipe['size'] / (1024*1024):.2f} MB)")
     
     def upload_to_drive(self, patch_file):
         """Sube parche a Google Drive (semi-automático)"""
@@ -158,17 +1651,196 @@ class PatchSystem:
         return file_name
 
 
+    def benchmark_hashing(self, sample_bytes=512 * 1024 * 1024):
+        """Compara algoritmos y formas de lectura sobre el árbol de release.
+        
+        Toma los archivos más grandes hasta ``sample_bytes`` y mide el
+        rendimiento de cada combinación en un solo proceso. Con la caché del
+        sistema de archivos caliente mide sobre todo el coste de CPU.
+        """
+        files = []
+        for root, dirs, names in os.walk(self.base_folder):
+            for name in names:
+                filepath = os.path.join(root, name)
+                files.append((os.path.getsize(filepath), filepath))
+        files.sort(reverse=True)
+        
+        sample, total = [], 0
+        for size, filepath in files:
+            if total >= sample_bytes:
+                break
+            sample.append(filepath)
+            total += size
+        
+        if not sample:
+            print(f"❌ No hay archivos en {self.base_folder}")
+            return []
+        
+        methods = [("buffer 4 KB", "buffer", 4096),
+                   ("buffer 64 KB", "buffer", 64 * 1024),
+                   ("buffer 1 MB", "buffer", 1024 * 1024),
+                   ("buffer 8 MB", "buffer", 8 * 1024 * 1024),
+                   ("mmap", "mmap", HASH_BUFFER_SIZE)]
+        if hasattr(hashlib, "file_digest"):
+            methods.append(("file_digest", "file_digest", HASH_BUFFER_SIZE))
+        
+        print(f"⏱️  Benchmark de hash: {len(sample)} archivos, {total / (1024*1024):.1f} MB")
+        # Calentar la caché para medir lo mismo en todas las combinaciones
+        for filepath in sample:
+            digest_file(filepath, "md5", "buffer")
+        
+        results = []
+        for algo in HASH_ALGORITHMS:
+            for label, method, buffer_size in methods:
+                start = time.perf_counter()
+                for filepath in sample:
+                    digest_file(filepath, algo, method, buffer_size)
+                elapsed = time.perf_counter() - start
+                speed = total / (1024 * 1024) / elapsed if elapsed else 0.0
+                results.append((algo, label, elapsed, speed))
+                print(f"   {algo:8} {label:13} {elapsed:7.2f} s  {speed:8.1f} MB/s")
+        
+        return results
+    
+    def create_full_archive(self):
+        """Crea el archivo de instalación completa deduplicado por contenido.
+        
+        Linux: ``.tar`` sin comprimir (el instalador lo extrae en paralelo y
+        sin copias); Windows: ``.zip``. Con ``client_format`` 2, cada
+        contenido distinto se guarda una vez y las rutas repetidas van en
+        ``DUPLICATES_FILE``.
+        """
+        print(f"\n{'='*60}")
+        print(f"📦 ARCHIVO COMPLETO - {self.platform.upper()}")
+        print(f"{'='*60}")
+        
+        current = self.load_manifest()
+        manifest = self.create_manifest(previous=current)
+        if self.find_changes(current, manifest) == {"new": [], "modified": [], "deleted": []}:
+            manifest["release"] = self.release_of(current)
+        
+        everything = {"new": sorted(manifest["files"]), "modified": [], "deleted": []}
+        packed, duplicates = everything, {}
+        if self.client_format >= 2:
+            # Los instaladores de formato 1 no materializan DUPLICATES_FILE
+            packed, duplicates = self.plan_duplicates(everything, {"files": {}}, manifest)
+        algo = manifest.get("algo", "md5")
+        
+        release = manifest.get("release", "1.0.0")
+        platform_name = self.platform.capitalize()
+        if self.platform == "linux":
+            archive_file = f"drive_files/Atlas_{platform_name}_{release}.tar"
+            with tarfile.open(archive_file, "w") as tar:
+                for path in packed["new"]:
+                    tar.add(os.path.join(self.base_folder, path), arcname=path)
+                if duplicates:
+                    self._add_tar_bytes(tar, DUPLICATES_FILE, self._duplicates_index(duplicates, algo))
+        else:
+            archive_file = f"drive_files/Atlas_{platform_name}_{release}.zip"
+            policy = CompressionPolicy(enabled=not self.compress_all)
+            compressed_out = 0
+            with zipfile.ZipFile(archive_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for path in packed["new"]:
+                    full_path = os.path.join(self.base_folder, path)
+                    compress = policy.should_compress(full_path)
+                    zipf.write(full_path, path,
+                               compress_type=zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+                    if compress:
+                        compressed_out += zipf.infolist()[-1].compress_size
+                if duplicates:
+                    zipf.writestr(DUPLICATES_FILE, self._duplicates_index(duplicates, algo))
+            policy.report(compressed_out)
+        
+        total = sum(info["size"] for info in manifest["files"].values())
+        saved = sum(entry["size"] for entry in duplicates.values())
+        print(f"✅ Archivo creado: {archive_file}")
+        print(f"   📊 Archivos: {len(manifest['files'])} ({len(packed['new'])} contenidos distintos)")
+        print(f"   🔗 Duplicados: {len(duplicates)} ({saved / (1024*1024):.2f} de {total / (1024*1024):.2f} MB)")
+        print(f"   📦 Tamaño: {os.path.getsize(archive_file) / (1024*1024):.2f} MB")
+        print(f"{'='*60}")
+        return archive_file
+    
+    def squash(self, from_release=None, to_release=None):
+        """Crea un parche acumulativo ``squash_<desde>_to_<hasta>``.
+        
+        Contiene solo la versión final de cada archivo cambiado entre las dos
+        releases (como delta cuando hay firma de la versión de partida) y la
+        unión de los eliminados de la cadena. El contenido sale del árbol de
+        release, así que ``to_release`` tiene que ser la release actual.
+        """
+        releases = self.list_releases()
+        current = self.load_manifest()
+        if not releases or self.release_of(current) not in releases:
+            print("❌ No hay historial de releases: crea primero un parche con run()")
+            return None
+        
+        from_release = from_release or releases[0]
+        to_release = to_release or self.release_of(current)
+        if to_release != self.release_of(current):
+            print(f"❌ Solo se puede acumular hasta la release actual ({self.release_of(current)})")
+            return None
+        if from_release not in releases or releases.index(from_release) >= releases.index(to_release):
+            print(f"❌ Rango de releases inválido: {from_release} → {to_release}")
+            return None
+        
+        print(f"\n{'='*60}")
+        print(f"🧩 PARCHE ACUMULATIVO - {self.platform.upper()}: {from_release} → {to_release}")
+        print(f"{'='*60}")
+        
+        # El árbol tiene que seguir siendo la release actual
+        tree = self.create_manifest(previous=current)
+        if self.find_changes(current, tree) != {"new": [], "modified": [], "deleted": []}:
+            print("❌ El árbol de release cambió desde el último parche: ejecuta primero run()")
+            return None
+        
+        base = self.load_release_manifest(from_release)
+        chain = releases[releases.index(from_release):releases.index(to_release) + 1]
+        changes = self.find_changes(base, current)
+        
+        # Unión de eliminados de la cadena (sin los que existen al final)
+        deleted = set(changes["deleted"])
+        for older, newer in zip(chain, chain[1:]):
+            step = self.find_changes(self.load_release_manifest(older), self.load_release_manifest(newer))
+            deleted.update(step["deleted"])
+        changes["deleted"] = sorted(path for path in deleted if path not in current["files"])
+        
+        patch_file = self.create_patch(changes, base, current,
+                                       patch_name=f"squash_{from_release}_to_{to_release}")
+        if patch_file:
+            chain_bytes = 0
+            for release in chain[1:]:
+                for ext in (".tar.gz", ".zip"):
+                    path = os.path.join(self.patches_dir, f"patch_{release}{ext}")
+                    if os.path.exists(path):
+                        chain_bytes += os.path.getsize(path)
+            if chain_bytes:
+                print(f"   📉 Cadena de {len(chain) - 1} parches: {chain_bytes / (1024*1024):.2f} MB")
+            self.upload_to_drive(patch_file)
+        
+        print(f"{'='*60}")
+        return patch_file
+    
     def run(self):
         """Ejecuta el proceso completo de creación de parches"""
         print(f"\n{'='*60}")
         print(f"🔄 SISTEMA DE PARCHES - {self.platform.upper()}")
         print(f"{'='*60}")
+        if _fastcdc is None:
+            print("⚠️  Paquete fastcdc no instalado: el troceado de archivos grandes y deltas "
+                  "usa Python puro (pip install fastcdc)")
+        
+        if self.stream_diff:
+            patch_file = self._run_streaming()
+            print(f"{'='*60}")
+            return patch_file
         
         # 1. Cargar manifest anterior
         old_manifest = self.load_manifest()
         
-        # 2. Crear nuevo manifest
-        new_manifest = self.create_manifest()
+        # 2. Crear nuevo manifest (incremental sobre el anterior) y sus firmas de delta
+        new_manifest = self.create_manifest(previous=old_manifest)
+        if self.client_format >= 2:
+            self.update_signatures(new_manifest)
         
         # 3. Encontrar cambios
         changes = self.find_changes(old_manifest, new_manifest)
@@ -176,20 +1848,28 @@ class PatchSystem:
         total_changes = len(changes["new"]) + len(changes["modified"])
         if total_changes == 0:
             print("✅ No hay cambios detectados")
+            if not changes["deleted"]:
+                # Refrescar la caché de stat (p. ej. archivos tocados sin cambiar contenido)
+                if "release" in old_manifest:
+                    new_manifest["release"] = old_manifest["release"]
+                self.save_manifest(new_manifest)
             return None  # ← Cambiar 'return' a 'return None'
         
         print(f"📊 Cambios detectados: {total_changes} archivos")
         
-        # 4. Crear parche
-        patch_file = self.create_patch(changes)
+        # 4. Crear parche (la release nueva se identifica por su timestamp)
+        new_manifest["release"] = datetime.now().strftime("%Y%m%d_%H%M%S")
+        patch_file = self.create_patch(changes, old_manifest, new_manifest)
         
         if patch_file:
             # 5. Subir a Drive
             self.upload_to_drive(patch_file)
             
-            # 6. Actualizar manifest
-            with open(self.manifest_file, 'w') as f:
-                json.dump(new_manifest, f, indent=2)
+            # 6. Actualizar manifest e historial (las firmas antiguas ya no hacen falta)
+            self.save_release_manifest(old_manifest)
+            self.save_release_manifest(new_manifest)
+            self.save_manifest(new_manifest)
+            self.prune_signatures(new_manifest)
             
             print(f"\n✅ Manifest actualizado: {self.manifest_file}")
         
@@ -197,6 +1877,43 @@ class PatchSystem:
         
         return patch_file  # ← Esto está bien, patch_file será None si no se creó
 
+    def _run_streaming(self):
+        """``run()`` con el diff en streaming: el manifest anterior no se carga en memoria"""
+        # El manifest nuevo va a un store temporal junto al actual, no a un dict en memoria
+        with self.open_manifest_store() as store, \
+                tempfile.TemporaryDirectory(prefix=".manifest_", dir=os.path.dirname(self.manifest_file) or ".") as tmp, \
+                ManifestStore(os.path.join(tmp, "new.db")) as new_store:
+            old_release = store.meta().get("release")
+            
+            # Nuevo manifest (caché de stat contra el store) y sus firmas de delta
+            self.create_manifest(previous=store, store=new_store)
+            if self.client_format >= 2:
+                self.update_signatures(new_store)
+            
+            # Parche directamente desde el diff por mezcla de los dos stores
+            meta = new_store.meta()
+            new_store.set_meta(dict(meta, release=datetime.now().strftime("%Y%m%d_%H%M%S")))
+            patch_file, counts = self.create_patch_stream(store, new_store)
+            
+            if patch_file is None:
+                print("✅ No hay cambios detectados")
+                if not counts["deleted"]:
+                    # Refrescar la caché de stat conservando la release
+                    new_store.set_meta(dict(meta, release=old_release) if old_release else meta)
+                    store.update(new_store)
+                return None
+            
+            self.upload_to_drive(patch_file)
+            
+            # Historial: la release anterior se exporta desde el store antes de actualizarlo
+            self.save_release_manifest(store)
+            self.save_release_manifest(new_store)
+            store.update(new_store)
+            self.prune_signatures(new_store)
+        
+        print(f"\n✅ Manifest actualizado: {self.manifest_file}")
+        return patch_file
+
 # ========== NUEVA FUNCIÓN: CONSTRUIR INSTALADOR LINUX QT ==========
 
 def build_linux_qt():
@@ -522,56 +2239,247 @@ namespace AtlasInstaller
 class PatchApplier:
     """Sistema para aplicar parches (incluido en los instaladores)"""
     
+    @staticmethod
+    def rebuild_chunked_files(patch_dir, target_dir):
+        """Reconstruye los archivos descritos en CHUNKED_FILES (chunks o deltas).
+        
+        Los tramos "old" se copian del archivo ya instalado y los "new" de los
+        datos del parche; cada chunk y el archivo final se verifican por hash.
+        El resultado se escribe en un temporal junto al destino y lo reemplaza.
+        """
+        index_path = os.path.join(patch_dir, CHUNKED_FILES)
+        if not os.path.exists(index_path):
+            return 0
+        
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        algo = index.get("algo", "md5")
+        
+        for rel_path, recipe in index["files"].items():
+            dst_path = os.path.join(target_dir, rel_path)
+            tmp_path = dst_path + ".atlas_patch"
+            try:
+                with open(dst_path, 'rb') as old, \
+                        open(os.path.join(patch_dir, recipe["data"]), 'rb') as new, \
+                        open(tmp_path, 'wb') as out:
+                    whole = hashlib.new(algo)
+                    for source, offset, size, chunk_hash in recipe["chunks"]:
+                        src = old if source == "old" else new
+                        src.seek(offset)
+                        block = src.read(size)
+                        if len(block) != size or hashlib.new(algo, block).hexdigest() != chunk_hash:
+                            raise ValueError(f"chunk inválido en {rel_path} (offset {offset}): "
+                                             f"la versión instalada no es la esperada")
+                        out.write(block)
+                        whole.update(block)
+                    if whole.hexdigest() != recipe["hash"]:
+                        raise ValueError(f"hash final incorrecto en {rel_path}")
+                shutil.copymode(dst_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        
+        return len(index["files"])
+    
+    @staticmethod
+    def materialize_duplicates(patch_dir, target_dir):
+        """Crea las copias listadas en DUPLICATES_FILE a partir de su origen.
+        
+        Los orígenes "installed" son archivos que el parche no toca y se
+        verifican por hash antes de copiarlos.
+        """
+        index_path = os.path.join(patch_dir, DUPLICATES_FILE)
+        if not os.path.exists(index_path):
+            return 0
+        
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        algo = index.get("algo", "md5")
+        
+        for rel_path, entry in index["files"].items():
+            src_path = PatchApplier._safe_path(target_dir, entry["source"])
+            dst_path = PatchApplier._safe_path(target_dir, rel_path)
+            if src_path is None or dst_path is None:
+                continue
+            if entry.get("installed") and digest_file(src_path, algo) != entry["hash"]:
+                raise ValueError(f"{entry['source']} no coincide con la versión esperada")
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            tmp_path = dst_path + ".atlas_patch"
+            shutil.copy2(src_path, tmp_path)
+            os.replace(tmp_path, dst_path)
+        
+        return len(index["files"])
+    
+    @staticmethod
+    def apply_renames(patch_dir, target_dir):
+        """Ejecuta las operaciones de RENAMES_FILE (copias y movimientos locales).
+        
+        Los orígenes son rutas que el parche elimina, así que tienen que
+        ejecutarse antes de procesar los eliminados. Un movimiento ya hecho
+        (origen ausente, destino con el tamaño esperado) se salta.
+        """
+        index_path = os.path.join(patch_dir, RENAMES_FILE)
+        if not os.path.exists(index_path):
+            return 0
+        
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        
+        for op, source, dest, file_hash, size in index["ops"]:
+            src_path = PatchApplier._safe_path(target_dir, source)
+            dst_path = PatchApplier._safe_path(target_dir, dest)
+            if src_path is None or dst_path is None:
+                continue
+            if not os.path.exists(src_path):
+                if os.path.exists(dst_path) and os.path.getsize(dst_path) == size:
+                    continue
+                raise ValueError(f"{source} no existe en la instalación")
+            if os.path.getsize(src_path) != size:
+                raise ValueError(f"{source} no coincide con la versión esperada")
+            
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            if op == "move":
+                os.replace(src_path, dst_path)
+            else:
+                tmp_path = dst_path + ".atlas_patch"
+                shutil.copy2(src_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+        
+        return len(index["ops"])
+    
+    # Directorio (junto a la instalación) para los metadatos del parche
+    META_DIR = ".atlas_patch_meta"
+    # Miembros del parche que son metadatos y no archivos de la instalación
+    META_FILES = frozenset((CHUNKED_FILES, DUPLICATES_FILE, RENAMES_FILE, DELETED_FILES, PATCH_FORMAT_FILE))
+    
+    @staticmethod
+    def _is_meta(name):
+        """True si ``name`` es un metadato del parche (los datos de deltas van en CHUNKS_DIR)"""
+        parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+        return bool(parts) and (parts[0] in (PatchApplier.META_DIR, CHUNKS_DIR)
+                                or (len(parts) == 1 and parts[0] in PatchApplier.META_FILES))
+    
+    @staticmethod
+    def _safe_path(base_dir, name):
+        """Ruta dentro de ``base_dir`` para un miembro del parche o None si intenta salir"""
+        parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+        if not parts or '..' in parts or ':' in parts[0]:
+            return None
+        return os.path.join(base_dir, *parts)
+    
+    @staticmethod
+    def _iter_patch_members(patch_file, platform):
+        """Recorre en flujo los archivos del parche: (nombre, objeto archivo, modo, mtime)"""
+        if platform == "linux" and patch_file.endswith(".tar.gz"):
+            with open(patch_file, "rb") as raw:
+                # Parches comprimidos en paralelo: descompresión en paralelo
+                if ParallelGzipReader.detect(raw):
+                    source, mode = ParallelGzipReader(raw), "r|"
+                else:
+                    source, mode = raw, "r|gz"
+                try:
+                    with tarfile.open(fileobj=source, mode=mode) as tar:
+                        for member in tar:
+                            if member.isfile():
+                                yield member.name, tar.extractfile(member), member.mode, member.mtime
+                finally:
+                    if source is not raw:
+                        source.close()
+        elif platform == "windows" and patch_file.endswith(".zip"):
+            with zipfile.ZipFile(patch_file, 'r') as zipf:
+                for info in zipf.infolist():
+                    if info.is_dir():
+                        continue
+                    mode = (info.external_attr >> 16) & 0o7777 or None
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                    with zipf.open(info) as src:
+                        yield info.filename, src, mode, mtime
+        else:
+            raise ValueError(f"Formato de parche no soportado: {patch_file}")
+    
+    @staticmethod
+    def _write_atomic(src, dst_path, mode=None, mtime=None):
+        """Escribe ``src`` en un temporal junto a ``dst_path`` y lo reemplaza atómicamente"""
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        tmp_path = dst_path + ".atlas_patch"
+        try:
+            with open(tmp_path, 'wb') as out:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+            if mode:
+                os.chmod(tmp_path, mode)
+            if mtime:
+                os.utime(tmp_path, (mtime, mtime))
+            os.replace(tmp_path, dst_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
     @staticmethod
     def apply_patch(patch_file, target_dir, platform):
-        """Aplica un parche al directorio de instalación"""
+        """Aplica un parche al directorio de instalación.
+        
+        Los miembros se leen en flujo y cada archivo se escribe una sola vez,
+        en un temporal junto a su destino que luego se reemplaza con
+        ``os.replace``. Solo los metadatos del parche (movidos, deltas,
+        duplicados, eliminados) pasan por ``META_DIR`` dentro de ``target_dir``.
+        """
         print(f"\n🔧 Aplicando parche: {os.path.basename(patch_file)}")
         
-        # Extraer parche a temporal
-        temp_dir = "temp_patch_extract"
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        os.makedirs(temp_dir, exist_ok=True)
+        meta_dir = os.path.join(target_dir, PatchApplier.META_DIR)
+        shutil.rmtree(meta_dir, ignore_errors=True)
         
         try:
-            # Extraer según plataforma
-            if platform == "linux" and patch_file.endswith(".tar.gz"):
-                with tarfile.open(patch_file, "r:gz") as tar:
-                    tar.extractall(temp_dir)
-            elif platform == "windows" and patch_file.endswith(".zip"):
-                with zipfile.ZipFile(patch_file, 'r') as zipf:
-                    zipf.extractall(temp_dir)
-            else:
-                print(f"❌ Formato de parche no soportado: {patch_file}")
-                return False
-            
-            # Aplicar cambios
-            patch_content_dir = os.path.join(temp_dir, os.listdir(temp_dir)[0] 
-                                           if os.listdir(temp_dir) else "")
-            
-            if os.path.exists(patch_content_dir):
-                for root, dirs, files in os.walk(patch_content_dir):
-                    for file in files:
-                        if file.startswith('.'):
-                            continue
-                        
-                        src_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(src_path, patch_content_dir)
-                        dst_path = os.path.join(target_dir, rel_path)
-                        
-                        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-                        shutil.copy2(src_path, dst_path)
+            # Aplicar cambios (las rutas del parche son relativas a la instalación)
+            copied = 0
+            for name, src, mode, mtime in PatchApplier._iter_patch_members(patch_file, platform):
+                if name == PATCH_FORMAT_FILE:
+                    # Es el primer miembro: con un formato más nuevo todavía no se escribió nada
+                    patch_format = json.load(src).get("format", 1)
+                    if patch_format > PATCH_FORMAT:
+                        raise ValueError(f"formato de parche {patch_format} no soportado (máximo {PATCH_FORMAT})")
+                    continue
+                
+                # Metadatos del parche (.chunks, .deleted_files.txt, etc.); el resto de
+                # rutas con punto (.config/...) son archivos normales de la instalación
+                is_meta = PatchApplier._is_meta(name)
+                dst_path = PatchApplier._safe_path(meta_dir if is_meta else target_dir, name)
+                if dst_path is None:
+                    print(f"  ⚠️  Ruta no permitida en el parche: {name}")
+                    continue
                 
-                print(f"  ✅ Archivos copiados: {sum(len(files) for _, _, files in os.walk(patch_content_dir))}")
+                PatchApplier._write_atomic(src, dst_path, mode, mtime)
+                if not is_meta:
+                    copied += 1
+            
+            print(f"  ✅ Archivos escritos: {copied}")
+            
+            # Archivos movidos: se toman de rutas que se eliminan más abajo
+            renamed = PatchApplier.apply_renames(meta_dir, target_dir)
+            if renamed:
+                print(f"  ✅ Archivos movidos/copiados localmente: {renamed}")
+            
+            # Reconstruir archivos grandes a partir de chunks
+            rebuilt = PatchApplier.rebuild_chunked_files(meta_dir, target_dir)
+            if rebuilt:
+                print(f"  ✅ Archivos reconstruidos desde delta: {rebuilt}")
+            
+            # Copias de contenidos repetidos
+            duplicated = PatchApplier.materialize_duplicates(meta_dir, target_dir)
+            if duplicated:
+                print(f"  ✅ Archivos duplicados: {duplicated}")
             
             # Procesar eliminados
-            deleted_file = os.path.join(temp_dir, ".deleted_files.txt")
+            deleted_file = os.path.join(meta_dir, DELETED_FILES)
             if os.path.exists(deleted_file):
                 with open(deleted_file, 'r') as f:
                     deleted_files = [line.strip() for line in f if line.strip()]
                 
                 for rel_path in deleted_files:
-                    file_to_delete = os.path.join(target_dir, rel_path)
-                    if os.path.exists(file_to_delete):
+                    file_to_delete = PatchApplier._safe_path(target_dir, rel_path)
+                    if file_to_delete and os.path.exists(file_to_delete):
                         os.remove(file_to_delete)
                         print(f"  🗑️  Eliminado: {rel_path}")
             
@@ -591,7 +2499,25 @@ class PatchApplier:
             
         finally:
             # Limpiar
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            shutil.rmtree(meta_dir, ignore_errors=True)
+
+def parse_patch_options(argv):
+    """Opciones para la creación de parches: create_patches.py [windows|linux] [opciones]"""
+    parser = argparse.ArgumentParser(prog="create_patches.py [windows|linux]")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Procesos para calcular hashes (por defecto: núcleos de CPU)')
+    parser.add_argument('--full-rehash', action='store_true',
+                        help='Ignora la caché de stat del manifest y rehashea todo')
+    parser.add_argument('--algo', choices=HASH_ALGORITHMS, default=None,
+                        help='Algoritmo de hash (por defecto: el del manifest anterior)')
+    parser.add_argument('--stream-diff', action='store_true',
+                        help='Diff en streaming contra el manifest guardado (menos memoria en árboles grandes)')
+    parser.add_argument('--compress-all', action='store_true',
+                        help='Comprime todos los archivos (sin detectar los ya comprimidos)')
+    parser.add_argument('--client-format', type=int, choices=range(1, PATCH_FORMAT + 1), default=1,
+                        help='Formato de parche que entienden los instaladores publicados '
+                             '(1: archivos completos; 2: deltas, duplicados y movidos)')
+    return parser.parse_args(argv)
 
 # ========== MAIN ==========
 if __name__ == "__main__":
@@ -604,11 +2530,35 @@ if __name__ == "__main__":
         elif sys.argv[1] == "build-mono":
             build_installers(compiler='mono')
         elif sys.argv[1] in ["windows", "linux"]:
-            patch_system = PatchSystem(platform=sys.argv[1])
+            options = parse_patch_options(sys.argv[2:])
+            patch_system = PatchSystem(platform=sys.argv[1], workers=options.workers,
+                                       full_rehash=options.full_rehash, algo=options.algo,
+                                       stream_diff=options.stream_diff,
+                                       compress_all=options.compress_all,
+                                       client_format=options.client_format)
             patch_system.run()
+        elif sys.argv[1] == "squash" and len(sys.argv) > 2 and sys.argv[2] in ["windows", "linux"]:
+            # create_patches.py squash PLATAFORMA [DESDE] [HASTA]
+            patch_system = PatchSystem(platform=sys.argv[2])
+            patch_system.squash(sys.argv[3] if len(sys.argv) > 3 else None,
+                                sys.argv[4] if len(sys.argv) > 4 else None)
+        elif sys.argv[1] == "full" and len(sys.argv) > 2 and sys.argv[2] in ["windows", "linux"]:
+            # create_patches.py full PLATAFORMA [--client-format N]
+            options = parse_patch_options(sys.argv[3:])
+            PatchSystem(platform=sys.argv[2], client_format=options.client_format).create_full_archive()
+        elif sys.argv[1] == "export-manifest" and len(sys.argv) > 2 and sys.argv[2] in ["windows", "linux"]:
+            # create_patches.py export-manifest PLATAFORMA [ARCHIVO]
+            PatchSystem(platform=sys.argv[2]).export_manifest(sys.argv[3] if len(sys.argv) > 3 else None)
+        elif sys.argv[1] == "benchmark-hash":
+            platform = sys.argv[2] if len(sys.argv) > 2 else "linux"
+            PatchSystem(platform=platform).benchmark_hashing()
         else:
             print("Uso:")
-            print("  Para crear parches: python create_patches.py [windows|linux]")
+            print("  Para crear parches: python create_patches.py [windows|linux] [--workers N] [--full-rehash] [--algo ALGO] [--stream-diff] [--compress-all] [--client-format N]")
+            print("  Parche acumulativo: python create_patches.py squash [windows|linux] [DESDE] [HASTA]")
+            print("  Archivo completo: python create_patches.py full [windows|linux] [--client-format N]")
+            print("  Exportar manifest a JSON: python create_patches.py export-manifest [windows|linux] [ARCHIVO]")
+            print("  Benchmark de hash: python create_patches.py benchmark-hash [windows|linux]")
             print("  Para construir instaladores: python create_patches.py build")
             print("  Para .NET SDK: python create_patches.py build-dotnet")
             print("  Para Mono: python create_patches.py build-mono")
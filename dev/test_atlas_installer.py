@@ -0,0 +1,405 @@
+"""Pruebas de comportamiento de AtlasInstaller (reparación, duplicados, parches)"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import create_patches
+from AtlasInstaller import AtlasInstaller, TarIndex
+
+MTIME = 1700000000
+
+
+def add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = MTIME
+    tar.addfile(info, io.BytesIO(data))
+
+
+def make_archive(path, files, duplicates=None):
+    """Crea un .tar con ``files`` ({ruta: bytes}) y su tabla ``.duplicates.json``"""
+    with tarfile.open(path, 'w') as tar:
+        for name, data in files.items():
+            add_member(tar, name, data)
+        if duplicates:
+            table = {"algo": "md5",
+                     "files": {dest: {"source": source, "hash": ""} for dest, source in duplicates.items()}}
+            add_member(tar, AtlasInstaller.PATCH_DUPLICATES_FILE, json.dumps(table).encode())
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Sirve ``server.data`` con soporte de Range/If-Range y ETag"""
+
+    def do_GET(self):
+        data = self.server.data
+        etag = '"v1"'
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if range_header and (if_range is None or if_range == etag):
+            start, end = range_header.split('=')[1].split('-')
+            start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class InstallerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="atlas_test_")
+        self.installer = AtlasInstaller()
+        self.installer.home = self.tmp
+        self.installer.install_dir = os.path.join(self.tmp, "inst")
+        self.installer.download_dir = os.path.join(self.tmp, "dl")
+        self.installer.extract_workers = 1
+        self.installer.retry_backoff = 0
+
+    def tearDown(self):
+        self.installer.cleanup()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def serve(self, data):
+        """Sirve ``data`` por HTTP y hace que el instalador lo use como archivo completo"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        server.data = data
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/archive.tar"
+        self.installer._full_download_url = lambda: url
+        return url
+
+    def install(self, files, duplicates=None):
+        """Instala un .tar con ``files`` como lo haría la instalación completa"""
+        archive = os.path.join(self.tmp, "Atlas_Linux.tar")
+        make_archive(archive, files, duplicates)
+        self.assertTrue(self.installer.extract_tar_with_progress(archive, self.installer.install_dir))
+        self.installer.tar_index = TarIndex.build(archive, '"v1"')
+        self.installer.create_desktop_launcher = lambda: None
+        self.installer._finish_install()
+        return archive
+
+    def read(self, rel_path):
+        with open(os.path.join(self.installer.install_dir, rel_path), 'rb') as f:
+            return f.read()
+
+
+class RepairTest(InstallerTestCase):
+
+    def test_range_repair_restores_source_and_duplicate(self):
+        # Origen pequeño seguido de un miembro grande dañado: el rango sigue tras el origen
+        files = {"data/a.bin": os.urandom(700), "data/b.bin": os.urandom(300_000), "data/c.bin": b"c" * 700}
+        archive = self.install(files, {"copy/a.bin": "data/a.bin"})
+        with open(archive, 'rb') as f:
+            self.serve(f.read())
+
+        # Origen y copia dañados: comparten offset en el índice y caen en el mismo rango
+        os.remove(os.path.join(self.installer.install_dir, "data/a.bin"))
+        with open(os.path.join(self.installer.install_dir, "copy/a.bin"), 'r+b') as f:
+            f.write(b"\0" * 100)
+        os.remove(os.path.join(self.installer.install_dir, "data/b.bin"))
+
+        ok, message = self.installer.repair_install()
+        self.assertTrue(ok, message)
+        self.assertEqual(self.read("data/a.bin"), files["data/a.bin"])
+        self.assertEqual(self.read("copy/a.bin"), files["data/a.bin"])
+        self.assertEqual(self.read("data/b.bin"), files["data/b.bin"])
+        self.assertEqual(self.installer.verify_install(), [])
+
+    def test_repair_rechecks_digest_from_manifest(self):
+        files = {"data/a.bin": os.urandom(5000), "data/b.bin": os.urandom(5000)}
+        archive = self.install(files)
+        manifest = {"algo": "md5", "files": {name: {"hash": hashlib.md5(data).hexdigest(), "size": len(data)}
+                                             for name, data in files.items()}}
+        manifest_path = os.path.join(self.tmp, "manifest.json")
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+
+        # El servidor entrega otros bytes del mismo tamaño con el mismo ETag
+        with open(archive, 'rb') as f:
+            data = f.read()
+        self.serve(data.replace(files["data/b.bin"], os.urandom(5000)))
+        os.remove(os.path.join(self.installer.install_dir, "data/b.bin"))
+
+        ok, message = self.installer.repair_install(manifest_path)
+        self.assertFalse(ok)
+        self.assertIn("data/b.bin (hash distinto)", message)
+        self.assertEqual(self.installer.verify_install(manifest=manifest), [("data/b.bin", "hash distinto")])
+        # Sin manifest solo se comprueba el tamaño
+        self.assertEqual(self.installer.verify_install(), [])
+
+    def test_repair_reports_errors(self):
+        self.install({"data/a.bin": b"a" * 100})
+        ok, message = self.installer.repair_install(os.path.join(self.tmp, "no_existe.json"))
+        self.assertFalse(ok)
+        self.assertIn("manifest", message)
+
+        # Servidor que no responde: error de conexión, no excepción
+        os.remove(os.path.join(self.installer.install_dir, "data/a.bin"))
+        self.installer.download_retries = 0
+        self.installer._full_download_url = lambda: "http://127.0.0.1:9/archive.tar"
+        ok, message = self.installer.repair_install()
+        self.assertFalse(ok)
+
+    def test_repair_without_index_downloads_full_archive(self):
+        files = {"data/a.bin": os.urandom(3000), "data/b.bin": os.urandom(3000)}
+        archive = self.install(files, {"copy/a.bin": "data/a.bin"})
+        with open(archive, 'rb') as f:
+            self.serve(f.read())
+        os.remove(os.path.join(self.installer.install_dir, ".atlas_index"))
+        os.remove(os.path.join(self.installer.install_dir, "data/a.bin"))
+        os.remove(os.path.join(self.installer.install_dir, "copy/a.bin"))
+
+        ok, message = self.installer.repair_install()
+        self.assertTrue(ok, message)
+        self.assertEqual(self.read("data/a.bin"), files["data/a.bin"])
+        self.assertEqual(self.read("copy/a.bin"), files["data/a.bin"])
+        # El índice se regenera desde el archivo descargado, con los duplicados
+        self.assertEqual(self.installer.verify_install(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.installer.download_dir, "Atlas_Linux.tar")))
+
+
+class DuplicatesTest(InstallerTestCase):
+
+    def test_duplicates_are_materialized_and_indexed(self):
+        files = {"data/a.bin": os.urandom(2000), "data/b.bin": b"b" * 10}
+        self.install(files, {"copy/a.bin": "data/a.bin", "copy/deep/a.bin": "data/a.bin"})
+        self.assertEqual(self.read("copy/a.bin"), files["data/a.bin"])
+        self.assertEqual(self.read("copy/deep/a.bin"), files["data/a.bin"])
+        self.assertFalse(os.path.exists(os.path.join(self.installer.install_dir,
+                                                     AtlasInstaller.PATCH_DUPLICATES_FILE)))
+
+        # Las copias están en el índice con el offset y tamaño de su origen
+        index = TarIndex.load(os.path.join(self.installer.install_dir, ".atlas_index"))
+        source, copy = index.find("data/a.bin"), index.find("copy/a.bin")
+        self.assertEqual((copy.offset_data, copy.size), (source.offset_data, source.size))
+
+        os.remove(os.path.join(self.installer.install_dir, "copy/deep/a.bin"))
+        self.assertEqual(self.installer.verify_install(), [("copy/deep/a.bin", "falta")])
+
+    def test_duplicate_targets_stay_inside_install_dir(self):
+        self.install({"data/a.bin": b"a" * 10}, {"../escape.bin": "data/a.bin", "copy/../../x.bin": "data/a.bin"})
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "escape.bin")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "x.bin")))
+        # Tampoco entran en el índice: una reparación escribiría fuera de la instalación
+        index = TarIndex.load(os.path.join(self.installer.install_dir, ".atlas_index"))
+        self.assertIsNone(index.find("../escape.bin"))
+        self.assertEqual(self.installer.verify_install(), [])
+
+
+class PlanUpdatesTest(InstallerTestCase):
+
+    @staticmethod
+    def patch(version, size, base=None):
+        name = f"squash_{base}_to_{version}.tar.gz" if base else f"patch_{version}.tar.gz"
+        return {"id": name, "name": name, "bytes": size, "version": version, "base": base}
+
+    def setUp(self):
+        super().setUp()
+        self.patches = [self.patch("20250101_000000", 100), self.patch("20250201_000000", 100),
+                        self.patch("20250301_000000", 100),
+                        self.patch("20250301_000000", 150, base="1.0.0")]
+
+    def plan(self, current):
+        return self.installer.plan_updates(current, self.patches, include_full=False)
+
+    def test_prefers_cheaper_squash(self):
+        plan = self.plan("1.0.0")
+        self.assertEqual(plan["target"], "20250301_000000")
+        self.assertEqual([step["name"] for step in plan["steps"]], ["squash_1.0.0_to_20250301_000000.tar.gz"])
+        self.assertEqual(plan["bytes"], 150)
+
+    def test_follows_chain_from_intermediate_release(self):
+        plan = self.plan("20250101_000000")
+        self.assertEqual([step["version"] for step in plan["steps"]], ["20250201_000000", "20250301_000000"])
+        self.assertEqual(plan["bytes"], 200)
+
+    def test_unknown_release_enters_at_next_patch(self):
+        plan = self.plan("20250115_000000")
+        self.assertEqual([step["version"] for step in plan["steps"]], ["20250201_000000", "20250301_000000"])
+
+    def test_up_to_date(self):
+        plan = self.plan("20250301_000000")
+        self.assertEqual(plan["steps"], [])
+        self.assertEqual(plan["target"], "20250301_000000")
+
+    def test_version_order(self):
+        key = AtlasInstaller.parse_version
+        self.assertLess(key("1.0.9"), key("1.0.10"))
+        self.assertLess(key("2.0.0"), key("20250101_000000"))
+        self.assertLess(key("20250101_235959"), key("20250102_000000"))
+
+
+class PatchApplyTest(InstallerTestCase):
+    """Parches de formato 2 (create_patches.py) aplicados por el instalador"""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        self.patch_system = create_patches.PatchSystem(workers=1, client_format=2)
+        self.tree = self.patch_system.base_folder
+        rnd = random.Random(10)
+        self.write("a.bin", rnd.randbytes(1000))
+        self.write("b.csv", "".join(f"{rnd.random():.6f},{rnd.random():.6f}\n"
+                                    for _ in range(30000)).encode())
+        self.write("c.bin", rnd.randbytes(2000))
+        self.write("old/d.bin", rnd.randbytes(3000))
+
+        # Instalación de la release inicial
+        shutil.copytree(self.tree, self.installer.install_dir)
+        with open(os.path.join(self.installer.install_dir, ".atlas_version.json"), 'w') as f:
+            json.dump({"version": "1.0.0"}, f)
+        self.release()
+
+    def write(self, rel_path, data, mode='wb'):
+        path = os.path.join(self.tree, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(data)
+
+    def release(self):
+        """Crea el parche de los cambios del árbol y devuelve su info de parche"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            patch_file = self.patch_system.run()
+        os.makedirs("patches", exist_ok=True)
+        number = len(os.listdir("patches"))
+        # Dos releases en el mismo segundo tendrían el mismo nombre: se guarda una copia
+        path = os.path.join(self.tmp, "patches", f"patch_{number}.tar.gz")
+        shutil.move(patch_file, path)
+        version = f"2099010{number}_000000"
+        return {"id": str(number), "name": os.path.basename(path), "version": version, "path": path}
+
+    def assert_tree_matches(self):
+        expected = sorted(os.path.relpath(os.path.join(root, name), self.tree)
+                          for root, _, names in os.walk(self.tree) for name in names)
+        installed = sorted(os.path.relpath(os.path.join(root, name), self.installer.install_dir)
+                           for root, _, names in os.walk(self.installer.install_dir) for name in names
+                           if not name.startswith('.'))
+        self.assertEqual(installed, expected)
+        for rel_path in expected:
+            with open(os.path.join(self.tree, rel_path), 'rb') as f:
+                self.assertEqual(self.read(rel_path), f.read(), rel_path)
+
+    def download_stub(self, order):
+        def download(patch, progress_callback=None):
+            order.append(patch["name"])
+            if not os.path.exists(patch["path"]):
+                return None
+            # _apply_patch_file borra el parche aplicado
+            copy = os.path.join(self.tmp, f"dl_{patch['name']}")
+            shutil.copy(patch["path"], copy)
+            return copy
+        self.installer._download_patch_file = download
+
+    def make_patches(self):
+        # Movido, duplicado de un archivo instalado, delta y eliminado
+        os.makedirs(os.path.join(self.tree, "new"))
+        os.rename(os.path.join(self.tree, "old/d.bin"), os.path.join(self.tree, "new/d.bin"))
+        shutil.copy(os.path.join(self.tree, "a.bin"), os.path.join(self.tree, "a_copy.bin"))
+        with open(os.path.join(self.tree, "b.csv"), 'r+b') as f:
+            data = f.read()
+            f.seek(0)
+            f.write(data[:5000] + b"0.5,0.25\n" + data[5000:])
+        os.remove(os.path.join(self.tree, "c.bin"))
+        first = self.release()
+        with tarfile.open(first["path"]) as tar:
+            names = set(tar.getnames())
+        self.assertTrue({".renames.json", ".duplicates.json", ".chunked_files.json"} <= names)
+
+        self.write("a.bin", b"more", mode='ab')
+        second = self.release()
+        return first, second
+
+    def test_pipelined_apply_in_order(self):
+        first, second = self.make_patches()
+        order = []
+        self.download_stub(order)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok, message = self.installer.apply_patches([first, second], prefetch=1)
+        self.assertTrue(ok, message)
+        self.assertEqual(order, [first["name"], second["name"]])
+        self.assert_tree_matches()
+        self.assertEqual(self.installer.installed_version(), second["version"])
+
+    def test_failed_download_stops_after_applied_patches(self):
+        first, second = self.make_patches()
+        os.remove(second["path"])
+        self.download_stub([])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok, message = self.installer.apply_patches([first, second])
+        self.assertFalse(ok)
+        self.assertIn(second["name"], message)
+        self.assertEqual(self.installer.installed_version(), first["version"])
+        self.assertEqual(self.read("b.csv")[5000:5009], b"0.5,0.25\n")
+
+
+class PatchFormatTest(InstallerTestCase):
+
+    def test_newer_patch_format_is_rejected(self):
+        self.install({"data/a.bin": b"a" * 100})
+        patch_path = os.path.join(self.tmp, "patch_20990101_000000.tar.gz")
+        with tarfile.open(patch_path, 'w:gz') as tar:
+            add_member(tar, AtlasInstaller.PATCH_FORMAT_FILE, json.dumps({"format": 99}).encode())
+            add_member(tar, "data/a.bin", b"b" * 100)
+
+        patch = {"name": os.path.basename(patch_path), "version": "20990101_000000"}
+        self.assertFalse(self.installer._apply_patch_file(patch, patch_path))
+        # Nada extraído ni invalidado: la instalación sigue reparable
+        self.assertEqual(self.read("data/a.bin"), b"a" * 100)
+        self.assertTrue(os.path.exists(os.path.join(self.installer.install_dir, ".atlas_index")))
+
+
+class DiskSpaceTest(InstallerTestCase):
+    GB = 1024**3
+
+    def check(self, free_gb, archive_gb, stream=False):
+        self.installer.stream_install = stream
+        usage = namedtuple("usage", "total used free")(0, 0, free_gb * self.GB)
+        with mock.patch("AtlasInstaller.shutil.disk_usage", return_value=usage):
+            return self.installer.check_disk_space(archive_gb and archive_gb * self.GB)
+
+    def test_download_mode_needs_archive_and_extraction(self):
+        self.assertTrue(self.check(9.5, 4)[0])
+        ok, message = self.check(8.5, 4)
+        self.assertFalse(ok)
+        self.assertIn("9.0GB", message)
+
+    def test_streaming_needs_only_extraction(self):
+        self.assertTrue(self.check(5.5, 4, stream=True)[0])
+        self.assertFalse(self.check(4.5, 4, stream=True)[0])
+        # Cabe la instalación pero no el spool: se avisa de que no se podrá reanudar
+        ok, message = self.check(5.5, 4, stream=True)
+        self.assertIn("sin copia para reanudar", message)
+        self.assertNotIn("sin copia", self.check(9.5, 4, stream=True)[1])
+
+    def test_archive_size_from_server(self):
+        self.serve(b"x" * 1000)
+        self.assertTrue(self.check(1.5, None)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
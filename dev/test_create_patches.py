@@ -0,0 +1,173 @@
+"""Pruebas del troceado definido por contenido y del formato de parches de create_patches"""
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import AtlasInstaller
+import create_patches
+from create_patches import (CHUNK_AVG_SIZE, CHUNK_MAX_SIZE, CHUNK_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE,
+                            DELTA_MIN_SIZE, iter_chunks)
+
+
+def numeric_csv(size, seed=0):
+    """CSV de números (solo 0-9 . , - y saltos de línea) de al menos ``size`` bytes"""
+    rnd = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = ",".join(f"{rnd.uniform(-1000, 1000):.4f}" for _ in range(8)) + "\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines).encode()
+
+
+def insert_bytes(data, offset, extra):
+    return data[:offset] + extra + data[offset:]
+
+
+class ChunkingTest(unittest.TestCase):
+
+    def assert_reused(self, old, new, min_ratio, *args):
+        old_chunks = list(iter_chunks(io.BytesIO(old), *args))
+        new_chunks = list(iter_chunks(io.BytesIO(new), *args))
+        self.assertEqual(b"".join(new_chunks), new)
+
+        reused = len(set(new_chunks) & set(old_chunks))
+        self.assertGreater(len(old_chunks), 4)
+        self.assertGreaterEqual(reused / len(new_chunks), min_ratio,
+                                f"{reused} de {len(new_chunks)} chunks reutilizados")
+        return old_chunks
+
+    def test_large_chunks_survive_insertion(self):
+        # Troceado de archivos grandes (parámetros por defecto)
+        old = numeric_csv(12 * 1024 * 1024)
+        new = insert_bytes(old, 1000, b"-123.4567,89.01\n")
+        chunks = self.assert_reused(old, new, 0.8)
+        # Los cortes vienen del contenido, no del tamaño máximo
+        self.assertLessEqual(sum(len(chunk) == CHUNK_MAX_SIZE for chunk in chunks), 1)
+
+    def test_delta_chunks_survive_insertion(self):
+        old = numeric_csv(2 * 1024 * 1024, seed=1)
+        new = insert_bytes(old, 5000, b"0.5,0.25,0.125\n")
+        chunks = self.assert_reused(old, new, 0.95, DELTA_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE)
+        forced = sum(len(chunk) == DELTA_MAX_SIZE for chunk in chunks)
+        self.assertLess(forced, len(chunks) // 10)
+
+    def test_delta_chunks_json(self):
+        rnd = random.Random(2)
+        old = ("[" + ",".join(f'{{"x":{rnd.randint(0, 10**6)},"y":{rnd.random():.6f}}}'
+                              for _ in range(40000)) + "]").encode()
+        new = insert_bytes(old, 100, b'{"x":1,"y":2},')
+        self.assert_reused(old, new, 0.95, DELTA_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE)
+
+    def test_streaming_matches_whole_buffer(self):
+        # Los cortes no dependen de cómo se lea el archivo
+        data = numeric_csv(3 * 1024 * 1024, seed=3)
+        whole = [data[offset:offset + length] for offset, length in
+                 create_patches._cdc_chunks(data, DELTA_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE)]
+        streamed = list(iter_chunks(io.BytesIO(data), DELTA_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE))
+        self.assertEqual(streamed, whole)
+
+    @unittest.skipIf(create_patches._fastcdc is None, "fastcdc no instalado")
+    def test_python_fallback_matches_fastcdc(self):
+        data = numeric_csv(2 * 1024 * 1024, seed=4) + bytes(100_000) + random.Random(5).randbytes(500_000)
+        for sizes in ((DELTA_MIN_SIZE, DELTA_AVG_SIZE, DELTA_MAX_SIZE),
+                      (CHUNK_MIN_SIZE // 4, CHUNK_AVG_SIZE // 4, CHUNK_MAX_SIZE // 4)):
+            expected = [(chunk.offset, chunk.length) for chunk in create_patches._fastcdc(data, *sizes)]
+            self.assertEqual(list(create_patches._cdc_chunks_py(data, *sizes)), expected)
+
+
+class ParallelGzipTest(unittest.TestCase):
+    """El formato "AP" está duplicado en AtlasInstaller.py: las dos copias deben entenderse"""
+
+    def test_installer_reads_writer_output(self):
+        data = numeric_csv(300_000, seed=6) + random.Random(7).randbytes(200_000)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "patch.tar.gz")
+            with open(path, "wb") as raw, create_patches.ParallelGzipWriter(raw, 2, block_size=64 * 1024) as gz:
+                gz.write(data[:100_000])
+                gz.set_level(0)
+                gz.write(data[100_000:])
+
+            self.assertTrue(AtlasInstaller.ParallelGzipReader.detect(path))
+            with open(path, "rb") as f, AtlasInstaller.ParallelGzipReader(f, 2) as reader:
+                self.assertEqual(reader.read(), data)
+            with open(path, "rb") as f, create_patches.ParallelGzipReader(f, 2) as reader:
+                self.assertEqual(reader.read(), data)
+            # Sigue siendo un gzip normal (miembros concatenados)
+            with gzip.open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+
+class PatchFormatTest(unittest.TestCase):
+    """Los metadatos de formato 2 solo se generan si los instaladores lo entienden"""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp(prefix="atlas_patch_")
+        self.addCleanup(shutil.rmtree, tmp)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp)
+
+    def make_patch(self, client_format):
+        """Parche con un archivo modificado y una copia de un archivo existente"""
+        ps = create_patches.PatchSystem(workers=1, client_format=client_format)
+        os.makedirs(ps.base_folder)
+        with open(os.path.join(ps.base_folder, "a.bin"), "wb") as f:
+            f.write(random.Random(8).randbytes(1000))
+        with open(os.path.join(ps.base_folder, "b.csv"), "wb") as f:
+            f.write(numeric_csv(400_000, seed=9))
+        shutil.copytree(ps.base_folder, "inst")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ps.run()
+
+        shutil.copy(os.path.join(ps.base_folder, "a.bin"), os.path.join(ps.base_folder, "a_copy.bin"))
+        with open(os.path.join(ps.base_folder, "b.csv"), "r+b") as f:
+            f.write(insert_bytes(f.read(), 5000, b"1.0,2.0\n"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            patch_file = ps.run()
+        with tarfile.open(patch_file) as tar:
+            return ps, patch_file, tar.getnames()
+
+    def assert_applies(self, ps, patch_file):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(create_patches.PatchApplier.apply_patch(patch_file, "inst", "linux"))
+        for name in ("a.bin", "a_copy.bin", "b.csv"):
+            with open(os.path.join(ps.base_folder, name), "rb") as expected, \
+                    open(os.path.join("inst", name), "rb") as applied:
+                self.assertEqual(applied.read(), expected.read(), name)
+
+    def test_default_format_has_only_plain_files(self):
+        ps, patch_file, names = self.make_patch(1)
+        self.assertEqual(sorted(names), ["a_copy.bin", "b.csv"])
+        self.assert_applies(ps, patch_file)
+
+    def test_client_format_2_is_marked(self):
+        ps, patch_file, names = self.make_patch(2)
+        self.assertEqual(names[0], create_patches.PATCH_FORMAT_FILE)
+        self.assertIn(create_patches.DUPLICATES_FILE, names)
+        self.assertIn(create_patches.CHUNKED_FILES, names)
+        self.assertEqual(AtlasInstaller.AtlasInstaller()._read_patch_format(patch_file), 2)
+        self.assert_applies(ps, patch_file)
+
+    def test_newer_format_is_rejected(self):
+        os.makedirs("inst")
+        with tarfile.open("patch_future.tar.gz", "w:gz") as tar:
+            for name, data in ((create_patches.PATCH_FORMAT_FILE, json.dumps({"format": 99}).encode()),
+                               ("x.txt", b"x")):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(create_patches.PatchApplier.apply_patch("patch_future.tar.gz", "inst", "linux"))
+        self.assertEqual(os.listdir("inst"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()